@@ -0,0 +1,24 @@
+import os
+import secrets
+from fastapi import Header, HTTPException, status
+
+# Static admin tokens for diagnostic/operational endpoints.
+# Configure with ADMIN_TOKENS="token1,token2" (empty = admin features disabled)
+ADMIN_TOKENS = [t.strip() for t in os.getenv("ADMIN_TOKENS", "").split(",") if t.strip()]
+
+def is_admin_token(token) -> bool:
+    """Check a token against the configured admin tokens (constant time)"""
+    if not token or not ADMIN_TOKENS:
+        return False
+    if isinstance(token, bytes):
+        token = token.decode("latin-1")
+    return any(secrets.compare_digest(token, admin) for admin in ADMIN_TOKENS)
+
+def require_admin(x_admin_token: str = Header(None)):
+    """Dependency that only lets requests with a valid X-Admin-Token through"""
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin token required"
+        )
+    return x_admin_token
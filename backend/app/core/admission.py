@@ -0,0 +1,196 @@
+"""
+Admission control for /recommend.
+
+Three layers, cheapest first:
+
+1. Rate limits: token buckets per client IP (RECOMMEND_RATE_PER_IP
+   requests/s, bursts of RECOMMEND_BURST_PER_IP, high because a whole
+   classroom can share one address) and per signed-in user
+   (RECOMMEND_RATE_PER_USER / RECOMMEND_BURST_PER_USER). The `token` query
+   parameter is resolved to its session's user through the session store
+   (remembered for RATE_LIMIT_PRINCIPAL_TTL seconds), so made-up or rotated
+   tokens only get the IP bucket and several sessions of one user share
+   theirs. Over the limit -> 429 with Retry-After. Behind a reverse proxy run
+   uvicorn with --proxy-headers so the client IP is the real one.
+
+2. Cached responses are served without further checks.
+
+3. Cache misses need one of RECOMMEND_MAX_CONCURRENCY pipeline slots
+   (prediction + ARASAAC lookups). If none frees up within
+   RECOMMEND_ADMISSION_WAIT_MS, the request is not queued: it gets a degraded
+   answer built from the fallback tables and already-cached pictograms only.
+
+All three run on the event loop (the /recommend handlers are async and only
+hand admitted work to the threadpool), so a rejected or shed request never
+waits for a threadpool thread.
+
+Every decision is counted; see /admin/metrics.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+
+RECOMMEND_RATE_PER_USER = float(os.getenv("RECOMMEND_RATE_PER_USER", "5"))
+RECOMMEND_BURST_PER_USER = float(os.getenv("RECOMMEND_BURST_PER_USER", "15"))
+RECOMMEND_RATE_PER_IP = float(os.getenv("RECOMMEND_RATE_PER_IP", "30"))
+RECOMMEND_BURST_PER_IP = float(os.getenv("RECOMMEND_BURST_PER_IP", "90"))
+RECOMMEND_MAX_CONCURRENCY = int(os.getenv("RECOMMEND_MAX_CONCURRENCY", "8"))
+RECOMMEND_ADMISSION_WAIT_MS = int(os.getenv("RECOMMEND_ADMISSION_WAIT_MS", "0"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))  # buckets kept per limiter
+RATE_LIMIT_PRINCIPAL_TTL = float(os.getenv("RATE_LIMIT_PRINCIPAL_TTL", "60"))  # seconds a resolved token is remembered
+
+ADMISSION_POLL_SECONDS = 0.005  # slot polling while RECOMMEND_ADMISSION_WAIT_MS runs
+
+class RateLimited(HTTPException):
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many recommendation requests, please slow down",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+class RateLimiter:
+    """Token buckets keyed by client identity, refilled lazily"""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> [tokens, last refill]
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> float:
+        """Spend one token; returns 0 if allowed, else seconds until one is available"""
+        if self.rate <= 0:
+            return 0.0  # disabled
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+class PrincipalResolver:
+    """Session token -> user id (None if unknown), remembered briefly so rate limiting rarely hits the session store"""
+
+    def __init__(self, lookup, ttl: float = RATE_LIMIT_PRINCIPAL_TTL, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.lookup = lookup  # lookup(token) -> Principal or None (blocking)
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._resolved = OrderedDict()  # token -> (user id or None, expires at)
+
+    async def resolve(self, token: str) -> Optional[int]:
+        now = time.monotonic()
+        entry = self._resolved.get(token)
+        if entry is not None and entry[1] > now:
+            return entry[0]
+        principal = await run_in_threadpool(self.lookup, token)
+        user_id = principal.id if principal is not None else None
+        self._resolved[token] = (user_id, now + self.ttl)
+        self._resolved.move_to_end(token)
+        while len(self._resolved) > self.max_keys:
+            self._resolved.popitem(last=False)
+        return user_id
+
+class AdmissionController:
+    def __init__(self, max_concurrency: int = RECOMMEND_MAX_CONCURRENCY, wait_ms: int = RECOMMEND_ADMISSION_WAIT_MS):
+        self.per_user = RateLimiter(RECOMMEND_RATE_PER_USER, RECOMMEND_BURST_PER_USER)
+        self.per_ip = RateLimiter(RECOMMEND_RATE_PER_IP, RECOMMEND_BURST_PER_IP)
+        self.max_concurrency = max_concurrency
+        self.wait = wait_ms / 1000
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.counters = {
+            "requests": 0,
+            "unknown_tokens": 0,  # token given but not a live session: IP bucket only
+            "rate_limited_user": 0,
+            "rate_limited_ip": 0,
+            "admitted": 0,   # ran the full pipeline
+            "degraded": 0,   # shed to the fallback answer
+        }
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    async def check_rate(self, token, ip, resolver: PrincipalResolver = None):
+        """Raise RateLimited if the IP's or the token's user's bucket is empty"""
+        self._count("requests")
+        # IP first: it is free, and it is what limits made-up tokens
+        if ip:
+            retry_after = self.per_ip.take(ip)
+            if retry_after:
+                self._count("rate_limited_ip")
+                raise RateLimited(retry_after)
+        if token and resolver is not None:
+            user_id = await resolver.resolve(token)
+            if user_id is None:
+                self._count("unknown_tokens")
+                return
+            retry_after = self.per_user.take(f"user:{user_id}")
+            if retry_after:
+                self._count("rate_limited_user")
+                raise RateLimited(retry_after)
+
+    @asynccontextmanager
+    async def pipeline_slot(self):
+        """Yields True with a pipeline slot held, or False if the pipeline is saturated"""
+        acquired = self._slots.acquire(blocking=False)
+        if not acquired and self.wait > 0:
+            deadline = time.monotonic() + self.wait
+            while not acquired and time.monotonic() < deadline:
+                await asyncio.sleep(ADMISSION_POLL_SECONDS)
+                acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            self._count("degraded")
+            yield False
+            return
+        with self._lock:
+            self.counters["admitted"] += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            yield True
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "max_concurrency": self.max_concurrency,
+                "tracked_users": len(self.per_user),
+                "tracked_ips": len(self.per_ip),
+                "limits": {
+                    "per_user": {"rate": self.per_user.rate, "burst": self.per_user.burst},
+                    "per_ip": {"rate": self.per_ip.rate, "burst": self.per_ip.burst},
+                },
+            }
+
+admission = AdmissionController()
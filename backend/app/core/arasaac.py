@@ -1,13 +1,133 @@
-from fastapi import APIRouter
-
+import os
+import threading
 import requests
-from functools import lru_cache
+from app.core.cache_registry import registry as cache_registry
+from app.core.languages import DEFAULT_LANGUAGE, get_language, registry as language_registry
+from app.core.single_flight import SingleFlight, create_shared_cache, fetch_once
+
+API_URL = os.getenv("ARASAAC_API_URL", "https://api.arasaac.org/v1").rstrip("/")
+ARASAAC_TIMEOUT = float(os.getenv("ARASAAC_TIMEOUT", "10"))
+
+STATIC_URL = os.getenv("ARASAAC_STATIC_URL", "https://static.arasaac.org/pictograms").rstrip("/")
+
+# Public base URL of this API to serve pictograms through the image proxy
+# (e.g. https://api.example.com); empty = link ARASAAC's 300px PNGs directly
+PICTOGRAM_PROXY_URL = os.getenv("PICTOGRAM_PROXY_URL", "").rstrip("/")
+PICTOGRAM_PROXY_VARIANT = os.getenv("PICTOGRAM_PROXY_VARIANT", "150.webp")
+
+def pictogram_url(picto_id):
+    """Public image URL of a pictogram"""
+    if PICTOGRAM_PROXY_URL:
+        return f"{PICTOGRAM_PROXY_URL}/pictograms/{picto_id}/{PICTOGRAM_PROXY_VARIANT}"
+    return f"{STATIC_URL}/{picto_id}/{picto_id}_300.png"
+
+# Concurrent misses for the same word share one upstream request: within the
+# process through _flights, across workers through the optional shared cache
+_flights = SingleFlight()
+_shared_cache = create_shared_cache()
+_lookup_stats = {
+    "upstream_requests": 0,
+    "upstream_errors": 0,
+    "shared_hits": 0,        # found in the shared cache, stored by another worker
+    "coalesced_remote": 0,   # waited for another worker's in-flight request
+    "lease_timeouts": 0,     # gave up waiting and fetched anyway
+    "shared_cache_errors": 0,
+}
+_stats_lock = threading.Lock()
+
+def _count(name):
+    with _stats_lock:
+        _lookup_stats[name] += 1
+
+def search_pictograms(word, lang=None):
+    """
+    ARASAAC search results for a word, cached per language.
+
+    Only the best match is kept (callers use result[0]); failed requests
+    return [] without being cached.
+    """
+    result = lookup_pictograms(word, lang)
+    return result if result is not None else []
+
+def lookup_pictograms(word, lang=None):
+    """search_pictograms(), but None if the lookup failed (vs [] for no match)"""
+    lang = lang or DEFAULT_LANGUAGE
+    cache = get_language(lang).pictograms
+    found, result = cache.get(word)
+    if found:
+        return result
+    return _flights.do(f"{lang}:{word}", lambda: _lookup(cache, word, lang))
 
-@lru_cache(maxsize=100)
-def search_pictograms(word):
-    url = f"https://api.arasaac.org/v1/pictograms/es/search/{word}"
+def _lookup(cache, word, lang):
+    """Leader of a flight: fill the local cache from the shared one or ARASAAC"""
+    # A previous flight may have finished between our miss and this one starting
+    found, result = cache.peek(word)
+    if found:
+        return result
+    shared_failed = False
+    if _shared_cache is not None:
+        try:
+            # None here means the upstream request failed: don't repeat it
+            result = fetch_once(_shared_cache, f"{lang}:{word}", lambda: _fetch(word, lang), _count)
+        except Exception as e:
+            _count("shared_cache_errors")
+            print(f"⚠️  Shared pictogram cache failed: {e}")
+            shared_failed = True
+    if _shared_cache is None or shared_failed:
+        result = _fetch(word, lang)
+    if result is not None:
+        cache.put(word, result)
+    return result
+
+def _fetch(word, lang):
+    """Best ARASAAC match ([] if none), or None if the request failed"""
+    _count("upstream_requests")
+    url = f"{API_URL}/pictograms/{lang}/search/{word}"
     try:
-        r = requests.get(url)
-        return r.json()
-    except:
-        return []
+        r = requests.get(url, timeout=ARASAAC_TIMEOUT)
+        data = r.json()
+    except Exception:
+        _count("upstream_errors")
+        return None
+    return data[:1] if isinstance(data, list) else []
+
+def lookup_metrics() -> dict:
+    """Upstream requests and how many lookups were coalesced onto another's request"""
+    with _stats_lock:
+        stats = dict(_lookup_stats)
+    return {
+        **stats,
+        "flights": _flights.leaders,
+        "coalesced_local": _flights.coalesced,
+        "in_flight": _flights.in_flight(),
+        "shared_cache": type(_shared_cache).__name__ if _shared_cache is not None else None,
+    }
+
+def cached_pictograms(word, lang=None):
+    """search_pictograms() from the cache only: [] on a miss, never calls ARASAAC"""
+    found, result = get_language(lang).pictograms.get(word)
+    return result if found else []
+
+# Bumped whenever the pictogram cache is cleared, so responses built from it
+# (e.g. the category board) know to rebuild
+cache_generation = 0
+
+def clear_pictogram_cache(prefix: str = None) -> int:
+    """Drop cached search results ("<lang>:<word>" prefix, or all); returns how many"""
+    global cache_generation
+    removed = language_registry.invalidate_pictograms(prefix)
+    if _shared_cache is not None:
+        _shared_cache.invalidate(prefix)
+    cache_generation += 1
+    return removed
+
+class PictogramLookups:
+    """Registry view of the per-language search result caches"""
+
+    def cache_stats(self) -> dict:
+        return language_registry.pictogram_cache_stats()
+
+    def invalidate(self, prefix: str = None) -> int:
+        return clear_pictogram_cache(prefix)
+
+cache_registry.register("pictograms", PictogramLookups())
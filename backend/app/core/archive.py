@@ -0,0 +1,257 @@
+"""
+Cold storage for old chat messages.
+
+`archive_messages()` (run by scripts/archive_messages.py) moves messages
+older than MESSAGE_RETENTION_DAYS out of the hot `messages` table into
+message_archive. That table holds one zlib-compressed NDJSON segment per
+room and month, indexed by (room_id, first_ts, last_ts):
+
+    {"id": 812, "user_id": 4, "timestamp": "2025-03-02T10:15:00", "pictos": "2349\\tyo\\n..."}
+
+(legacy rows keep "content" instead of "pictos"). The hot table stays small
+enough for its indexes to live in cache.
+
+History reads cross into the archive transparently: `before()` and
+`after()` return rows as transient Message objects, so get_messages formats
+them exactly like live rows. Archived messages keep their room counters but
+leave the search index.
+"""
+
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy import (
+    Table, Column, Integer, String, DateTime, LargeBinary, Index,
+    select, insert, update, delete,
+)
+from app.core.cache_registry import CacheStats, describe, key_matches, registry as cache_registry
+from app.core.database import Base
+from app.models.chat import Message
+from app.models.user import User
+
+MESSAGE_RETENTION_DAYS = int(os.getenv("MESSAGE_RETENTION_DAYS", "180"))
+ARCHIVE_SEGMENT_CACHE = int(os.getenv("ARCHIVE_SEGMENT_CACHE", "32"))
+
+message_archive = Table(
+    "message_archive",
+    Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("room_id", Integer, nullable=False),
+    Column("month", String(7), nullable=False),  # "YYYY-MM"
+    Column("first_ts", DateTime, nullable=False),
+    Column("last_ts", DateTime, nullable=False),
+    Column("min_id", Integer, nullable=False),
+    Column("max_id", Integer, nullable=False),
+    Column("message_count", Integer, nullable=False),
+    Column("data", LargeBinary, nullable=False),
+    Index("ux_message_archive_room_month", "room_id", "month", unique=True),
+    Index("ix_message_archive_room_ts", "room_id", "first_ts", "last_ts"),
+)
+
+def _encode_segment(entries) -> bytes:
+    lines = []
+    for entry in entries:
+        record = {"id": entry["id"], "user_id": entry["user_id"], "timestamp": entry["timestamp"].isoformat()}
+        if entry.get("pictos") is not None:
+            record["pictos"] = entry["pictos"]
+        else:
+            record["content"] = entry["content"]
+        lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+    return zlib.compress("\n".join(lines).encode(), 9)
+
+def _decode_segment(data: bytes):
+    entries = []
+    for line in zlib.decompress(data).decode().split("\n"):
+        record = json.loads(line)
+        record["timestamp"] = datetime.fromisoformat(record["timestamp"])
+        entries.append(record)
+    return entries
+
+def _sort_key(entry):
+    return entry["timestamp"], entry["id"]
+
+class SegmentCache:
+    """LRU of decoded segments (registered as cache "archive_segments", keys: segment id)"""
+
+    def __init__(self, max_entries: int = ARCHIVE_SEGMENT_CACHE):
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        # Keyed by (segment id, message_count) so merges invalidate them
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entries = self._entries.get(key)
+            if entries is None:
+                self.stats.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+            return entries
+
+    def put(self, key, entries):
+        with self._lock:
+            self._entries[key] = entries
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def invalidate(self, prefix: str = None) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if key_matches(str(key[0]), prefix)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def cache_stats(self) -> dict:
+        with self._lock:
+            entries = len(self._entries)
+        return describe("lru", "<segment_id>", entries, None, self.stats, max_entries=self.max_entries)
+
+_segment_cache = cache_registry.register("archive_segments", SegmentCache())
+
+def _segment_entries(db, segment_id: int, count: int):
+    key = (segment_id, count)
+    entries = _segment_cache.get(key)
+    if entries is not None:
+        return entries
+    data = db.execute(select(message_archive.c.data).where(message_archive.c.id == segment_id)).scalar_one()
+    entries = _decode_segment(data)
+    _segment_cache.put(key, entries)
+    return entries
+
+def _with_usernames(db, room_id: int, entries):
+    """(transient Message, username) pairs for archived entries"""
+    user_ids = {entry["user_id"] for entry in entries}
+    usernames = dict(db.query(User.id, User.username).filter(User.id.in_(user_ids)).all()) if user_ids else {}
+    return [
+        (
+            Message(
+                id=entry["id"],
+                room_id=room_id,
+                user_id=entry["user_id"],
+                content=entry.get("content", ""),
+                pictos=entry.get("pictos"),
+                timestamp=entry["timestamp"],
+            ),
+            usernames.get(entry["user_id"], ""),
+        )
+        for entry in entries
+    ]
+
+def has_archive(db, room_id: int) -> bool:
+    return db.execute(
+        select(message_archive.c.id).where(message_archive.c.room_id == room_id).limit(1)
+    ).first() is not None
+
+def find_timestamp(db, room_id: int, message_id: int):
+    """Timestamp of an archived message, or None"""
+    segments = db.execute(
+        select(message_archive.c.id, message_archive.c.message_count)
+        .where(message_archive.c.room_id == room_id)
+        .order_by(
+            # Segments whose id range covers the message first (hi/lo ids are only roughly ordered)
+            ((message_archive.c.min_id <= message_id) & (message_archive.c.max_id >= message_id)).desc(),
+            message_archive.c.last_ts.desc(),
+        )
+    ).all()
+    for segment_id, count in segments:
+        for entry in _segment_entries(db, segment_id, count):
+            if entry["id"] == message_id:
+                return entry["timestamp"]
+    return None
+
+def before(db, room_id: int, key=None, limit: int = 50):
+    """Archived messages older than (timestamp, id) `key` (or the newest), newest first"""
+    query = select(message_archive.c.id, message_archive.c.message_count).where(message_archive.c.room_id == room_id)
+    if key is not None:
+        query = query.where(message_archive.c.first_ts <= key[0])
+    selected = []
+    for segment_id, count in db.execute(query.order_by(message_archive.c.last_ts.desc())).all():
+        for entry in reversed(_segment_entries(db, segment_id, count)):
+            if key is None or _sort_key(entry) < key:
+                selected.append(entry)
+                if len(selected) == limit:
+                    return _with_usernames(db, room_id, selected)
+    return _with_usernames(db, room_id, selected)
+
+def after(db, room_id: int, key, limit: int = 50):
+    """Archived messages newer than (timestamp, id) `key`, oldest first"""
+    query = (
+        select(message_archive.c.id, message_archive.c.message_count)
+        .where(message_archive.c.room_id == room_id, message_archive.c.last_ts >= key[0])
+        .order_by(message_archive.c.first_ts.asc())
+    )
+    selected = []
+    for segment_id, count in db.execute(query).all():
+        for entry in _segment_entries(db, segment_id, count):
+            if _sort_key(entry) > key:
+                selected.append(entry)
+                if len(selected) == limit:
+                    return _with_usernames(db, room_id, selected)
+    return _with_usernames(db, room_id, selected)
+
+def _append_segment(conn, room_id: int, month: str, entries):
+    existing = conn.execute(
+        select(message_archive.c.id, message_archive.c.data)
+        .where(message_archive.c.room_id == room_id, message_archive.c.month == month)
+    ).first()
+    if existing is not None:
+        merged = {entry["id"]: entry for entry in _decode_segment(existing.data)}
+        merged.update((entry["id"], entry) for entry in entries)
+        entries = list(merged.values())
+    entries.sort(key=_sort_key)
+    values = {
+        "first_ts": entries[0]["timestamp"],
+        "last_ts": entries[-1]["timestamp"],
+        "min_id": min(entry["id"] for entry in entries),
+        "max_id": max(entry["id"] for entry in entries),
+        "message_count": len(entries),
+        "data": _encode_segment(entries),
+    }
+    if existing is None:
+        conn.execute(insert(message_archive).values(room_id=room_id, month=month, **values))
+    else:
+        conn.execute(update(message_archive).where(message_archive.c.id == existing.id).values(**values))
+
+def archive_messages(engine, older_than_days: int = MESSAGE_RETENTION_DAYS, batch_size: int = 5000) -> int:
+    """Move messages older than the cutoff into monthly segments (safe to re-run)"""
+    from app.core.search import delete_message_index
+
+    messages = Message.__table__
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    with engine.connect() as conn:
+        room_ids = conn.execute(
+            select(messages.c.room_id).where(messages.c.timestamp < cutoff).distinct()
+        ).scalars().all()
+
+    archived = 0
+    for room_id in room_ids:
+        while True:
+            # One transaction per batch: segments are written and rows deleted together
+            with engine.begin() as conn:
+                rows = conn.execute(
+                    select(messages.c.id, messages.c.user_id, messages.c.content, messages.c.pictos, messages.c.timestamp)
+                    .where(messages.c.room_id == room_id, messages.c.timestamp < cutoff)
+                    .order_by(messages.c.timestamp, messages.c.id)
+                    .limit(batch_size)
+                ).mappings().all()
+                if not rows:
+                    break
+                by_month = {}
+                for row in rows:
+                    by_month.setdefault(row["timestamp"].strftime("%Y-%m"), []).append(dict(row))
+                for month, entries in by_month.items():
+                    _append_segment(conn, room_id, month, entries)
+                ids = [row["id"] for row in rows]
+                conn.execute(delete(messages).where(messages.c.id.in_(ids)))
+                delete_message_index(conn, ids)
+            archived += len(rows)
+    return archived
+
+def delete_room_archive(db, room_id: int):
+    db.execute(delete(message_archive).where(message_archive.c.room_id == room_id))
@@ -0,0 +1,105 @@
+"""
+Central registry of the in-process caches.
+
+Every cache registers under a name and implements two methods:
+
+    cache_stats() -> dict        policy, limits, entries, bytes, hits, misses,
+                                 hit_rate, evictions (None where not tracked)
+    invalidate(prefix) -> int    drop entries whose key starts with `prefix`
+                                 (all entries if None); returns how many
+
+Keys are matched as strings, e.g. "es:yo" for pictogram lookups, "es:yo quiero"
+for recommendations or "12" for a room's history buffer; each cache documents
+its key format in its stats ("key"). The admin API (app/routers/admin.py)
+exposes the registry.
+
+Stats are per worker process: every worker has its own caches.
+"""
+
+import threading
+from typing import Dict, Optional
+
+class CacheStats:
+    """Hit/miss/eviction counters (increments may race; good enough for stats)"""
+
+    __slots__ = ("hits", "misses", "evictions")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def as_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+        }
+
+def describe(policy: str, key: str, entries: int, size: Optional[int], stats: CacheStats,
+             max_entries: int = None, max_bytes: int = None) -> dict:
+    """Stats dict in the shape the registry reports"""
+    return {
+        "policy": policy,
+        "key": key,
+        "max_entries": max_entries,
+        "max_bytes": max_bytes,
+        "entries": entries,
+        "bytes": size,
+        **stats.as_dict(),
+    }
+
+def key_matches(key: str, prefix: Optional[str]) -> bool:
+    return prefix is None or key.startswith(prefix)
+
+class FunctionCache:
+    """Registry view of a functools.lru_cache (no per-key invalidation)"""
+
+    def __init__(self, func, key: str):
+        self.func = func
+        self.key = key
+
+    def cache_stats(self) -> dict:
+        info = self.func.cache_info()
+        stats = CacheStats()
+        stats.hits, stats.misses = info.hits, info.misses
+        stats.evictions = max(0, info.misses - info.currsize)  # every miss inserts
+        return describe("lru", self.key, info.currsize, None, stats, max_entries=info.maxsize)
+
+    def invalidate(self, prefix: str = None) -> int:
+        if prefix is not None:
+            raise ValueError("This cache can only be cleared as a whole")
+        removed = self.func.cache_info().currsize
+        self.func.cache_clear()
+        return removed
+
+class CacheRegistry:
+    def __init__(self):
+        self._caches: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, cache):
+        with self._lock:
+            self._caches[name] = cache
+        return cache
+
+    def names(self):
+        with self._lock:
+            return sorted(self._caches)
+
+    def get(self, name: str):
+        """The cache registered as `name`; KeyError if there is none"""
+        with self._lock:
+            return self._caches[name]
+
+    def stats(self) -> dict:
+        return {name: self.get(name).cache_stats() for name in self.names()}
+
+    def invalidate(self, name: str, prefix: str = None) -> int:
+        removed = self.get(name).invalidate(prefix)
+        print(f"🧹 Invalidated {removed} entries of cache '{name}'" + (f" (prefix {prefix!r})" if prefix else ""))
+        return removed
+
+registry = CacheRegistry()
@@ -1,3 +1,33 @@
+"""
+Category boards (fixed vocabularies grouped by topic) and the cached
+/categories response built from them.
+
+The board resolves every word to its first ARASAAC pictogram once, encodes
+the whole response and keeps the bytes plus an ETag. It is rebuilt only
+when the pictogram cache changes (see clear_pictogram_cache); CATEGORIES is
+fixed at import, so its hash is computed once.
+A board with failed lookups (ARASAAC down) is incomplete: it is served
+uncached and rebuilt on the first request after CATEGORY_RETRY_SECONDS.
+Registered as cache "categories" (a single entry).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+from app.core import arasaac
+from app.core.cache_registry import CacheStats, describe, key_matches, registry as cache_registry
+from app.core.http_cache import etag_for
+from app.core.responses import json_bytes
+
+# Parallel ARASAAC lookups while building the board
+CATEGORY_LOOKUP_WORKERS = int(os.getenv("CATEGORY_LOOKUP_WORKERS", "8"))
+# Minimum time before an incomplete board is rebuilt (retries the failed lookups)
+CATEGORY_RETRY_SECONDS = float(os.getenv("CATEGORY_RETRY_SECONDS", "10"))
+
 CATEGORIES = {
     "personas": {
         "label": "Personas",
@@ -30,3 +60,88 @@ CATEGORIES = {
         "words": ["y", "o", "pero", "porque", "también", "con", "de", "a", "en"]
     }
 }
+
+class CategoryBoard(NamedTuple):
+    version: tuple  # (definitions hash, pictogram cache generation)
+    body: bytes
+    etag: str
+    complete: bool = True  # every pictogram lookup succeeded
+    built_at: float = 0.0  # time.monotonic()
+
+    def is_current(self, version) -> bool:
+        if self.version != version:
+            return False
+        return self.complete or time.monotonic() - self.built_at < CATEGORY_RETRY_SECONDS
+
+DEFINITIONS_HASH = hashlib.sha256(json.dumps(CATEGORIES, sort_keys=True).encode()).hexdigest()
+
+_board = None
+_board_lock = threading.Lock()
+_board_stats = CacheStats()
+
+def _resolve(word):
+    """(pictogram or None, whether the lookup succeeded)"""
+    try:
+        result = arasaac.lookup_pictograms(word)
+    except Exception:
+        return None, False
+    if not result:
+        return None, result is not None
+    picto_id = result[0]["_id"]
+    return {"palabra": word, "id": picto_id, "url": arasaac.pictogram_url(picto_id)}, True
+
+def _build_board(version) -> CategoryBoard:
+    words = list(dict.fromkeys(word for category in CATEGORIES.values() for word in category["words"]))
+    with ThreadPoolExecutor(max_workers=CATEGORY_LOOKUP_WORKERS) as pool:
+        resolved = dict(zip(words, pool.map(_resolve, words)))
+    pictos = {word: picto for word, (picto, _) in resolved.items()}
+    failed = [word for word, (_, ok) in resolved.items() if not ok]
+    if failed:
+        print(f"⚠️  Category board incomplete, {len(failed)} lookups failed (retry in {CATEGORY_RETRY_SECONDS:g}s)")
+    categories = [
+        {
+            "id": category_id,
+            "label": category["label"],
+            "icon": category["icon"],
+            "pictograms": [pictos[word] for word in category["words"] if pictos[word] is not None],
+        }
+        for category_id, category in CATEGORIES.items()
+    ]
+    body = json_bytes({"categories": categories})
+    return CategoryBoard(version, body, etag_for(body), not failed, time.monotonic())
+
+def get_category_board() -> CategoryBoard:
+    """The assembled board, rebuilt if the definitions or pictogram cache changed or it is incomplete (blocking)"""
+    global _board
+    version = (DEFINITIONS_HASH, arasaac.cache_generation)
+    board = _board
+    if board is not None and board.is_current(version):
+        _board_stats.hits += 1
+        return board
+    with _board_lock:
+        if _board is None or not _board.is_current(version):
+            _board_stats.misses += 1
+            _board = _build_board(version)
+        else:
+            _board_stats.hits += 1
+        return _board
+
+class CategoryBoardCache:
+    """Registry view of the assembled board"""
+
+    def cache_stats(self) -> dict:
+        board = _board
+        return describe(
+            "rebuild on change", "categories", int(board is not None), len(board.body) if board else 0,
+            _board_stats, max_entries=1,
+        )
+
+    def invalidate(self, prefix: str = None) -> int:
+        global _board
+        with _board_lock:
+            removed = int(_board is not None and key_matches("categories", prefix))
+            if removed:
+                _board = None
+        return removed
+
+cache_registry.register("categories", CategoryBoardCache())
@@ -0,0 +1,186 @@
+"""
+WebSocket connection management for chat rooms.
+
+Every connection gets its own bounded outbound queue drained by a dedicated
+writer task, so broadcasting never awaits a socket: one slow client only
+fills its own queue. Slow consumers are handled by SlowConsumerPolicy:
+ephemeral frames (presence diffs that only carry typing indicators) are
+dropped first once a queue backs up, and a client whose queue overflows,
+or whose socket stalls on a single send, is disconnected.
+
+Broadcasts go through a pub/sub backend (app/core/pubsub.py): each message is
+published once per room and every worker fans it out to its own sockets.
+Queues hold shared OutboundFrames (app/core/wire.py), so a message is
+encoded once per wire protocol rather than once per recipient.
+"""
+
+import asyncio
+import os
+from typing import Dict
+from fastapi import WebSocket, status
+from app.core.pubsub import PubSubBackend, create_pubsub
+from app.core.wire import OutboundFrame, send_frame
+
+# asyncio only keeps weak references to tasks; hold writers until they finish
+_writer_tasks = set()
+
+def typing_only(frame: OutboundFrame) -> bool:
+    """Presence diffs with typing indicators but no joins or leaves"""
+    if frame.type != "presence":
+        return False
+    message = frame.message
+    return not message.get("joined") and not message.get("left")
+
+class SlowConsumerPolicy:
+    """Limits applied to each connection's outbound queue"""
+
+    def __init__(
+        self,
+        max_queue: int = 256,
+        drop_ephemeral_at: int = 32,
+        send_timeout: float = 10.0,
+        is_ephemeral=typing_only,
+    ):
+        self.max_queue = max_queue                  # queued frames before disconnecting
+        self.drop_ephemeral_at = drop_ephemeral_at  # queue depth where ephemeral frames are dropped
+        self.send_timeout = send_timeout            # seconds a single send may take
+        self.is_ephemeral = is_ephemeral            # is_ephemeral(frame) -> bool
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_queue=int(os.getenv("WS_SEND_QUEUE_SIZE", "256")),
+            drop_ephemeral_at=int(os.getenv("WS_DROP_EPHEMERAL_AT", "32")),
+            send_timeout=float(os.getenv("WS_SEND_TIMEOUT", "10")),
+        )
+
+class ClientConnection:
+    """One WebSocket plus its outbound queue and writer task"""
+
+    def __init__(self, websocket: WebSocket, room_id: int, policy: SlowConsumerPolicy, on_closed=None, protocol: str = "json"):
+        self.websocket = websocket
+        self.room_id = room_id
+        self.protocol = protocol
+        self.policy = policy
+        self.queue = asyncio.Queue(maxsize=policy.max_queue)
+        self.on_closed = on_closed
+        self.closed = False
+        self.dropped = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._writer())
+        _writer_tasks.add(self._task)
+        self._task.add_done_callback(_writer_tasks.discard)
+
+    def enqueue(self, frame: OutboundFrame) -> bool:
+        """Queue a frame without waiting; returns False if the connection is gone"""
+        if self.closed:
+            return False
+        if (
+            self.queue.qsize() >= self.policy.drop_ephemeral_at
+            and self.policy.is_ephemeral(frame)
+        ):
+            self.dropped += 1
+            return True
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            print(f"Disconnecting slow WebSocket consumer in room {self.room_id}")
+            self.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            return False
+        return True
+
+    async def _writer(self):
+        try:
+            while True:
+                frame = await self.queue.get()
+                await asyncio.wait_for(
+                    send_frame(self.websocket, frame, self.protocol),
+                    timeout=self.policy.send_timeout,
+                )
+        except asyncio.CancelledError:
+            pass
+        except asyncio.TimeoutError:
+            print(f"WebSocket send timed out in room {self.room_id}, disconnecting")
+            self.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        except Exception:
+            # Socket already gone; the receive loop will notice and clean up
+            self.stop()
+
+    def stop(self):
+        """Stop the writer without touching the socket"""
+        if self.closed:
+            return
+        self.closed = True
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        if self.on_closed is not None:
+            self.on_closed(self)
+
+    def close(self, code: int = status.WS_1000_NORMAL_CLOSURE):
+        """Stop the writer and close the socket from the server side"""
+        if self.closed:
+            return
+        self.stop()
+        task = asyncio.create_task(self._close_socket(code))
+        _writer_tasks.add(task)
+        task.add_done_callback(_writer_tasks.discard)
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+class ConnectionManager:
+    def __init__(self, policy: SlowConsumerPolicy = None, pubsub: PubSubBackend = None):
+        self.policy = policy or SlowConsumerPolicy.from_env()
+        self.pubsub = pubsub or create_pubsub()
+        self.active_connections: Dict[int, Dict[WebSocket, ClientConnection]] = {}  # {room_id: {websocket: connection}}
+        self.listeners: Dict[str, list] = {}  # {message type: [callback(room_id, message)]}
+
+    async def start(self):
+        """Subscribe this worker to the pub/sub backend"""
+        await self.pubsub.start(self.deliver_local)
+
+    async def stop(self):
+        await self.pubsub.stop()
+
+    async def connect(self, websocket: WebSocket, room_id: int, protocol: str = "json") -> ClientConnection:
+        await websocket.accept()
+        connection = ClientConnection(websocket, room_id, self.policy, on_closed=self._forget, protocol=protocol)
+        self.active_connections.setdefault(room_id, {})[websocket] = connection
+        connection.start()
+        return connection
+
+    def disconnect(self, websocket: WebSocket, room_id: int):
+        connection = self.active_connections.get(room_id, {}).get(websocket)
+        if connection is not None:
+            connection.stop()
+
+    def _forget(self, connection: ClientConnection):
+        room = self.active_connections.get(connection.room_id)
+        if room is not None:
+            room.pop(connection.websocket, None)
+            if not room:
+                del self.active_connections[connection.room_id]
+
+    def add_listener(self, message_type: str, callback):
+        """Call `callback(room_id, message)` for every delivered message of a type, on every worker"""
+        self.listeners.setdefault(message_type, []).append(callback)
+
+    async def broadcast(self, message: dict, room_id: int):
+        """Publish a message to the room on every worker"""
+        await self.pubsub.publish(room_id, message)
+
+    def deliver_local(self, room_id: int, message: dict, payload: str = None):
+        """Queue a message for this worker's connections in the room (never waits on sockets)"""
+        for callback in self.listeners.get(message.get("type"), ()):
+            callback(room_id, message)
+        room = self.active_connections.get(room_id)
+        if not room:
+            return
+        frame = OutboundFrame(message, json_text=payload)
+        for connection in list(room.values()):
+            connection.enqueue(frame)
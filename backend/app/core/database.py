@@ -1,5 +1,7 @@
+import asyncio
 import os
-from sqlalchemy import create_engine
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # Database URL from environment variable or default to SQLite
@@ -7,6 +9,61 @@ from sqlalchemy.orm import sessionmaker, declarative_base
 # For local dev: sqlite:///./chat.db
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./chat.db")
 
+# SQLite tuning (ignored on PostgreSQL)
+SQLITE_WAL = os.getenv("SQLITE_WAL", "1") == "1"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "10000"))
+SQLITE_WRITE_POOL_SIZE = int(os.getenv("SQLITE_WRITE_POOL_SIZE", "3"))
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))
+
+def configure_sqlite(engine, readonly: bool = False):
+    """
+    Apply connection pragmas through engine events.
+
+    Writer transactions take the write lock with BEGIN IMMEDIATE right
+    before their first write statement, so they wait on busy_timeout
+    instead of failing with "database is locked" when another process
+    committed in between, but don't hold the lock while they only read.
+    Statements before the first write run in autocommit mode: a check
+    that must be atomic with the write belongs in a constraint or in the
+    write itself. Read-only connections refuse writes (query_only).
+    """
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        # Let SQLAlchemy's "begin" event emit BEGIN itself
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        if SQLITE_WAL:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-16000")  # 16 MB page cache per connection
+        if readonly:
+            cursor.execute("PRAGMA query_only=1")
+        cursor.close()
+
+    if readonly:
+        @event.listens_for(engine, "begin")
+        def _begin(conn):
+            conn.exec_driver_sql("BEGIN")
+    else:
+        @event.listens_for(engine, "before_cursor_execute")
+        def _begin_on_write(conn, cursor, statement, parameters, context, executemany):
+            dbapi_connection = cursor.connection
+            if dbapi_connection.in_transaction or not _is_write(statement):
+                return
+            if conn.get_execution_options().get("isolation_level") == "AUTOCOMMIT":
+                return
+            dbapi_connection.execute("BEGIN IMMEDIATE")
+
+    return engine
+
+def _is_write(statement: str) -> bool:
+    return statement.lstrip()[:7].upper().split(" ", 1)[0] not in ("SELECT", "PRAGMA", "EXPLAIN")
+
+def _is_file_sqlite(url: str) -> bool:
+    return url.startswith("sqlite") and ":memory:" not in url and url not in ("sqlite://", "sqlite:///")
+
 # Create engine with database-specific settings
 if DATABASE_URL.startswith("postgresql"):
     # PostgreSQL configuration (Neon)
@@ -15,22 +72,53 @@ if DATABASE_URL.startswith("postgresql"):
         pool_pre_ping=True,  # Verify connections before using
         pool_recycle=300,    # Recycle connections every 5 minutes
     )
+    read_engine = engine
     print(f"📊 Using PostgreSQL database (Production)")
+elif _is_file_sqlite(DATABASE_URL):
+    # SQLite configuration: a few writer connections (writes queue in the
+    # pool instead of fighting over the file lock) plus a pool of readers
+    # (WAL lets them run alongside the writers)
+    engine = configure_sqlite(create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        pool_size=SQLITE_WRITE_POOL_SIZE,
+        max_overflow=0,
+        pool_timeout=30,
+    ))
+    read_engine = configure_sqlite(create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        pool_size=SQLITE_READ_POOL_SIZE,
+        max_overflow=0,
+        pool_timeout=30,
+    ), readonly=True)
+    print(f"📊 Using SQLite database (Development)")
 else:
-    # SQLite configuration (Local development)
+    # In-memory SQLite (tests): a single shared connection
     engine = create_engine(
         DATABASE_URL,
         connect_args={"check_same_thread": False}
     )
+    read_engine = engine
     print(f"📊 Using SQLite database (Development)")
 
-# Create session factory
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# Background writes (message batches, id blocks) run one at a time on this thread.
+# Request handlers write through get_db sessions; they hold the write lock
+# only from their first write statement to the commit (see configure_sqlite)
+write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+
+async def run_write(fn, *args):
+    """Run a blocking write on the single database writer thread"""
+    return await asyncio.get_running_loop().run_in_executor(write_executor, fn, *args)
 
 # Base class for models
 Base = declarative_base()
 
-# Dependency to get DB session
+# Dependency to get DB session (writes go through the writer connection on SQLite)
 def get_db():
     db = SessionLocal()
     try:
@@ -38,7 +126,16 @@ def get_db():
     finally:
         db.close()
 
-# Initialize database (create tables)
+# Dependency for read-only endpoints
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Initialize database (create tables, then migrate existing ones) under the schema lock
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    from app.core.migrations import migrate
+    migrate(engine)
     print("Database initialized successfully")
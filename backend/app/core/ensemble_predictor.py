@@ -5,8 +5,10 @@ Mejor accuracy con modelo estadístico optimizado.
 
 from app.core.ngram_predictor import predict_next_words_ngram
 from app.core.fallback import get_fallback_suggestions
+from app.core.languages import get_language
+from app.core.profiling import stage
 
-def predict_ensemble(context, num_words=15, use_fallback=True):
+def predict_ensemble(context, num_words=15, use_fallback=True, lang=None):
     """
     Predicción usando N-gram optimizado (5-grams + interpolación).
     
@@ -18,10 +20,13 @@ def predict_ensemble(context, num_words=15, use_fallback=True):
         context: String "yo quiero" o lista ["yo", "quiero"]
         num_words: Número de predicciones finales
         use_fallback: Usar fallback si modelos fallan
+        lang: Idioma (modelo y tablas de fallback); por defecto el principal
     
     Returns:
         Lista de palabras predichas ordenadas por score
     """
+    fallback_tables = get_language(lang).fallback
+    
     # Normalizar input
     if isinstance(context, str):
         context_str = context
@@ -33,12 +38,14 @@ def predict_ensemble(context, num_words=15, use_fallback=True):
     # Caso especial: sin contexto
     if not context_list:
         if use_fallback:
-            return get_fallback_suggestions([], num_suggestions=num_words)
+            with stage("fallback"):
+                return get_fallback_suggestions([], num_suggestions=num_words, tables=fallback_tables)
         return []
     
     try:
         # Usar N-gram con interpolación (mejor modelo: 54%)
-        predictions = predict_next_words_ngram(context_str, num_words=num_words)
+        with stage("ngram"):
+            predictions = predict_next_words_ngram(context_str, num_words=num_words, lang=lang)
         
         # Si obtenemos suficientes predicciones, retornar
         if len(predictions) >= num_words // 2:
@@ -46,7 +53,8 @@ def predict_ensemble(context, num_words=15, use_fallback=True):
         
         # Fallback si predicciones insuficientes
         if use_fallback:
-            fallback_preds = get_fallback_suggestions(context_list, num_suggestions=num_words)
+            with stage("fallback"):
+                fallback_preds = get_fallback_suggestions(context_list, num_suggestions=num_words, tables=fallback_tables)
             # Combinar sin duplicados
             combined = predictions + [w for w in fallback_preds if w not in predictions]
             return combined[:num_words]
@@ -58,19 +66,21 @@ def predict_ensemble(context, num_words=15, use_fallback=True):
         
         # Graceful degradation a fallback
         if use_fallback:
-            return get_fallback_suggestions(context_list, num_suggestions=num_words)
+            with stage("fallback"):
+                return get_fallback_suggestions(context_list, num_suggestions=num_words, tables=fallback_tables)
         
         return []
 
-def predict_next_words_cached(context: str, num_words: int = 15):
+def predict_next_words_cached(context: str, num_words: int = 15, lang: str = None):
     """
     Versión con caché para compatibilidad con API actual.
     
     Args:
         context: String de contexto "yo quiero"
         num_words: Número de predicciones
+        lang: Idioma
     
     Returns:
         Lista de palabras predichas
     """
-    return predict_ensemble(context, num_words=num_words, use_fallback=True)
+    return predict_ensemble(context, num_words=num_words, use_fallback=True, lang=lang)
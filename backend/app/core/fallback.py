@@ -1,8 +1,14 @@
 """
 Fallback recommendations expanded with comprehensive AAC vocabulary.
 Based on 10k LLM-generated AAC corpus for maximum coverage.
+
+The tables below are Spanish; other languages load theirs from
+app/models_ml/fallback_{lang}.json (see app/core/languages.py).
 """
 
+import json
+from typing import NamedTuple
+
 # Simple starter words when no context
 STARTER_WORDS = [
     "yo", "tú", "él", "ella", "nosotros", "ellos",
@@ -98,29 +104,46 @@ FREQUENT_AAC_WORDS = [
     "más", "menos", "ahora", "aquí", "contigo", "solo", "tranquilo"
 ]
 
-def get_fallback_suggestions(words: list, num_suggestions: int = 12):
+class FallbackTables(NamedTuple):
+    """Fallback vocabulary of one language"""
+    starters: list
+    followups: dict
+    frequent: list
+
+SPANISH_TABLES = FallbackTables(STARTER_WORDS, COMMON_FOLLOWUPS, FREQUENT_AAC_WORDS)
+
+def load_fallback_tables(path) -> FallbackTables:
+    """Tables from a JSON file with "starters", "followups" and "frequent" keys"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return FallbackTables(data.get("starters", []), data.get("followups", {}), data.get("frequent", []))
+
+def get_fallback_suggestions(words: list, num_suggestions: int = 12, tables: FallbackTables = None):
     """
     Get comprehensive fallback suggestions based on AAC patterns.
     
     Args:
         words: List of previously selected words
         num_suggestions: Number of suggestions to return
+        tables: Vocabulary of the user's language (default: Spanish)
     
     Returns:
         List of suggested words
     """
+    starters, followups, frequent = tables or SPANISH_TABLES
+    
     if not words:
-        return STARTER_WORDS[:num_suggestions]
+        return starters[:num_suggestions]
     
     last_word = words[-1].lower()
     
     # Check if we have specific follow-ups for this word
-    if last_word in COMMON_FOLLOWUPS:
-        suggestions = COMMON_FOLLOWUPS[last_word][:num_suggestions]
+    if last_word in followups:
+        suggestions = followups[last_word][:num_suggestions]
         
         # If not enough, add frequent words
         if len(suggestions) < num_suggestions:
-            for word in FREQUENT_AAC_WORDS:
+            for word in frequent:
                 if word not in suggestions and word != last_word:
                     suggestions.append(word)
                     if len(suggestions) >= num_suggestions:
@@ -129,6 +152,6 @@ def get_fallback_suggestions(words: list, num_suggestions: int = 12):
         return suggestions[:num_suggestions]
     
     # For unknown words, return most frequent AAC words
-    suggestions = [w for w in FREQUENT_AAC_WORDS if w != last_word]
+    suggestions = [w for w in frequent if w != last_word]
     return suggestions[:num_suggestions]
 
@@ -0,0 +1,255 @@
+"""
+In-memory ring buffer of recent messages per room.
+
+Every message delivered to this worker (through the same pub/sub listener
+path as the WebSocket fan-out) is appended to its room's buffer, which keeps
+the newest HISTORY_BUFFER_PER_ROOM messages. A buffer only answers queries
+once it has been loaded: seeded from the database and merged with whatever
+arrived meanwhile, so it always holds a contiguous tail of the room.
+
+Used for:
+- `get_messages` pages inside the recent window (no query, no row parsing,
+  no encoding: each entry keeps its REST JSON body, encoded once)
+- replaying missed messages when a client reconnects with `last_seen_id`
+
+Memory is bounded by HISTORY_BUFFER_MAX_MESSAGES across all rooms; the least
+recently used rooms are evicted first and reloaded on demand. The buffer is
+registered as cache "history" (keys: room id) by app/routers/chat.py.
+"""
+
+import os
+import threading
+from bisect import insort
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict
+from app.core import archive
+from app.core.cache_registry import CacheStats, describe, key_matches
+from app.core.database import ReadSessionLocal
+from app.core.responses import json_bytes
+from app.models.chat import Message
+from app.models.user import User
+from sqlalchemy import or_
+
+HISTORY_BUFFER_PER_ROOM = int(os.getenv("HISTORY_BUFFER_PER_ROOM", "200"))
+HISTORY_BUFFER_MAX_MESSAGES = int(os.getenv("HISTORY_BUFFER_MAX_MESSAGES", "20000"))
+HISTORY_REPLAY_LIMIT = int(os.getenv("HISTORY_REPLAY_LIMIT", "100"))
+
+def message_event(msg: Message, username: str) -> dict:
+    """A stored message in the same shape as its WebSocket broadcast"""
+    return {
+        "type": "message",
+        "id": msg.id,
+        "room_id": msg.room_id,
+        "user_id": msg.user_id,
+        "username": username,
+        "content": msg.get_pictograms(),
+        "timestamp": msg.timestamp.isoformat(),
+    }
+
+def _sort_key(entry):
+    return entry[0], entry[1]
+
+def _entry(timestamp: datetime, message: dict):
+    """(timestamp, id, message, encoded REST body) for a message event"""
+    body = json_bytes({key: value for key, value in message.items() if key != "type"})
+    return (timestamp, message["id"], message, body)
+
+class RoomHistory:
+    __slots__ = ("entries", "loaded", "has_older")
+
+    def __init__(self):
+        self.entries = []       # [(timestamp, id, message, body)], oldest first
+        self.loaded = False     # seeded from the database
+        self.has_older = True   # messages older than entries[0] may exist
+
+    def index_of(self, message_id: int):
+        for i in range(len(self.entries) - 1, -1, -1):
+            if self.entries[i][1] == message_id:
+                return i
+        return None
+
+class HistoryBuffer:
+    def __init__(self, per_room: int = HISTORY_BUFFER_PER_ROOM, max_messages: int = HISTORY_BUFFER_MAX_MESSAGES):
+        self.per_room = per_room
+        self.max_messages = max_messages
+        self.rooms: Dict[int, RoomHistory] = OrderedDict()  # least recently used first
+        self.total = 0
+        self.stats = CacheStats()  # page/replay lookups answered from the buffer
+        self._lock = threading.Lock()
+
+    def _touch(self, room_id: int) -> RoomHistory:
+        room = self.rooms.get(room_id)
+        if room is None:
+            room = self.rooms[room_id] = RoomHistory()
+        else:
+            self.rooms.move_to_end(room_id)
+        return room
+
+    def _set_entries(self, room: RoomHistory, entries: list):
+        if len(entries) > self.per_room:
+            entries = entries[-self.per_room:]
+            room.has_older = True
+        self.total += len(entries) - len(room.entries)
+        room.entries = entries
+
+    def _evict(self):
+        while self.total > self.max_messages and len(self.rooms) > 1:
+            _, room = self.rooms.popitem(last=False)
+            self.total -= len(room.entries)
+            self.stats.evictions += 1
+
+    def append(self, room_id: int, message: dict):
+        """Pub/sub listener for delivered chat messages"""
+        entry = _entry(datetime.fromisoformat(message["timestamp"]), message)
+        with self._lock:
+            room = self._touch(room_id)
+            entries = room.entries
+            if room.index_of(entry[1]) is not None:
+                return
+            if not entries or entry[:2] >= entries[-1][:2]:
+                entries.append(entry)
+            else:
+                # Out of order (another worker's batch); keep the list sorted
+                insort(entries, entry, key=_sort_key)
+            self.total += 1
+            if len(entries) > self.per_room:
+                del entries[0]
+                self.total -= 1
+                room.has_older = True
+            self._evict()
+
+    def load(self, room_id: int, db) -> bool:
+        """Seed a room's buffer from the database; returns False if already loaded"""
+        with self._lock:
+            room = self.rooms.get(room_id)
+            if room is not None and room.loaded:
+                return False
+        rows = (
+            db.query(Message, User.username)
+            .join(User, Message.user_id == User.id)
+            .filter(Message.room_id == room_id)
+            .order_by(Message.timestamp.desc(), Message.id.desc())
+            .limit(self.per_room)
+            .all()
+        )
+        # Archived messages are always older than the hot table
+        archived = len(rows) < self.per_room and archive.has_archive(db, room_id)
+        with self._lock:
+            room = self._touch(room_id)
+            # Merge with messages delivered while the query ran
+            merged = {msg.id: _entry(msg.timestamp, message_event(msg, username)) for msg, username in rows}
+            for entry in room.entries:
+                merged[entry[1]] = entry
+            room.has_older = len(rows) == self.per_room or archived
+            self._set_entries(room, sorted(merged.values(), key=_sort_key))
+            room.loaded = True
+            self._evict()
+        return True
+
+    def page(self, room_id: int, limit: int, before_id: int = None, after_id: int = None):
+        """Newest-first page like get_messages, or None if the buffer can't answer it"""
+        entries = self._page_entries(room_id, limit, before_id, after_id)
+        if entries is None:
+            return None
+        return [message for _, _, message, _ in entries]
+
+    def page_bodies(self, room_id: int, limit: int, before_id: int = None, after_id: int = None):
+        """Same as page(), as the messages' encoded REST bodies"""
+        entries = self._page_entries(room_id, limit, before_id, after_id)
+        if entries is None:
+            return None
+        return [body for _, _, _, body in entries]
+
+    def _page_entries(self, room_id: int, limit: int, before_id: int = None, after_id: int = None):
+        with self._lock:
+            selected = self._select(room_id, limit, before_id, after_id)
+            if selected is None:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            self.rooms.move_to_end(room_id)
+        return selected[::-1]
+
+    def _select(self, room_id: int, limit: int, before_id: int, after_id: int):
+        room = self.rooms.get(room_id)
+        if room is None or not room.loaded:
+            return None
+        entries = room.entries
+        if after_id is not None:
+            i = room.index_of(after_id)
+            if i is None:
+                return None
+            return entries[i + 1:i + 1 + limit]
+        end = len(entries)
+        if before_id is not None:
+            end = room.index_of(before_id)
+            if end is None:
+                return None
+        if end < limit and room.has_older:
+            return None
+        return entries[max(0, end - limit):end]
+
+    def since(self, room_id: int, last_seen_id: int):
+        """Messages after `last_seen_id`, oldest first, or None on a buffer miss"""
+        with self._lock:
+            room = self.rooms.get(room_id)
+            i = room.index_of(last_seen_id) if room is not None and room.loaded else None
+            if i is None:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            return [message for _, _, message, _ in room.entries[i + 1:]]
+
+    def missed_since(self, room_id: int, last_seen_id: int, limit: int):
+        """Up to `limit` messages after `last_seen_id`, loading or querying the database (blocking)"""
+        db = ReadSessionLocal()
+        try:
+            self.load(room_id, db)
+            missed = self.since(room_id, last_seen_id)
+            if missed is not None:
+                return missed[:limit]
+            cursor_ts = (
+                db.query(Message.timestamp)
+                .filter(Message.id == last_seen_id, Message.room_id == room_id)
+                .scalar()
+            )
+            if cursor_ts is None:
+                return []
+            rows = (
+                db.query(Message, User.username)
+                .join(User, Message.user_id == User.id)
+                .filter(
+                    Message.room_id == room_id,
+                    Message.timestamp >= cursor_ts,
+                    or_(Message.timestamp > cursor_ts, Message.id > last_seen_id),
+                )
+                .order_by(Message.timestamp.asc(), Message.id.asc())
+                .limit(limit)
+                .all()
+            )
+            return [message_event(msg, username) for msg, username in rows]
+        finally:
+            db.close()
+
+    def drop(self, room_id: int):
+        with self._lock:
+            room = self.rooms.pop(room_id, None)
+            if room is not None:
+                self.total -= len(room.entries)
+
+    def invalidate(self, prefix: str = None) -> int:
+        """Drop rooms' buffers (reloaded from the database on their next read)"""
+        with self._lock:
+            room_ids = [room_id for room_id in self.rooms if key_matches(str(room_id), prefix)]
+            for room_id in room_ids:
+                self.total -= len(self.rooms.pop(room_id).entries)
+            return len(room_ids)
+
+    def cache_stats(self) -> dict:
+        with self._lock:
+            size = sum(len(entry[3]) for room in self.rooms.values() for entry in room.entries)
+            entries = self.total
+        stats = describe("lru", "<room_id>", entries, size, self.stats, max_entries=self.max_messages)
+        stats["rooms"] = len(self.rooms)
+        return stats
@@ -0,0 +1,28 @@
+"""
+Conditional GET helpers: strong ETags over response bodies and 304 handling.
+"""
+
+import hashlib
+from fastapi import Request, Response
+
+def etag_for(body: bytes) -> str:
+    """Strong ETag for a response body"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def not_modified(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match matches `etag`"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    candidates = (tag.strip() for tag in header.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+def cached_json_response(request: Request, body: bytes, etag: str, cache_control: str = "no-cache") -> Response:
+    """200 with the pre-encoded JSON body, or 304 if the client already has it"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
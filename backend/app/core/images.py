@@ -0,0 +1,151 @@
+"""
+Pictogram image proxy with a content-addressed disk cache.
+
+Originals are fetched once from ARASAAC (ARASAAC_STATIC_URL, so a local
+stand-in server works too) and stored under IMAGE_CACHE_DIR:
+
+    blobs/3f/3f9a...        image bytes, named by their sha256
+    refs/2349/96.webp       "<sha256> <media type>" of a variant
+
+Smaller variants (IMAGE_SIZES x IMAGE_FORMATS) are produced on demand from
+the original on a bounded worker pool (IMAGE_WORKERS threads), so a burst of
+new boards can't take every CPU. The sha256 doubles as a strong ETag and
+blobs never change, so responses are cacheable forever.
+
+Resizing needs Pillow (optional); without it every variant is served as the
+original 300px PNG.
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import requests
+from app.core.arasaac import STATIC_URL
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+
+IMAGE_CACHE_DIR = Path(os.getenv("IMAGE_CACHE_DIR", "./image_cache"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+IMAGE_FETCH_TIMEOUT = float(os.getenv("IMAGE_FETCH_TIMEOUT", "10"))
+IMAGE_WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+
+ORIGINAL_SIZE = 300
+IMAGE_SIZES = (96, 150, ORIGINAL_SIZE)
+IMAGE_FORMATS = {"png": "image/png", "webp": "image/webp"}
+
+class CachedImage(NamedTuple):
+    digest: str
+    media_type: str
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.digest}"'
+
+    @property
+    def path(self) -> Path:
+        return _blob_path(self.digest)
+
+    def read(self) -> bytes:
+        return self.path.read_bytes()
+
+_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image")
+
+# Striped locks: concurrent misses for the same variant fetch/resize once
+# (never held two at a time, so stripes can't deadlock)
+_key_locks = [threading.Lock() for _ in range(64)]
+
+def _key_lock(picto_id: int, size: int, fmt: str):
+    return _key_locks[hash((picto_id, size, fmt)) % len(_key_locks)]
+
+def _blob_path(digest: str) -> Path:
+    return IMAGE_CACHE_DIR / "blobs" / digest[:2] / digest
+
+def _ref_path(picto_id: int, size: int, fmt: str) -> Path:
+    return IMAGE_CACHE_DIR / "refs" / str(picto_id) / f"{size}.{fmt}"
+
+def _write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def _store(data: bytes, media_type: str) -> CachedImage:
+    digest = hashlib.sha256(data).hexdigest()
+    path = _blob_path(digest)
+    if not path.exists():
+        _write_atomic(path, data)
+    return CachedImage(digest, media_type)
+
+def lookup(picto_id: int, size: int, fmt: str) -> Optional[CachedImage]:
+    """Cached variant, or None (no network, no resizing)"""
+    try:
+        digest, media_type = _ref_path(picto_id, size, fmt).read_text().split()
+    except (FileNotFoundError, ValueError):
+        return None
+    return CachedImage(digest, media_type)
+
+def _fetch_original(picto_id: int) -> Optional[CachedImage]:
+    with _key_lock(picto_id, ORIGINAL_SIZE, "png"):
+        cached = lookup(picto_id, ORIGINAL_SIZE, "png")
+        if cached is not None:
+            return cached
+        response = requests.get(f"{STATIC_URL}/{picto_id}/{picto_id}_{ORIGINAL_SIZE}.png", timeout=IMAGE_FETCH_TIMEOUT)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        image = _store(response.content, "image/png")
+        _write_atomic(_ref_path(picto_id, ORIGINAL_SIZE, "png"), f"{image.digest} {image.media_type}".encode())
+        return image
+
+def _resize(data: bytes, size: int, fmt: str) -> bytes:
+    with Image.open(io.BytesIO(data)) as img:
+        img = img.convert("RGBA")
+        img.thumbnail((size, size), Image.LANCZOS)
+        out = io.BytesIO()
+        if fmt == "webp":
+            img.save(out, "WEBP", quality=IMAGE_WEBP_QUALITY, method=4)
+        else:
+            img.save(out, "PNG", optimize=True)
+    return out.getvalue()
+
+def _build(picto_id: int, size: int, fmt: str) -> Optional[CachedImage]:
+    original = _fetch_original(picto_id)
+    if original is None or (size, fmt) == (ORIGINAL_SIZE, "png"):
+        return original
+    with _key_lock(picto_id, size, fmt):
+        cached = lookup(picto_id, size, fmt)
+        if cached is not None:
+            return cached
+        if Image is None:
+            image = original
+        else:
+            image = _store(_resize(original.read(), size, fmt), IMAGE_FORMATS[fmt])
+        _write_atomic(_ref_path(picto_id, size, fmt), f"{image.digest} {image.media_type}".encode())
+        return image
+
+async def get_image(picto_id: int, size: int, fmt: str) -> Optional[CachedImage]:
+    """
+    A pictogram variant, fetching and resizing it on a miss.
+
+    Returns None if ARASAAC has no such pictogram; network errors raise
+    requests.RequestException.
+    """
+    cached = lookup(picto_id, size, fmt)
+    if cached is not None:
+        return cached
+    return await asyncio.get_running_loop().run_in_executor(_executor, _build, picto_id, size, fmt)
@@ -0,0 +1,255 @@
+"""
+Per-language recommendation resources, loaded lazily under a memory budget.
+
+Every supported language has its own bundle:
+
+    n-gram model      app/models_ml/ngram_{lang}.pkl (Spanish: ngram.pkl)
+    fallback tables   app/models_ml/fallback_{lang}.json (Spanish: app/core/fallback.py)
+    pictogram cache   ARASAAC search results for words in that language
+
+A bundle is loaded on the first request in its language. Its estimated size
+(deep getsizeof of the model and tables, plus cached pictogram results)
+counts against LANGUAGE_MEMORY_BUDGET_MB; when the total goes over, the
+least recently used languages are unloaded and simply reload on their next
+request. The default language is never evicted.
+
+A language without a model file still works: it gets an empty predictor and
+recommendations come from its fallback tables.
+
+With NGRAM_SHARED_MODEL=1 models are memory-mapped instead (see
+app/core/ngram_mmap.py); their pages are shared by all workers and do not
+count against the budget.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict
+from app.core.cache_registry import CacheStats, describe, key_matches, registry as cache_registry
+from app.core.fallback import FallbackTables, SPANISH_TABLES, load_fallback_tables
+from app.core.ngram_predictor import NGramPredictor
+from app.core.ngram_mmap import NGRAM_SHARED_MODEL, MappedNGramPredictor, load_shared_predictor
+
+SUPPORTED_LANGUAGES = tuple(
+    code.strip() for code in os.getenv("SUPPORTED_LANGUAGES", "es,ca,gl,en").split(",") if code.strip()
+)
+DEFAULT_LANGUAGE = os.getenv("DEFAULT_LANGUAGE", "es")
+LANGUAGE_MEMORY_BUDGET_MB = float(os.getenv("LANGUAGE_MEMORY_BUDGET_MB", "64"))
+PICTOGRAM_CACHE_SIZE = int(os.getenv("PICTOGRAM_CACHE_SIZE", "512"))  # entries per language
+
+MODEL_DIR = Path(__file__).parent.parent / "models_ml"
+MODEL_FILES = {"es": "ngram.pkl"}  # pre-multi-language name of the Spanish model
+
+def is_supported(lang: str) -> bool:
+    return lang in SUPPORTED_LANGUAGES
+
+def deep_sizeof(obj) -> int:
+    """Approximate memory of an object graph of dicts, lists, sets, tuples and scalars"""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
+
+class PictogramCache:
+    """Thread-safe LRU of ARASAAC search results for one language, with a byte count"""
+
+    def __init__(self, max_entries: int, on_grow=None, stats: CacheStats = None, namespace: str = ""):
+        self.max_entries = max_entries
+        self.bytes = 0
+        self.stats = stats or CacheStats()  # shared by all languages
+        self.namespace = namespace  # registry keys are "<namespace>:<word>"
+        self._entries = OrderedDict()  # word -> (result, size)
+        self._lock = threading.Lock()
+        self._on_grow = on_grow
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, word: str):
+        """(True, result) on a hit, (False, None) on a miss"""
+        with self._lock:
+            entry = self._entries.get(word)
+            if entry is None:
+                self.stats.misses += 1
+                return False, None
+            self._entries.move_to_end(word)
+            self.stats.hits += 1
+            return True, entry[0]
+
+    def peek(self, word: str):
+        """Like get(), without counting a lookup or refreshing recency"""
+        with self._lock:
+            entry = self._entries.get(word)
+        return (False, None) if entry is None else (True, entry[0])
+
+    def put(self, word: str, result):
+        size = deep_sizeof(result)
+        with self._lock:
+            old = self._entries.pop(word, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[word] = (result, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.stats.evictions += 1
+        if self._on_grow is not None:
+            self._on_grow()
+
+    def invalidate(self, prefix: str = None) -> int:
+        with self._lock:
+            words = [word for word in self._entries if key_matches(f"{self.namespace}:{word}", prefix)]
+            for word in words:
+                self.bytes -= self._entries.pop(word)[1]
+            return len(words)
+
+class LanguageResources:
+    def __init__(self, code: str, predictor, fallback: FallbackTables, on_grow=None, pictogram_stats=None):
+        self.code = code
+        self.predictor = predictor
+        self.fallback = fallback
+        self.pictograms = PictogramCache(PICTOGRAM_CACHE_SIZE, on_grow=on_grow, stats=pictogram_stats, namespace=code)
+        if isinstance(predictor, MappedNGramPredictor):
+            self.mapped_bytes = predictor.mapped_bytes
+            model_bytes = 0  # page cache, shared with the other workers
+        else:
+            self.mapped_bytes = 0
+            model_bytes = deep_sizeof((predictor.trigrams, predictor.fourgrams, predictor.vocab))
+        self.static_bytes = model_bytes + deep_sizeof(tuple(fallback))
+
+    @property
+    def bytes(self) -> int:
+        return self.static_bytes + self.pictograms.bytes
+
+def load_language(code: str, on_grow=None, pictogram_stats=None) -> LanguageResources:
+    """Read a language's model and fallback tables from disk (blocking)"""
+    model_path = MODEL_DIR / MODEL_FILES.get(code, f"ngram_{code}.pkl")
+    if model_path.exists():
+        predictor = load_shared_predictor(model_path) if NGRAM_SHARED_MODEL else NGramPredictor(model_path)
+    else:
+        print(f"⚠️  N-gram model for '{code}' not found ({model_path.name}); using fallback tables only")
+        predictor = NGramPredictor()
+
+    if code == "es":
+        fallback = SPANISH_TABLES
+    else:
+        tables_path = MODEL_DIR / f"fallback_{code}.json"
+        fallback = load_fallback_tables(tables_path) if tables_path.exists() else FallbackTables([], {}, [])
+    return LanguageResources(code, predictor, fallback, on_grow=on_grow, pictogram_stats=pictogram_stats)
+
+class LanguageRegistry:
+    """
+    Loaded languages (registered as cache "languages", keys: language code).
+
+    The pictogram caches of all loaded languages are reported together as
+    cache "pictograms" (see app/core/arasaac.py).
+    """
+
+    def __init__(self, budget_bytes: int = int(LANGUAGE_MEMORY_BUDGET_MB * 1024 * 1024), loader=load_language):
+        self.budget_bytes = budget_bytes
+        self.loader = loader
+        self.stats = CacheStats()
+        self.pictogram_stats = CacheStats()
+        self._loaded: Dict[str, LanguageResources] = OrderedDict()  # least recently used first
+        self._lock = threading.Lock()
+        self._load_locks = {code: threading.Lock() for code in SUPPORTED_LANGUAGES}
+
+    def get(self, lang: str = None) -> LanguageResources:
+        """Resources of a supported language, loading it on first use"""
+        lang = lang or DEFAULT_LANGUAGE
+        if not is_supported(lang):
+            raise ValueError(f"Unsupported language: {lang}")
+        with self._lock:
+            resources = self._loaded.get(lang)
+            if resources is not None:
+                self._loaded.move_to_end(lang)
+                self.stats.hits += 1
+                return resources
+        # Load outside the registry lock: other languages stay available meanwhile
+        with self._load_locks[lang]:
+            with self._lock:
+                resources = self._loaded.get(lang)
+            if resources is None:
+                self.stats.misses += 1
+                resources = self.loader(
+                    lang, on_grow=lambda: self.enforce_budget(keep=lang), pictogram_stats=self.pictogram_stats
+                )
+                with self._lock:
+                    self._loaded[lang] = resources
+                shared = f", {resources.mapped_bytes / 1e6:.1f} MB shared" if resources.mapped_bytes else ""
+                print(f"🌐 Loaded language '{lang}' (~{resources.bytes / 1e6:.1f} MB{shared})")
+        self.enforce_budget(keep=lang)
+        return resources
+
+    def is_loaded(self, lang: str = None) -> bool:
+        """True if get(lang) would not have to load anything"""
+        with self._lock:
+            return (lang or DEFAULT_LANGUAGE) in self._loaded
+
+    def enforce_budget(self, keep: str = None):
+        """Unload least recently used languages until the total fits the budget"""
+        with self._lock:
+            total = sum(resources.bytes for resources in self._loaded.values())
+            for code in list(self._loaded):
+                if total <= self.budget_bytes:
+                    break
+                if code in (keep, DEFAULT_LANGUAGE):
+                    continue
+                total -= self._loaded.pop(code).bytes
+                self.stats.evictions += 1
+                print(f"🌐 Unloaded language '{code}' (memory budget)")
+
+    def invalidate(self, prefix: str = None) -> int:
+        """Unload languages (they reload on their next request)"""
+        with self._lock:
+            codes = [code for code in self._loaded if key_matches(code, prefix)]
+            for code in codes:
+                del self._loaded[code]
+        return len(codes)
+
+    def invalidate_pictograms(self, prefix: str = None) -> int:
+        with self._lock:
+            loaded = list(self._loaded.values())
+        return sum(resources.pictograms.invalidate(prefix) for resources in loaded)
+
+    def cache_stats(self) -> dict:
+        with self._lock:
+            loaded = list(self._loaded.values())
+        stats = describe(
+            "lru", "<lang>", len(loaded), sum(resources.bytes for resources in loaded), self.stats,
+            max_bytes=self.budget_bytes,
+        )
+        stats["languages"] = {
+            resources.code: {"bytes": resources.bytes, "mapped_bytes": resources.mapped_bytes}
+            for resources in loaded
+        }
+        return stats
+
+    def pictogram_cache_stats(self) -> dict:
+        with self._lock:
+            loaded = list(self._loaded.values())
+        return describe(
+            "lru", "<lang>:<word>",
+            sum(len(resources.pictograms) for resources in loaded),
+            sum(resources.pictograms.bytes for resources in loaded),
+            self.pictogram_stats, max_entries=PICTOGRAM_CACHE_SIZE * len(SUPPORTED_LANGUAGES),
+        )
+
+registry = cache_registry.register("languages", LanguageRegistry())
+
+def get_language(lang: str = None) -> LanguageResources:
+    return registry.get(lang)
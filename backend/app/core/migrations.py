@@ -0,0 +1,293 @@
+"""
+Idempotent schema migrations for existing databases.
+
+`Base.metadata.create_all` only creates missing tables, so new indexes and
+columns on tables that already exist (an old chat.db, a populated Postgres)
+are added here. Each migration runs once and is recorded in
+schema_migrations; every step also checks the live schema so it is safe on
+databases that were created fresh with the new models.
+
+Run automatically from init_db(), or ahead of a deploy with
+`python scripts/migrate_db.py`. Workers that start together take turns:
+create_all and the migrations run under schema_lock(), so only the first
+one changes the schema and the rest find the migrations recorded. DDL that
+fails because the table, index or column already exists (e.g. created by a
+worker of an older version) counts as applied.
+"""
+
+import os
+import socket
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import Table, Column, Float, Integer, String, DateTime, inspect, select, insert, delete, text
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from app.core.database import Base
+
+# A lock left behind by a crashed worker (SQLite) is taken over after this long
+MIGRATION_LOCK_TIMEOUT = int(os.getenv("MIGRATION_LOCK_TIMEOUT", "600"))
+MIGRATION_LOCK_KEY = 7300031  # pg_advisory_lock key
+
+schema_migrations = Table(
+    "schema_migrations",
+    Base.metadata,
+    Column("name", String, primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# SQLite has no advisory locks: the holder of row 1 runs the migrations
+schema_lock_rows = Table(
+    "schema_lock",
+    Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("holder", String, nullable=False),
+    Column("acquired_at", Float, nullable=False),
+)
+
+MIGRATIONS = []  # [(name, fn(engine))] in order
+
+def migration(name):
+    """Register a migration function under a unique name"""
+    def decorator(fn):
+        MIGRATIONS.append((name, fn))
+        return fn
+    return decorator
+
+def already_exists(error: DBAPIError) -> bool:
+    """DDL failed because another process created the object first"""
+    message = str(error.orig).lower()
+    return "already exists" in message or "duplicate column" in message
+
+@contextmanager
+def schema_lock(engine):
+    """Hold the cross-process schema lock (advisory lock on Postgres, lock row on SQLite)"""
+    if engine.dialect.name == "postgresql":
+        # Autocommit: an open transaction here would block CREATE INDEX CONCURRENTLY
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        return
+    if engine.dialect.name != "sqlite":
+        yield
+        return
+    try:
+        schema_lock_rows.create(bind=engine, checkfirst=True)
+    except DBAPIError as e:
+        if not already_exists(e):
+            raise
+    holder = f"{socket.gethostname()}:{os.getpid()}"
+    waiting = False
+    while not _take_sqlite_lock(engine, holder):
+        if not waiting:
+            print("⏳ Waiting for another worker to finish the schema migrations")
+            waiting = True
+        time.sleep(0.2)
+    try:
+        yield
+    finally:
+        with engine.begin() as conn:
+            conn.execute(delete(schema_lock_rows).where(schema_lock_rows.c.holder == holder))
+
+def _take_sqlite_lock(engine, holder: str) -> bool:
+    """Claim the lock row if free (or stale); BEGIN EXCLUSIVE makes the check and claim atomic"""
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("BEGIN EXCLUSIVE")
+        try:
+            cursor.execute("SELECT acquired_at FROM schema_lock WHERE id = 1")
+            row = cursor.fetchone()
+            now = time.time()
+            if row is not None and now - row[0] < MIGRATION_LOCK_TIMEOUT:
+                cursor.execute("ROLLBACK")
+                return False
+            cursor.execute(
+                "INSERT OR REPLACE INTO schema_lock (id, holder, acquired_at) VALUES (1, ?, ?)",
+                (holder, now),
+            )
+            cursor.execute("COMMIT")
+            return True
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+    finally:
+        connection.close()
+
+def _has_index(engine, table_name, index_name):
+    return any(ix["name"] == index_name for ix in inspect(engine).get_indexes(table_name))
+
+def add_column(engine, table_name, column):
+    """ALTER TABLE ... ADD COLUMN for a model column missing from an existing table"""
+    existing = {col["name"] for col in inspect(engine).get_columns(table_name)}
+    if column.name in existing:
+        return
+    ddl = f"ALTER TABLE {table_name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT {column.server_default.arg}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(ddl))
+    except DBAPIError as e:
+        if not already_exists(e):
+            raise
+
+def create_index(engine, index):
+    """Create an index if missing; on Postgres build it CONCURRENTLY so writes continue"""
+    if _has_index(engine, index.table.name, index.name):
+        return
+    if engine.dialect.name == "postgresql":
+        columns = ", ".join(col.name for col in index.columns)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index.name} ON {index.table.name} ({columns})"
+            ))
+        return
+    try:
+        index.create(bind=engine, checkfirst=True)
+    except DBAPIError as e:
+        if not already_exists(e):
+            raise
+
+@migration("0001_messages_room_timestamp_id_index")
+def _messages_room_timestamp_id_index(engine):
+    from app.models.chat import Message
+    for index in Message.__table__.indexes:
+        if index.name == "ix_messages_room_timestamp_id":
+            create_index(engine, index)
+
+@migration("0002_chat_rooms_activity_summary")
+def _chat_rooms_activity_summary(engine):
+    from app.models.chat import ChatRoom
+    from app.core.rooms import message_preview
+    import json
+
+    table = ChatRoom.__table__
+    for name in ("message_count", "last_message_id", "last_message_preview", "last_activity_at"):
+        add_column(engine, "chat_rooms", table.c[name])
+    for index in table.indexes:
+        if index.name == "ix_chat_rooms_last_activity_id":
+            create_index(engine, index)
+
+    # Backfill counters and activity time with one aggregated statement
+    with engine.begin() as conn:
+        conn.execute(text(
+            "UPDATE chat_rooms SET "
+            " message_count = (SELECT COUNT(*) FROM messages m WHERE m.room_id = chat_rooms.id),"
+            " last_activity_at = COALESCE("
+            "   (SELECT MAX(m.timestamp) FROM messages m WHERE m.room_id = chat_rooms.id),"
+            "   chat_rooms.created_at)"
+        ))
+        # Last message per room (one indexed lookup per room, once)
+        room_ids = conn.execute(text("SELECT id FROM chat_rooms")).scalars().all()
+        for room_id in room_ids:
+            row = conn.execute(text(
+                "SELECT id, content FROM messages WHERE room_id = :room "
+                "ORDER BY timestamp DESC, id DESC LIMIT 1"
+            ), {"room": room_id}).first()
+            if row is None:
+                continue
+            try:
+                preview = message_preview(json.loads(row.content))
+            except (TypeError, ValueError):
+                preview = ""
+            conn.execute(text(
+                "UPDATE chat_rooms SET last_message_id = :mid, last_message_preview = :preview WHERE id = :room"
+            ), {"mid": row.id, "preview": preview, "room": room_id})
+
+@migration("0003_messages_compact_pictos")
+def _messages_compact_pictos(engine, batch_size=1000):
+    from app.models.chat import Message
+    import json
+
+    add_column(engine, "messages", Message.__table__.c.pictos)
+
+    # Convert legacy JSON rows to the packed form in id-ordered batches
+    last_id = 0
+    converted = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text(
+                "SELECT id, content FROM messages "
+                "WHERE id > :last AND pictos IS NULL ORDER BY id LIMIT :limit"
+            ), {"last": last_id, "limit": batch_size}).fetchall()
+            if not rows:
+                break
+            updates = []
+            for row in rows:
+                try:
+                    pictograms = json.loads(row.content)
+                except (TypeError, ValueError):
+                    continue
+                if not isinstance(pictograms, list):
+                    continue  # Valid JSON but not a pictogram list: leave it as is
+                content, pictos = Message.encode_pictograms(pictograms)
+                if pictos is not None:
+                    updates.append({"id": row.id, "content": content, "pictos": pictos})
+            if updates:
+                conn.execute(
+                    text("UPDATE messages SET content = :content, pictos = :pictos WHERE id = :id"),
+                    updates,
+                )
+            converted += len(updates)
+            last_id = rows[-1].id
+    print(f"   {converted} messages converted to compact pictos")
+
+@migration("0004_message_search_index")
+def _message_search_index(engine):
+    from app.core.search import create_search_index
+
+    create_search_index(engine)
+    with engine.connect() as conn:
+        has_messages = conn.execute(text("SELECT 1 FROM messages LIMIT 1")).first() is not None
+    if has_messages:
+        print("   Existing messages are not indexed yet: run python scripts/backfill_search.py")
+
+@migration("0005_message_search_scope")
+def _message_search_scope(engine):
+    from app.core.search import upgrade_search_index
+
+    upgrade_search_index(engine)
+
+@migration("0006_message_search_timestamp")
+def _message_search_timestamp(engine):
+    from app.core.search import upgrade_search_index
+
+    upgrade_search_index(engine)
+
+def create_tables(engine):
+    """create_all, tolerating tables created concurrently by a process outside the lock"""
+    for table in Base.metadata.sorted_tables:
+        try:
+            table.create(bind=engine, checkfirst=True)
+        except DBAPIError as e:
+            if not already_exists(e):
+                raise
+
+def migrate(engine):
+    """Create missing tables and apply pending migrations, one process at a time"""
+    with schema_lock(engine):
+        create_tables(engine)
+        run_migrations(engine)
+
+def run_migrations(engine):
+    """Apply every registered migration that has not run on this database yet"""
+    schema_migrations.create(bind=engine, checkfirst=True)
+    # Read under the lock: whatever an earlier worker applied is recorded by now
+    with engine.connect() as conn:
+        applied = set(conn.execute(select(schema_migrations.c.name)).scalars())
+
+    for name, fn in MIGRATIONS:
+        if name in applied:
+            continue
+        print(f"🔧 Applying migration {name}")
+        fn(engine)
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(schema_migrations).values(name=name, applied_at=datetime.utcnow()))
+        except IntegrityError:
+            pass  # Recorded by a process that migrated without the lock
@@ -0,0 +1,237 @@
+"""
+Read-only, memory-mapped n-gram model shared by all worker processes.
+
+The pickled model becomes ~6.6 MB of dicts and Counters in every worker.
+`uvicorn --workers` spawns fresh interpreters, so nothing is inherited,
+and even with a pre-forking server the copy-on-write pages would not stay
+shared, because reference counting writes to every object it touches.
+
+With NGRAM_SHARED_MODEL=1 the pickle is compiled once into a flat file
+(ngram.pkl -> ngram.mmap) of sorted arrays and every worker mmaps it.
+The pages live in the OS page cache and are shared by all processes. A
+lookup is a binary search on key hashes, and only the words it returns
+become Python objects.
+
+File layout, after an 8-byte magic and a length-prefixed JSON header
+(source version, byte order, section offsets):
+
+    words           uint32 offsets + UTF-8 blob, indexed by word id
+    per order       uint64 key hashes (sorted), uint32 key offsets,
+                    uint32 prediction offsets, key blob, uint32 word ids
+                    (each context's followers in Counter.most_common order)
+
+The file is rebuilt when it is missing or was compiled from another
+version of the pickle. Workers that race to build it write to their own
+temporary file and rename, so readers never see a partial file. Build it
+ahead of time (scripts/build_shared_model.py) so workers never have to
+unpickle the model at all.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+NGRAM_SHARED_MODEL = os.getenv("NGRAM_SHARED_MODEL", "0") == "1"
+
+MAGIC = b"NGRMMAP1"
+ORDERS = ("fourgrams", "trigrams")
+SPECIAL_TOKENS = ("<START>", "<END>")
+KEY_SEPARATOR = "\x1f"
+
+def _key_hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+def _encode_key(context) -> bytes:
+    return KEY_SEPARATOR.join(context).encode("utf-8")
+
+def shared_model_path(model_path) -> Path:
+    return Path(model_path).with_suffix(".mmap")
+
+def source_version(raw: bytes) -> str:
+    """Same version string as NGramPredictor, so cache keys and ETags match"""
+    return hashlib.sha256(raw).hexdigest()[:12]
+
+def compile_model(model_path, out_path=None) -> Path:
+    """Compile a pickled model into the shared format (atomic replace)"""
+    model_path = Path(model_path)
+    out_path = Path(out_path) if out_path else shared_model_path(model_path)
+    raw = model_path.read_bytes()
+    data = pickle.loads(raw)
+
+    word_ids = {}
+    words = []
+
+    def word_id(word):
+        if word not in word_ids:
+            word_ids[word] = len(words)
+            words.append(word)
+        return word_ids[word]
+
+    sections = []  # (name, bytes)
+    for order in ORDERS:
+        entries = []
+        for context, counter in data.get(order, {}).items():
+            key = _encode_key(context)
+            followers = [word_id(word) for word, _ in counter.most_common()]
+            entries.append((_key_hash(key), key, followers))
+        entries.sort(key=lambda entry: (entry[0], entry[1]))
+
+        hashes, key_offsets, pred_offsets, preds = array("Q"), array("I", [0]), array("I", [0]), array("I")
+        keys = bytearray()
+        for key_hash, key, followers in entries:
+            hashes.append(key_hash)
+            keys += key
+            key_offsets.append(len(keys))
+            preds.extend(followers)
+            pred_offsets.append(len(preds))
+        sections += [
+            (f"{order}.hashes", hashes.tobytes()),
+            (f"{order}.key_offsets", key_offsets.tobytes()),
+            (f"{order}.pred_offsets", pred_offsets.tobytes()),
+            (f"{order}.keys", bytes(keys)),
+            (f"{order}.preds", preds.tobytes()),
+        ]
+
+    word_offsets = array("I", [0])
+    word_blob = bytearray()
+    for word in words:
+        word_blob += word.encode("utf-8")
+        word_offsets.append(len(word_blob))
+    sections += [("words.offsets", word_offsets.tobytes()), ("words.blob", bytes(word_blob))]
+
+    header = {"version": source_version(raw), "byteorder": sys.byteorder, "sections": {}}
+    # Section offsets depend on the header length and vice versa
+    encoded = b""
+    while True:
+        offset = _align(len(MAGIC) + 4 + len(encoded))
+        for name, payload in sections:
+            header["sections"][name] = [offset, len(payload)]
+            offset = _align(offset + len(payload))
+        previous, encoded = encoded, json.dumps(header).encode()
+        if len(encoded) == len(previous):
+            break
+
+    fd, tmp_path = tempfile.mkstemp(dir=out_path.parent, prefix=out_path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC + struct.pack("<I", len(encoded)) + encoded)
+            for name, payload in sections:
+                f.seek(header["sections"][name][0])
+                f.write(payload)
+            f.truncate(_align(f.tell()))
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return out_path
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+def read_header(path) -> dict:
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a shared n-gram model: {path}")
+        (length,) = struct.unpack("<I", f.read(4))
+        return json.loads(f.read(length))
+
+class _Table:
+    """Zero-copy views of one n-gram order"""
+
+    def __init__(self, view: memoryview, sections: dict, order: str):
+        def section(name, fmt):
+            offset, length = sections[f"{order}.{name}"]
+            part = view[offset:offset + length]
+            return part.cast(fmt) if fmt != "B" else part
+        self.hashes = section("hashes", "Q")
+        self.key_offsets = section("key_offsets", "I")
+        self.pred_offsets = section("pred_offsets", "I")
+        self.keys = section("keys", "B")
+        self.preds = section("preds", "I")
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def followers(self, context):
+        """Word ids following `context`, most frequent first, or None"""
+        key = _encode_key(context)
+        key_hash = _key_hash(key)
+        hashes = self.hashes
+        index = bisect_left(hashes, key_hash)
+        while index < len(hashes) and hashes[index] == key_hash:
+            if self.keys[self.key_offsets[index]:self.key_offsets[index + 1]] == key:
+                return self.preds[self.pred_offsets[index]:self.pred_offsets[index + 1]]
+            index += 1
+        return None
+
+class MappedNGramPredictor:
+    """Drop-in NGramPredictor backed by a shared memory map"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        header = read_header(self.path)
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(f"{self.path.name} was built on a {header['byteorder']}-endian host")
+        self.version = header["version"]
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        sections = header["sections"]
+        self.fourgrams = _Table(view, sections, "fourgrams")
+        self.trigrams = _Table(view, sections, "trigrams")
+        offset, length = sections["words.offsets"]
+        self._word_offsets = view[offset:offset + length].cast("I")
+        offset, length = sections["words.blob"]
+        self._word_blob = view[offset:offset + length]
+
+    @property
+    def mapped_bytes(self) -> int:
+        return len(self._map)
+
+    def _words(self, ids, limit):
+        offsets, blob = self._word_offsets, self._word_blob
+        words = (str(blob[offsets[i]:offsets[i + 1]], "utf-8") for i in ids[:limit])
+        return [word for word in words if word not in SPECIAL_TOKENS]
+
+    def predict(self, context_words, top_k=15):
+        """Same results as NGramPredictor.predict"""
+        if not context_words:
+            return []
+
+        context = [w.lower() for w in context_words]
+
+        if len(context) >= 3:
+            ids = self.fourgrams.followers(context[-3:])
+            if ids is not None:
+                filtered = self._words(ids, top_k * 2)
+                if len(filtered) >= top_k // 2:
+                    return filtered[:top_k]
+
+        if len(context) >= 2:
+            ids = self.trigrams.followers(context[-2:])
+            if ids is not None:
+                return self._words(ids, top_k * 2)[:top_k]
+
+        return []
+
+def load_shared_predictor(model_path) -> MappedNGramPredictor:
+    """Map the compiled model, (re)building it if it is missing or stale"""
+    model_path = Path(model_path)
+    path = shared_model_path(model_path)
+    version = source_version(model_path.read_bytes())
+    try:
+        current = read_header(path)["version"] == version if path.exists() else False
+    except (ValueError, struct.error):  # truncated or not ours
+        current = False
+    if not current:
+        print(f"🧩 Compiling shared n-gram model {path.name}...")
+        compile_model(model_path, path)
+    return MappedNGramPredictor(path)
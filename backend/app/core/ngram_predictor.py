@@ -3,6 +3,7 @@ Predictor N-gram para uso en producción.
 Carga modelo pre-entrenado y realiza predicciones rápidas.
 """
 
+import hashlib
 import pickle
 from pathlib import Path
 from collections import defaultdict, Counter
@@ -14,6 +15,7 @@ class NGramPredictor:
         self.trigrams = defaultdict(Counter)
         self.fourgrams = defaultdict(Counter)
         self.vocab = set()
+        self.version = "empty"  # hash del fichero del modelo (claves de caché)
         
         if model_path:
             self.load(model_path)
@@ -24,8 +26,9 @@ class NGramPredictor:
         if not path.exists():
             raise FileNotFoundError(f"Modelo no encontrado: {path}")
         
-        with open(path, 'rb') as f:
-            data = pickle.load(f)
+        raw = path.read_bytes()
+        data = pickle.loads(raw)
+        self.version = hashlib.sha256(raw).hexdigest()[:12]
         
         self.trigrams = defaultdict(Counter, data.get('trigrams', {}))
         self.fourgrams = defaultdict(Counter, data.get('fourgrams', {}))
@@ -66,25 +69,15 @@ class NGramPredictor:
         
         return []
 
-# Singleton global
-_ngram_predictor = None
+def get_ngram_predictor(lang=None):
+    """Predictor del idioma (por defecto el principal), cargado en el primer uso"""
+    from app.core.languages import get_language
+    return get_language(lang).predictor
 
-def get_ngram_predictor():
-    """Obtiene instancia global del predictor"""
-    global _ngram_predictor
-    if _ngram_predictor is None:
-        model_path = Path(__file__).parent.parent / "models_ml" / "ngram.pkl"
-        if model_path.exists():
-            _ngram_predictor = NGramPredictor(model_path)
-        else:
-            print(f"⚠️  Modelo N-gram no encontrado: {model_path}")
-            _ngram_predictor = NGramPredictor()  # Predictor vacío
-    return _ngram_predictor
-
-def predict_next_words_ngram(context, num_words=15):
+def predict_next_words_ngram(context, num_words=15, lang=None):
     """Función de conveniencia para predicción"""
     if isinstance(context, str):
         context = context.split()
     
-    predictor = get_ngram_predictor()
+    predictor = get_ngram_predictor(lang)
     return predictor.predict(context, top_k=num_words)
@@ -0,0 +1,136 @@
+"""
+Password hashing service.
+
+Hashes use a salted KDF (scrypt by default, PBKDF2-SHA256 as an option)
+stored with their algorithm and parameters:
+
+    scrypt$n=16384,r=8,p=1$<salt>$<hash>
+    pbkdf2_sha256$i=600000$<salt>$<hash>
+
+Legacy unsalted SHA-256 hex digests still verify, and `verify()` reports
+that they need rehashing so login can upgrade them transparently.
+
+KDF work runs in a bounded thread pool (hashlib releases the GIL for both
+KDFs). When more than PASSWORD_MAX_PENDING hashes are queued or running,
+new requests fail fast with HashingOverloaded (503) instead of piling up
+during a classroom-wide login.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+
+PASSWORD_HASH_ALGORITHM = os.getenv("PASSWORD_HASH_ALGORITHM", "scrypt")
+SCRYPT_PARAMS = {
+    "n": int(os.getenv("SCRYPT_N", str(2 ** 14))),
+    "r": int(os.getenv("SCRYPT_R", "8")),
+    "p": int(os.getenv("SCRYPT_P", "1")),
+}
+PBKDF2_ITERATIONS = int(os.getenv("PBKDF2_ITERATIONS", "600000"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", str(PASSWORD_WORKERS * 8)))
+
+class HashingOverloaded(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login requests, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+def _parse_params(text: str) -> dict:
+    return {key: int(value) for key, value in (item.split("=") for item in text.split(","))}
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024, dklen=32)
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+
+def compute_hash(password: str, algorithm: str = None) -> str:
+    """Hash a password with the configured KDF (CPU-heavy; call through the hasher)"""
+    algorithm = algorithm or PASSWORD_HASH_ALGORITHM
+    salt = secrets.token_bytes(16)
+    if algorithm == "scrypt":
+        params = SCRYPT_PARAMS
+        digest = _scrypt(password, salt, **params)
+        return f"scrypt$n={params['n']},r={params['r']},p={params['p']}${_b64(salt)}${_b64(digest)}"
+    if algorithm == "pbkdf2_sha256":
+        digest = _pbkdf2(password, salt, PBKDF2_ITERATIONS)
+        return f"pbkdf2_sha256$i={PBKDF2_ITERATIONS}${_b64(salt)}${_b64(digest)}"
+    raise ValueError(f"Unknown password hash algorithm: {algorithm}")
+
+def needs_rehash(stored: str) -> bool:
+    """True for legacy hashes or hashes made with other algorithms/parameters"""
+    if "$" not in stored:
+        return True
+    algorithm, params, _, _ = stored.split("$")
+    if algorithm != PASSWORD_HASH_ALGORITHM:
+        return True
+    if algorithm == "scrypt":
+        return _parse_params(params) != SCRYPT_PARAMS
+    return _parse_params(params) != {"i": PBKDF2_ITERATIONS}
+
+def check_password(password: str, stored: str) -> bool:
+    """Verify a password against any supported stored format (CPU-heavy)"""
+    if "$" not in stored:
+        # Legacy: unsalted SHA-256 hex digest
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored)
+    try:
+        algorithm, params, salt, expected = stored.split("$")
+        salt, expected = _unb64(salt), _unb64(expected)
+        if algorithm == "scrypt":
+            digest = _scrypt(password, salt, **_parse_params(params))
+        elif algorithm == "pbkdf2_sha256":
+            digest = _pbkdf2(password, salt, _parse_params(params)["i"])
+        else:
+            return False
+    except ValueError:
+        return False
+    return hmac.compare_digest(digest, expected)
+
+class PasswordHasher:
+    """Runs KDF work in a bounded pool with a cap on queued + running jobs"""
+
+    def __init__(self, workers: int = PASSWORD_WORKERS, max_pending: int = PASSWORD_MAX_PENDING):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-kdf")
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def _release(self, _future):
+        with self._lock:
+            self.pending -= 1
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise HashingOverloaded()
+            self.pending += 1
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(self._release)
+        return future.result()
+
+    def hash(self, password: str) -> str:
+        return self._run(compute_hash, password)
+
+    def verify(self, password: str, stored: str):
+        """Returns (matches, needs_rehash)"""
+        ok = self._run(check_password, password, stored)
+        return ok, ok and needs_rehash(stored)
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,189 @@
+"""
+Write-behind persistence for chat messages.
+
+The WebSocket handler takes an id from IdAllocator, enqueues the row and
+broadcasts right away; MessageWriter batches the queued rows into multi-row
+INSERTs on the database writer thread (see run_write). A batch is flushed when it reaches `batch_size`
+rows or `max_delay` seconds after its first row, and stop() drains the queue
+so shutdown does not lose accepted messages.
+
+Only transient failures (locked database, lost connection) are retried,
+with the backoff awaited on the event loop so the writer thread stays free.
+Any other failure means some row is bad (e.g. a foreign key to a deleted
+room): the batch is then inserted row by row and only the bad rows are
+logged and skipped.
+"""
+
+import asyncio
+import os
+import threading
+from sqlalchemy import Table, Column, String, Integer, select, update, insert, func
+from sqlalchemy.exc import DBAPIError, IntegrityError, OperationalError
+from app.core.database import Base, engine, run_write
+
+# hi/lo id allocation: each worker reserves a block of ids with one UPDATE
+id_blocks = Table(
+    "id_blocks",
+    Base.metadata,
+    Column("name", String, primary_key=True),
+    Column("next_id", Integer, nullable=False),
+)
+
+class IdAllocator:
+    """Hands out ids from blocks reserved in id_blocks, safe across workers"""
+
+    def __init__(self, table, block_size: int = 100):
+        self.table = table
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def _reserve_block(self):
+        name = self.table.name
+        for _ in range(3):
+            with engine.begin() as conn:
+                result = conn.execute(
+                    update(id_blocks)
+                    .where(id_blocks.c.name == name)
+                    .values(next_id=id_blocks.c.next_id + self.block_size)
+                )
+                if result.rowcount:
+                    end = conn.execute(
+                        select(id_blocks.c.next_id).where(id_blocks.c.name == name)
+                    ).scalar_one()
+                    return end - self.block_size, end
+            # First block ever: start after the highest existing id
+            try:
+                with engine.begin() as conn:
+                    start = conn.execute(select(func.coalesce(func.max(self.table.c.id), 0))).scalar_one() + 1
+                    conn.execute(insert(id_blocks).values(name=name, next_id=start + self.block_size))
+                    return start, start + self.block_size
+            except IntegrityError:
+                continue  # Another worker created the row first; reserve from it
+        raise RuntimeError(f"Could not reserve an id block for {name}")
+
+    def next_id_blocking(self) -> int:
+        with self._lock:
+            if self._next >= self._end:
+                self._next, self._end = self._reserve_block()
+            value = self._next
+            self._next += 1
+            return value
+
+    async def next_id(self) -> int:
+        """Next id; only touches the database (in a thread) when the block runs out"""
+        with self._lock:
+            if self._next < self._end:
+                value = self._next
+                self._next += 1
+                return value
+        return await run_write(self.next_id_blocking)
+
+_STOP = object()
+
+def is_transient(error: Exception) -> bool:
+    """Errors worth retrying as is: locked database, dropped connection"""
+    if isinstance(error, OperationalError):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+class MessageWriter:
+    """Batches queued rows into INSERTs on `table` from a background task"""
+
+    def __init__(self, table, batch_size: int = None, max_delay: float = None, max_queue: int = None, on_batch=None):
+        self.table = table
+        self.on_batch = on_batch  # on_batch(conn, rows), runs in the insert transaction
+        self.batch_size = batch_size or int(os.getenv("MESSAGE_BATCH_SIZE", "200"))
+        self.max_delay = max_delay if max_delay is not None else float(os.getenv("MESSAGE_BATCH_DELAY", "0.05"))
+        self.max_queue = max_queue or int(os.getenv("MESSAGE_QUEUE_SIZE", "10000"))
+        self.ids = IdAllocator(table, block_size=int(os.getenv("MESSAGE_ID_BLOCK", "100")))
+        self.queue = None
+        self._task = None
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def next_id(self) -> int:
+        return await self.ids.next_id()
+
+    async def enqueue(self, row: dict):
+        """Queue a row for insertion; waits only if the queue is full (backpressure)"""
+        if self.queue is None:
+            # Writer not started (scripts, tests): write right away off the loop
+            await run_write(self._write_batch, [row])
+            return
+        await self.queue.put(row)
+
+    async def _next_batch(self):
+        """Wait for the first row, then collect more until full or max_delay passes"""
+        first = await self.queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.batch_size:
+            try:
+                item = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._next_batch()
+            if batch:
+                await self._flush(batch)
+
+    def _write_batch(self, batch):
+        with engine.begin() as conn:
+            conn.execute(insert(self.table), batch)
+            if self.on_batch is not None:
+                self.on_batch(conn, batch)
+
+    async def _flush(self, batch, attempts: int = 5):
+        """Write a batch, retrying transient errors and isolating bad rows"""
+        for attempt in range(1, attempts + 1):
+            try:
+                await run_write(self._write_batch, batch)
+                return
+            except Exception as e:
+                if not is_transient(e):
+                    print(f"Batch insert into {self.table.name} failed: {e}; inserting rows one by one")
+                    await run_write(self._write_rows, batch)
+                    return
+                if attempt == attempts:
+                    ids = [row.get("id") for row in batch]
+                    print(f"❌ Dropping {len(batch)} {self.table.name} rows after {attempts} attempts: {e} (ids {ids})")
+                    return
+                print(f"Batch insert into {self.table.name} failed (attempt {attempt}): {e}")
+                await asyncio.sleep(min(0.1 * 2 ** attempt, 2.0))
+
+    def _write_rows(self, batch):
+        """Insert rows one per transaction, skipping the ones that fail"""
+        for row in batch:
+            try:
+                self._write_batch([row])
+            except Exception as e:
+                print(f"❌ Skipping {self.table.name} row {row.get('id')}: {e}")
+
+    async def stop(self):
+        """Flush everything queued so far and stop the writer"""
+        if self._task is None:
+            return
+        await self.queue.put(_STOP)
+        await self._task
+        self._task = None
+        self.queue = None
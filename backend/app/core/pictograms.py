@@ -0,0 +1,49 @@
+"""
+Compact pictogram encoding for stored chat messages.
+
+Messages store only (ARASAAC id, word) pairs, packed one per line as
+"id<TAB>word" in Message.pictos. Full pictogram objects are rebuilt at read
+time from a small cache, so rows stay tiny and reading history needs no JSON
+parsing.
+"""
+
+from functools import lru_cache
+from app.core.arasaac import pictogram_url
+from app.core.cache_registry import FunctionCache, registry as cache_registry
+
+def compact_pictograms(pictograms: list):
+    """[(id, word)] for a client pictogram list, or None if any item has no numeric id"""
+    pairs = []
+    for picto in pictograms:
+        if not isinstance(picto, dict):
+            return None
+        try:
+            picto_id = int(picto.get("id"))
+        except (TypeError, ValueError):
+            return None
+        word = str(picto.get("palabra") or "")
+        # Tabs/newlines are the packing separators
+        pairs.append((picto_id, word.replace("\t", " ").replace("\n", " ")))
+    return pairs
+
+def pack_pictograms(pairs) -> str:
+    return "\n".join(f"{picto_id}\t{word}" for picto_id, word in pairs)
+
+def unpack_pictograms(packed: str):
+    if not packed:
+        return []
+    pairs = []
+    for line in packed.split("\n"):
+        picto_id, _, word = line.partition("\t")
+        pairs.append((int(picto_id), word))
+    return pairs
+
+@lru_cache(maxsize=4096)
+def expand_pictogram(picto_id: int, word: str) -> dict:
+    """Full pictogram object for an (id, word) pair (shared, treat as read-only)"""
+    return {"palabra": word, "id": picto_id, "url": pictogram_url(picto_id)}
+
+cache_registry.register("pictogram_objects", FunctionCache(expand_pictogram, "(<id>, <word>)"))
+
+def expand_pictograms(pairs) -> list:
+    return [expand_pictogram(picto_id, word) for picto_id, word in pairs]
@@ -0,0 +1,170 @@
+"""
+Per-room presence: who is connected and who is typing.
+
+Presence changes are not broadcast one by one. Joins, leaves and typing
+indicators are collected per room and flushed every PRESENCE_FLUSH_INTERVAL
+seconds as a single diff:
+
+    {"type": "presence", "joined": [[user_id, username], ...], "left": [user_id, ...], "typing": [user_id, ...]}
+
+(empty lists are omitted). Typing is throttled to one indicator per user
+every TYPING_THROTTLE_SECONDS; a join followed by a leave inside one window
+cancels out. Diffs that only carry typing are what a backed-up connection
+drops first (see SlowConsumerPolicy). A new connection first receives a snapshot of the room:
+
+    {"type": "presence_snapshot", "members": [[user_id, username], ...]}
+
+Diffs travel through the pub/sub backend like any broadcast, and every
+worker applies them to its roster, so snapshots include users connected to
+other workers (those that joined after this worker started). State is
+ephemeral and never stored.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from typing import Dict
+from app.core.wire import OutboundFrame
+
+PRESENCE_FLUSH_INTERVAL = float(os.getenv("PRESENCE_FLUSH_INTERVAL", "0.5"))
+TYPING_THROTTLE_SECONDS = float(os.getenv("TYPING_THROTTLE_SECONDS", "2"))
+
+class RoomPresence:
+    """This worker's view of one room"""
+
+    __slots__ = ("local", "roster", "joined", "left", "typing", "last_typing")
+
+    def __init__(self):
+        self.local: Dict[int, list] = {}   # {user_id: [username, open connections]} on this worker
+        self.roster: Dict[int, list] = {}  # {user_id: [username, {worker ids}]} from applied diffs
+        self.joined: Dict[int, str] = {}   # pending diff
+        self.left = set()
+        self.typing = set()
+        self.last_typing: Dict[int, float] = {}
+
+    def has_pending(self) -> bool:
+        return bool(self.joined or self.left or self.typing)
+
+    def is_empty(self) -> bool:
+        return not (self.local or self.roster or self.has_pending())
+
+class PresenceService:
+    def __init__(self, manager, flush_interval: float = PRESENCE_FLUSH_INTERVAL, typing_interval: float = TYPING_THROTTLE_SECONDS):
+        self.manager = manager
+        self.flush_interval = flush_interval
+        self.typing_interval = typing_interval
+        self.worker_id = uuid.uuid4().hex[:8]
+        self.rooms: Dict[int, RoomPresence] = {}
+        self._task = None
+        manager.add_listener("presence", self._apply)
+
+    async def start(self):
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    def join(self, room_id: int, principal, connection=None):
+        """Register a connection and send it the room snapshot"""
+        room = self.rooms.setdefault(room_id, RoomPresence())
+        entry = room.local.get(principal.id)
+        if entry is None:
+            room.local[principal.id] = [principal.username, 1]
+            if principal.id in room.left:
+                room.left.discard(principal.id)
+            else:
+                room.joined[principal.id] = principal.username
+        else:
+            entry[1] += 1
+        if connection is not None:
+            connection.enqueue(OutboundFrame({"type": "presence_snapshot", "members": self.snapshot(room_id)}))
+
+    def leave(self, room_id: int, principal):
+        room = self.rooms.get(room_id)
+        if room is None:
+            return
+        entry = room.local.get(principal.id)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] > 0:
+            return
+        del room.local[principal.id]
+        room.typing.discard(principal.id)
+        room.last_typing.pop(principal.id, None)
+        if room.joined.pop(principal.id, None) is None:
+            room.left.add(principal.id)
+
+    def typing(self, room_id: int, principal):
+        """Record a typing indicator, at most one per user per typing interval"""
+        room = self.rooms.get(room_id)
+        if room is None or principal.id not in room.local:
+            return
+        now = time.monotonic()
+        if now - room.last_typing.get(principal.id, 0.0) < self.typing_interval:
+            return
+        room.last_typing[principal.id] = now
+        room.typing.add(principal.id)
+
+    def snapshot(self, room_id: int):
+        """[[user_id, username], ...] for everyone currently in the room"""
+        room = self.rooms.get(room_id)
+        if room is None:
+            return []
+        members = {}
+        for user_id, (username, workers) in room.roster.items():
+            # Skip users who only had connections here and have since left
+            if workers - {self.worker_id} or user_id in room.local:
+                members[user_id] = username
+        for user_id, (username, _) in room.local.items():
+            members[user_id] = username
+        return [[user_id, username] for user_id, username in members.items()]
+
+    async def flush(self):
+        """Broadcast one diff per room with pending changes"""
+        for room_id, room in list(self.rooms.items()):
+            if not room.has_pending():
+                if room.is_empty():
+                    del self.rooms[room_id]
+                continue
+            diff = {"type": "presence", "worker": self.worker_id}
+            if room.joined:
+                diff["joined"] = [[user_id, username] for user_id, username in room.joined.items()]
+            if room.left:
+                diff["left"] = sorted(room.left)
+            if room.typing:
+                diff["typing"] = sorted(room.typing)
+            room.joined, room.left, room.typing = {}, set(), set()
+            await self.manager.broadcast(diff, room_id)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Presence flush error: {e}")
+
+    def _apply(self, room_id: int, diff: dict):
+        """Update the roster from a diff published by any worker"""
+        worker = diff.get("worker")
+        room = self.rooms.get(room_id)
+        if room is None:
+            if not diff.get("joined"):
+                return
+            room = self.rooms[room_id] = RoomPresence()
+        for user_id, username in diff.get("joined", ()):
+            room.roster.setdefault(user_id, [username, set()])[1].add(worker)
+        for user_id in diff.get("left", ()):
+            entry = room.roster.get(user_id)
+            if entry is not None:
+                entry[1].discard(worker)
+                if not entry[1]:
+                    del room.roster[user_id]
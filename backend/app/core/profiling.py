@@ -0,0 +1,155 @@
+"""
+Opt-in per-request profiling.
+
+An admin sends `X-Profile: timing` (or `X-Profile: cprofile`) together with a
+valid `X-Admin-Token`. The response then carries a `Server-Timing` header with
+one entry per stage, and in cprofile mode a pstats dump of the handler is
+written to PROFILE_DIR (named in `X-Profile-Dump`). Any other value is
+treated as `timing`.
+
+Code marks stages with `with stage("ngram"):`. When no profile is active for
+the current request, `stage()` returns a shared no-op context manager, so the
+disabled cost is a single ContextVar lookup.
+"""
+
+import cProfile
+import os
+import time
+import uuid
+from contextlib import nullcontext
+from contextvars import ContextVar
+from pathlib import Path
+from starlette.datastructures import MutableHeaders
+from app.core.admin import is_admin_token
+
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "./profiles"))
+
+_current_profile: ContextVar = ContextVar("request_profile", default=None)
+_NOOP = nullcontext()
+
+class RequestProfile:
+    """Stage timings (and optional cProfile capture) for one request"""
+
+    def __init__(self, name: str, capture: bool = False):
+        self.name = name
+        self.capture = capture
+        self.stages = []  # [(stage, milliseconds)]
+        self.dump_path = None
+
+    def add(self, stage_name: str, duration_ms: float):
+        self.stages.append((stage_name, duration_ms))
+
+    def server_timing(self) -> str:
+        """Render stages as a Server-Timing header value"""
+        # Same stage can run more than once (e.g. fallback); keep them ordered and summed
+        totals = {}
+        for stage_name, duration in self.stages:
+            totals[stage_name] = totals.get(stage_name, 0.0) + duration
+        return ", ".join(f"{name};dur={duration:.2f}" for name, duration in totals.items())
+
+class _Stage:
+    __slots__ = ("profile", "name", "start")
+
+    def __init__(self, profile: RequestProfile, name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.add(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+def stage(name: str):
+    """Context manager timing a stage of the current request (no-op when disabled)"""
+    profile = _current_profile.get()
+    if profile is None:
+        return _NOOP
+    return _Stage(profile, name)
+
+class _Capture:
+    """Runs cProfile in the handler's own thread and dumps it on exit"""
+
+    def __init__(self, profile: RequestProfile):
+        self.profile = profile
+        self.profiler = cProfile.Profile()
+
+    def __enter__(self):
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.disable()
+        try:
+            PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            path = PROFILE_DIR / f"{self.profile.name}-{stamp}-{uuid.uuid4().hex[:8]}.prof"
+            self.profiler.dump_stats(path)
+            self.profile.dump_path = path
+        except OSError as e:
+            print(f"Could not write profile dump: {e}")
+        return False
+
+def capture():
+    """
+    Context manager for the body of a handler.
+
+    cProfile only sees the thread it was enabled in, and handler work runs in
+    the threadpool, so the capture has to start in that thread rather than in
+    the middleware.
+    """
+    profile = _current_profile.get()
+    if profile is None or not profile.capture:
+        return _NOOP
+    return _Capture(profile)
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware enabling profiling for selected paths.
+
+    Requests without the `X-Profile` header pass straight through; requests
+    with it but without a valid admin token are served normally, unprofiled.
+    """
+
+    def __init__(self, app, paths=("/recommend",)):
+        self.app = app
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        mode = None
+        admin_token = None
+        for key, value in scope["headers"]:
+            if key == b"x-profile":
+                mode = value.decode("latin-1").strip().lower()
+            elif key == b"x-admin-token":
+                admin_token = value
+        if not mode or not is_admin_token(admin_token):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(
+            name=scope["path"].strip("/").replace("/", "_") or "root",
+            capture=mode == "cprofile",
+        )
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                profile.add("total", (time.perf_counter() - start) * 1000)
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", profile.server_timing())
+                if profile.dump_path is not None:
+                    headers.append("X-Profile-Dump", profile.dump_path.name)
+            await send(message)
+
+        reset_token = _current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_profile.reset(reset_token)
@@ -0,0 +1,220 @@
+"""
+Pub/sub layer behind ConnectionManager.broadcast.
+
+A message is published once per room; every worker runs one subscriber that
+receives it and fans it out to its own local connections. Backends:
+
+    memory://              single process (default)
+    sqlite:///path/bus.db  multi-process on one host, no extra services
+    redis://host:6379/0    multi-node (needs the `redis` package)
+
+Select with CHAT_PUBSUB_URL.
+
+Bus payloads are encoded with the same JSON settings as the WebSocket wire,
+so subscribers hand the received text straight to JSON clients without
+re-encoding it.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from app.core.wire import encode_json
+
+CHAT_PUBSUB_URL = os.getenv("CHAT_PUBSUB_URL", "memory://")
+
+class PubSubBackend:
+    """
+    Base class; `handler(room_id, message, payload)` is called for every
+    delivered message, with `payload` the JSON text it arrived as (or None).
+    """
+
+    def __init__(self):
+        self.handler = None
+
+    async def start(self, handler):
+        self.handler = handler
+
+    async def publish(self, room_id: int, message: dict):
+        raise NotImplementedError
+
+    async def stop(self):
+        pass
+
+    def _deliver(self, room_id: int, message: dict, payload: str = None):
+        if self.handler is None:
+            return
+        try:
+            self.handler(room_id, message, payload)
+        except Exception as e:
+            print(f"Pub/sub delivery error in room {room_id}: {e}")
+
+class InMemoryPubSub(PubSubBackend):
+    """Delivers directly to the local handler"""
+
+    async def publish(self, room_id: int, message: dict):
+        self._deliver(room_id, message)
+
+class SQLitePubSub(PubSubBackend):
+    """
+    Broker on a shared SQLite file: publishers append rows, every worker polls
+    for rows newer than the last one it has seen. Old rows are pruned after
+    `retention` seconds.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.05, retention: float = 60.0):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._publish_conn = None
+        self._poll_conn = None
+        self._publish_lock = threading.Lock()
+        self._task = None
+        self._last_id = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS pubsub_events ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " room_id INTEGER NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        return conn
+
+    async def start(self, handler):
+        await super().start(handler)
+        self._publish_conn = self._connect()
+        self._poll_conn = self._connect()
+        # Only deliver messages published after this worker started
+        row = self._poll_conn.execute("SELECT COALESCE(MAX(id), 0) FROM pubsub_events").fetchone()
+        self._last_id = row[0]
+        self._task = asyncio.create_task(self._poll_loop())
+
+    def _insert(self, room_id: int, payload: str):
+        with self._publish_lock:
+            self._publish_conn.execute(
+                "INSERT INTO pubsub_events (room_id, payload, created_at) VALUES (?, ?, ?)",
+                (room_id, payload, time.time()),
+            )
+
+    async def publish(self, room_id: int, message: dict):
+        payload = encode_json(message)
+        await asyncio.to_thread(self._insert, room_id, payload)
+
+    def _fetch(self):
+        return self._poll_conn.execute(
+            "SELECT id, room_id, payload FROM pubsub_events WHERE id > ? ORDER BY id",
+            (self._last_id,),
+        ).fetchall()
+
+    def _prune(self):
+        with self._publish_lock:
+            self._publish_conn.execute(
+                "DELETE FROM pubsub_events WHERE created_at < ?",
+                (time.time() - self.retention,),
+            )
+
+    async def _poll_loop(self):
+        last_prune = time.monotonic()
+        while True:
+            try:
+                rows = await asyncio.to_thread(self._fetch)
+                for event_id, room_id, payload in rows:
+                    self._last_id = event_id
+                    self._deliver(room_id, json.loads(payload), payload)
+                if time.monotonic() - last_prune > self.retention:
+                    await asyncio.to_thread(self._prune)
+                    last_prune = time.monotonic()
+                if not rows:
+                    await asyncio.sleep(self.poll_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"SQLite pub/sub poll error: {e}")
+                await asyncio.sleep(1)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for conn in (self._publish_conn, self._poll_conn):
+            if conn is not None:
+                conn.close()
+
+class RedisPubSub(PubSubBackend):
+    """Redis PUBLISH to chat:room:<id>, one PSUBSCRIBE chat:room:* per worker"""
+
+    prefix = "chat:room:"
+
+    def __init__(self, url: str):
+        super().__init__()
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("CHAT_PUBSUB_URL uses redis:// but the 'redis' package is not installed") from e
+        self.redis = redis_asyncio.from_url(url)
+        self._task = None
+
+    async def start(self, handler):
+        await super().start(handler)
+        self._task = asyncio.create_task(self._listen_loop())
+
+    async def publish(self, room_id: int, message: dict):
+        await self.redis.publish(f"{self.prefix}{room_id}", encode_json(message))
+
+    async def _listen_loop(self):
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.psubscribe(f"{self.prefix}*")
+                async for item in pubsub.listen():
+                    if item.get("type") != "pmessage":
+                        continue
+                    channel = item["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    room_id = int(channel[len(self.prefix):])
+                    payload = item["data"]
+                    if isinstance(payload, bytes):
+                        payload = payload.decode()
+                    self._deliver(room_id, json.loads(payload), payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Redis pub/sub connection lost: {e}; reconnecting")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.redis.aclose()
+
+def create_pubsub(url: str = None) -> PubSubBackend:
+    """Build the backend configured by CHAT_PUBSUB_URL"""
+    url = url or CHAT_PUBSUB_URL
+    if url.startswith("memory://"):
+        return InMemoryPubSub()
+    if url.startswith("sqlite:///"):
+        return SQLitePubSub(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisPubSub(url)
+    raise ValueError(f"Unsupported CHAT_PUBSUB_URL: {url}")
@@ -0,0 +1,98 @@
+"""
+Server-side cache of /recommend responses.
+
+For a given language, model and pictogram cache, a recommendation depends
+only on the effective context: the n-gram model looks at the last 3
+lowercased words (4-gram, then trigram) and the fallback table at the last
+one. Requests that share it share one cache entry and one ETag:
+
+    key  = (language, model version, pictogram cache generation, effective context)
+    ETag = hash of the key and the pictogram URL settings
+
+The ETag is known before any prediction runs, so a matching If-None-Match
+is answered without touching the model or ARASAAC.
+
+Bodies are kept in an LRU bounded by RECOMMEND_CACHE_SIZE entries and
+RECOMMEND_CACHE_MAX_BYTES, registered as cache "recommend" with keys
+"<lang>:<context>" (e.g. "es:yo quiero").
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+from app.core import arasaac
+from app.core.ngram_predictor import get_ngram_predictor
+from app.core.cache_registry import CacheStats, describe, key_matches, registry as cache_registry
+from app.core.languages import DEFAULT_LANGUAGE
+
+RECOMMEND_CACHE_SIZE = int(os.getenv("RECOMMEND_CACHE_SIZE", "2048"))
+RECOMMEND_CACHE_MAX_BYTES = int(os.getenv("RECOMMEND_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+EFFECTIVE_CONTEXT_WORDS = 3
+
+def effective_context(words: List[str]) -> tuple:
+    """Normalized context the predictors actually use"""
+    return tuple(word.lower() for word in " ".join(words).split()[-EFFECTIVE_CONTEXT_WORDS:])
+
+def cache_key(words: List[str], lang: str = DEFAULT_LANGUAGE) -> tuple:
+    return (lang, get_ngram_predictor(lang).version, arasaac.cache_generation, effective_context(words))
+
+def etag_for_key(key: tuple) -> str:
+    lang, version, generation, context = key
+    urls = f"{arasaac.STATIC_URL}|{arasaac.PICTOGRAM_PROXY_URL}|{arasaac.PICTOGRAM_PROXY_VARIANT}"
+    raw = f"{lang}\n{version}\n{generation}\n{urls}\n{' '.join(context)}"
+    return '"' + hashlib.sha256(raw.encode()).hexdigest()[:32] + '"'
+
+def _key_string(key: tuple) -> str:
+    lang, _, _, context = key
+    return f"{lang}:{' '.join(context)}"
+
+class ResponseCache:
+    """Thread-safe LRU of pre-encoded response bodies"""
+
+    def __init__(self, max_entries: int = RECOMMEND_CACHE_SIZE, max_bytes: int = RECOMMEND_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.stats.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+            return body
+
+    def put(self, key, body: bytes):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._entries[key] = body
+            self.bytes += len(body)
+            while len(self._entries) > self.max_entries or (self.bytes > self.max_bytes and len(self._entries) > 1):
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.stats.evictions += 1
+
+    def invalidate(self, prefix: str = None) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if key_matches(_key_string(key), prefix)]
+            for key in keys:
+                self.bytes -= len(self._entries.pop(key))
+            return len(keys)
+
+    def cache_stats(self) -> dict:
+        with self._lock:
+            entries, size = len(self._entries), self.bytes
+        return describe("lru", "<lang>:<context>", entries, size, self.stats,
+                        max_entries=self.max_entries, max_bytes=self.max_bytes)
+
+recommend_cache = cache_registry.register("recommend", ResponseCache())
@@ -0,0 +1,46 @@
+"""
+Fast JSON encoding for hot responses.
+
+`json_bytes()` encodes plain structures (dicts, lists, datetimes) straight
+to UTF-8 bytes with orjson when it is installed, or compact `json.dumps`
+otherwise; the output matches what FastAPI would send for the same data.
+
+Routes with a response_model don't need this: FastAPI serializes them with
+Pydantic's Rust encoder, but only while the app keeps its default response
+class, which is why JSONBytesResponse is opt-in per route rather than the
+app default. Use it (or `json_bytes` + Response) for bodies that are built
+by hand or cached as bytes.
+"""
+
+import json
+from datetime import date, datetime
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def json_bytes(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+
+def json_array(encoded_items) -> bytes:
+    """JSON array from already-encoded items"""
+    return b"[" + b",".join(encoded_items) + b"]"
+
+class JSONBytesResponse(Response):
+    """JSONResponse without the jsonable_encoder walk (content may also be pre-encoded bytes)"""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return json_bytes(content)
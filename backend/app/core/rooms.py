@@ -0,0 +1,57 @@
+"""
+Denormalized room activity summaries.
+
+Each ChatRoom row carries message_count, last_message_id,
+last_message_preview and last_activity_at so the room list needs no
+per-room queries. They are updated in the same transaction as every batch
+of message inserts (see MessageWriter's on_batch hook).
+"""
+
+import json
+from sqlalchemy import update, or_
+from app.models.chat import ChatRoom
+from app.core.pictograms import unpack_pictograms
+
+PREVIEW_LENGTH = 120
+
+def message_preview(pictograms: list) -> str:
+    """Short text preview of a message: its pictogram words"""
+    words = [p.get("palabra", "") for p in pictograms if isinstance(p, dict)]
+    return " ".join(w for w in words if w)[:PREVIEW_LENGTH]
+
+def row_preview(row) -> str:
+    """Preview for a messages row (compact pictos or legacy JSON content)"""
+    if row.get("pictos") is not None:
+        return " ".join(word for _, word in unpack_pictograms(row["pictos"]) if word)[:PREVIEW_LENGTH]
+    try:
+        return message_preview(json.loads(row["content"]))
+    except (TypeError, ValueError):
+        return ""
+
+def record_room_activity(conn, rows):
+    """Apply one insert batch to the rooms' counters and last-message fields"""
+    per_room = {}  # {room_id: [count, newest_row]}
+    for row in rows:
+        entry = per_room.setdefault(row["room_id"], [0, row])
+        entry[0] += 1
+        if (row["timestamp"], row["id"]) > (entry[1]["timestamp"], entry[1]["id"]):
+            entry[1] = row
+
+    rooms = ChatRoom.__table__
+    for room_id, (count, newest) in per_room.items():
+        conn.execute(
+            update(rooms)
+            .where(rooms.c.id == room_id)
+            .values(message_count=rooms.c.message_count + count)
+        )
+        # Batches from other workers can land out of order; never move last_* backwards
+        conn.execute(
+            update(rooms)
+            .where(rooms.c.id == room_id)
+            .where(or_(rooms.c.last_activity_at.is_(None), rooms.c.last_activity_at <= newest["timestamp"]))
+            .values(
+                last_message_id=newest["id"],
+                last_message_preview=row_preview(newest),
+                last_activity_at=newest["timestamp"],
+            )
+        )
@@ -0,0 +1,210 @@
+"""
+Full-text search over chat messages by pictogram word.
+
+A separate message_search index holds the words of every message:
+
+    SQLite      FTS5 virtual table (rowid = message id), accent-insensitive
+    PostgreSQL  table with a tsvector column and a GIN index
+
+Room and user filters go through the index too: in SQLite each row also
+indexes a `scope` column with the tokens "r<room_id> u<user_id>", so a
+room-scoped search is the MATCH `words : "yo" AND scope : "r5"` instead of a
+scan of every room's matches; in PostgreSQL (room_id, message_id) is indexed.
+
+Rows are indexed in the same transaction that inserts the messages (see
+MessageWriter's on_batch hook); existing history is indexed with
+`python scripts/backfill_search.py`. Each row keeps its message's timestamp:
+ids come from per-worker blocks and are not in time order, so results are
+ordered newest-first on (timestamp, id) like history, and paginate with
+`before_id`.
+"""
+
+import json
+import os
+import re
+from datetime import datetime
+from sqlalchemy import text
+from app.core.pictograms import unpack_pictograms
+
+SEARCH_TEXT_CONFIG = os.getenv("SEARCH_TEXT_CONFIG", "spanish")  # PostgreSQL text search configuration
+
+FTS5_COLUMNS = (
+    "words, scope, room_id UNINDEXED, user_id UNINDEXED, ts UNINDEXED,"
+    " tokenize = 'unicode61 remove_diacritics 2'"
+)
+
+def scope_tokens(room_id: int, user_id: int) -> str:
+    return f"r{room_id} u{user_id}"
+
+def index_timestamp(value) -> str:
+    """Message timestamp as sortable text, in the format SQLite stores DateTime columns"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.isoformat(sep=" ", timespec="microseconds")
+
+def create_search_index(engine):
+    """Create the search table and indexes for the engine's dialect (idempotent)"""
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(
+                "CREATE TABLE IF NOT EXISTS message_search ("
+                " message_id INTEGER PRIMARY KEY,"
+                " room_id INTEGER NOT NULL,"
+                " user_id INTEGER NOT NULL,"
+                " ts TIMESTAMP,"
+                " words TSVECTOR NOT NULL)"
+            ))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_message_search_words ON message_search USING GIN (words)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_message_search_room_ts ON message_search (room_id, ts, message_id)"))
+        else:
+            conn.execute(text(f"CREATE VIRTUAL TABLE IF NOT EXISTS message_search USING fts5({FTS5_COLUMNS})"))
+
+def row_words(row) -> str:
+    """Space-separated pictogram words of a messages row (compact or legacy JSON)"""
+    if row.get("pictos") is not None:
+        return " ".join(word for _, word in unpack_pictograms(row["pictos"]) if word)
+    try:
+        pictograms = json.loads(row["content"])
+    except (TypeError, ValueError):
+        return ""
+    if not isinstance(pictograms, list):
+        return ""
+    return " ".join(p.get("palabra", "") for p in pictograms if isinstance(p, dict) and p.get("palabra"))
+
+def index_messages(conn, rows):
+    """Add message rows to the search index (runs inside the insert transaction)"""
+    params = [
+        {
+            "id": row["id"],
+            "room": row["room_id"],
+            "user": row["user_id"],
+            "ts": index_timestamp(row["timestamp"]),
+            "words": row_words(row),
+        }
+        for row in rows
+    ]
+    params = [p for p in params if p["words"]]
+    if not params:
+        return
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(
+            "INSERT INTO message_search (message_id, room_id, user_id, ts, words) "
+            "VALUES (:id, :room, :user, CAST(:ts AS TIMESTAMP), to_tsvector(CAST(:config AS regconfig), :words)) "
+            "ON CONFLICT (message_id) DO NOTHING"
+        ), [dict(p, config=SEARCH_TEXT_CONFIG) for p in params])
+    else:
+        conn.execute(text(
+            "INSERT OR REPLACE INTO message_search (rowid, words, scope, room_id, user_id, ts) "
+            "VALUES (:id, :words, :scope, :room, :user, :ts)"
+        ), [dict(p, scope=scope_tokens(p["room"], p["user"])) for p in params])
+
+def query_terms(query: str):
+    """Lowercased word tokens of a search query"""
+    return re.findall(r"\w+", query.lower())
+
+def search_message_ids(db, query: str, room_id: int = None, user_id: int = None, before_id: int = None, limit: int = 20):
+    """Ids of messages containing every word of `query`, newest first by (timestamp, id)"""
+    terms = query_terms(query)
+    if not terms:
+        return []
+    params = {"limit": limit}
+    if db.get_bind().dialect.name == "postgresql":
+        sql = (
+            "SELECT message_id FROM message_search "
+            "WHERE words @@ plainto_tsquery(CAST(:config AS regconfig), :q)"
+        )
+        params.update(config=SEARCH_TEXT_CONFIG, q=" ".join(terms))
+        id_column = "message_id"
+        if room_id is not None:
+            sql += " AND room_id = :room"
+            params["room"] = room_id
+        if user_id is not None:
+            sql += " AND user_id = :user"
+            params["user"] = user_id
+    else:
+        # Quote every term so FTS5 treats user input as plain words
+        sql = "SELECT rowid FROM message_search WHERE message_search MATCH :q"
+        params["q"] = _fts5_query(terms, room_id, user_id)
+        id_column = "rowid"
+    if before_id is not None:
+        cursor_ts = db.execute(
+            text(f"SELECT ts FROM message_search WHERE {id_column} = :before"), {"before": before_id}
+        ).scalar()
+        if cursor_ts is None:
+            return []  # Cursor message deleted or archived since the previous page
+        sql += f" AND (ts < :ts OR (ts = :ts AND {id_column} < :before))"
+        params.update(ts=cursor_ts, before=before_id)
+    sql += f" ORDER BY ts DESC, {id_column} DESC LIMIT :limit"
+    return list(db.execute(text(sql), params).scalars())
+
+def _fts5_query(terms, room_id=None, user_id=None) -> str:
+    """MATCH expression for every term in `words`, filtered by scope tokens"""
+    clauses = [f'words : "{term}"' for term in terms]
+    if room_id is not None:
+        clauses.append(f'scope : "r{int(room_id)}"')
+    if user_id is not None:
+        clauses.append(f'scope : "u{int(user_id)}"')
+    return " AND ".join(clauses)
+
+def delete_message_index(conn, message_ids):
+    if not message_ids:
+        return
+    id_column = "message_id" if conn.dialect.name == "postgresql" else "rowid"
+    conn.execute(
+        text(f"DELETE FROM message_search WHERE {id_column} = :id"),
+        [{"id": message_id} for message_id in message_ids],
+    )
+
+def delete_room_index(db, room_id: int):
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("DELETE FROM message_search WHERE room_id = :room"), {"room": room_id})
+    else:
+        db.execute(text(
+            "DELETE FROM message_search WHERE rowid IN "
+            "(SELECT rowid FROM message_search WHERE message_search MATCH :q)"
+        ), {"q": _fts5_query([], room_id)})
+
+def upgrade_search_index(engine):
+    """Bring an index created by an older version up to the current columns (scope, ts), keeping its rows"""
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("ALTER TABLE message_search ADD COLUMN IF NOT EXISTS ts TIMESTAMP"))
+            conn.execute(text(
+                "UPDATE message_search s SET ts = m.timestamp FROM messages m "
+                "WHERE m.id = s.message_id AND s.ts IS NULL"
+            ))
+            conn.execute(text("DROP INDEX IF EXISTS ix_message_search_room_id"))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_message_search_room_ts ON message_search (room_id, ts, message_id)"
+            ))
+            return
+        columns = [row[1] for row in conn.execute(text("PRAGMA table_info(message_search)"))]
+        if not columns or ("scope" in columns and "ts" in columns):
+            return
+        # FTS5 tables can't be altered: copy the rows into a new one
+        conn.execute(text("DROP TABLE IF EXISTS message_search_rebuild"))
+        conn.execute(text(f"CREATE VIRTUAL TABLE message_search_rebuild USING fts5({FTS5_COLUMNS})"))
+        conn.execute(text(
+            "INSERT INTO message_search_rebuild (rowid, words, scope, room_id, user_id, ts) "
+            "SELECT s.rowid, s.words, 'r' || s.room_id || ' u' || s.user_id, s.room_id, s.user_id, m.timestamp "
+            "FROM message_search s LEFT JOIN messages m ON m.id = s.rowid"
+        ))
+        conn.execute(text("DROP TABLE message_search"))
+        conn.execute(text("ALTER TABLE message_search_rebuild RENAME TO message_search"))
+
+def backfill_search_index(engine, batch_size: int = 1000) -> int:
+    """Index every existing message in id-ordered batches (safe to re-run)"""
+    last_id = 0
+    indexed = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text(
+                "SELECT id, room_id, user_id, content, pictos, timestamp FROM messages "
+                "WHERE id > :last ORDER BY id LIMIT :limit"
+            ), {"last": last_id, "limit": batch_size}).mappings().all()
+            if not rows:
+                break
+            index_messages(conn, rows)
+            indexed += len(rows)
+            last_id = rows[-1]["id"]
+    return indexed
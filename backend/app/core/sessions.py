@@ -0,0 +1,261 @@
+"""
+Session token storage with TTL and sliding expiry.
+
+Every session stores a small Principal (user id + username) next to the
+token, so authenticated requests and WebSocket handshakes can identify the
+user without querying the users table. Backends, selected by
+SESSION_STORE_URL:
+
+    memory://               process-local (default, single worker)
+    sqlite:///sessions.db   shared by all workers on one host
+    redis://host:6379/0     shared across nodes (needs the `redis` package)
+
+Sessions last SESSION_TTL_SECONDS after their last use. To avoid a write on
+every request, expiry is only pushed forward once it is more than
+SESSION_TOUCH_INTERVAL seconds stale.
+
+The store is registered as cache "sessions" with keys "<user_id>:<token>",
+so invalidating prefix "42:" logs user 42 out everywhere.
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+from app.core.cache_registry import CacheStats, describe, key_matches
+
+SESSION_STORE_URL = os.getenv("SESSION_STORE_URL", "memory://")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(7 * 24 * 3600)))
+SESSION_TOUCH_INTERVAL = int(os.getenv("SESSION_TOUCH_INTERVAL", "300"))
+
+class Principal(NamedTuple):
+    """The authenticated user as seen by request handlers"""
+    id: int
+    username: str
+
+class SessionStore:
+    def __init__(self, ttl: int = SESSION_TTL_SECONDS, touch_interval: int = SESSION_TOUCH_INTERVAL):
+        self.ttl = ttl
+        self.touch_interval = min(touch_interval, ttl)
+        self.stats = CacheStats()
+
+    def create(self, principal: Principal) -> str:
+        token = secrets.token_urlsafe(32)
+        self._put(token, principal, time.time() + self.ttl)
+        return token
+
+    def get(self, token: str) -> Optional[Principal]:
+        """Principal for a live token (sliding its expiry), or None"""
+        principal = self._get(token) if token else None
+        if principal is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return principal
+
+    def delete(self, token: str):
+        raise NotImplementedError
+
+    def invalidate(self, prefix: str = None) -> int:
+        """Delete sessions whose "<user_id>:<token>" starts with `prefix` (all if None)"""
+        raise NotImplementedError
+
+    def cache_stats(self) -> dict:
+        stats = describe("ttl", "<user_id>:<token>", self._count(), None, self.stats)
+        stats["ttl_seconds"] = self.ttl
+        return stats
+
+    def _get(self, token: str) -> Optional[Principal]:
+        raise NotImplementedError
+
+    def _count(self) -> int:
+        raise NotImplementedError
+
+    def _put(self, token: str, principal: Principal, expires_at: float):
+        raise NotImplementedError
+
+    def _needs_touch(self, expires_at: float, now: float) -> bool:
+        return expires_at - now < self.ttl - self.touch_interval
+
+class MemorySessionStore(SessionStore):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sessions = {}  # {token: (principal, expires_at)}
+        self._lock = threading.Lock()
+        self._last_purge = time.time()
+
+    def _put(self, token, principal, expires_at):
+        with self._lock:
+            self._sessions[token] = (principal, expires_at)
+            self._purge_expired()
+
+    def _purge_expired(self):
+        now = time.time()
+        if now - self._last_purge < self.touch_interval:
+            return
+        self._last_purge = now
+        expired = [t for t, (_, exp) in self._sessions.items() if exp <= now]
+        for token in expired:
+            del self._sessions[token]
+        self.stats.evictions += len(expired)
+
+    def _get(self, token):
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.get(token)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if expires_at <= now:
+                del self._sessions[token]
+                self.stats.evictions += 1
+                return None
+            if self._needs_touch(expires_at, now):
+                self._sessions[token] = (principal, now + self.ttl)
+            return principal
+
+    def delete(self, token):
+        with self._lock:
+            self._sessions.pop(token, None)
+
+    def invalidate(self, prefix=None):
+        with self._lock:
+            tokens = [
+                token for token, (principal, _) in self._sessions.items()
+                if key_matches(f"{principal.id}:{token}", prefix)
+            ]
+            for token in tokens:
+                del self._sessions[token]
+            return len(tokens)
+
+    def _count(self):
+        return len(self._sessions)
+
+    def __len__(self):
+        return len(self._sessions)
+
+class SQLiteSessionStore(SessionStore):
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " token TEXT PRIMARY KEY,"
+            " user_id INTEGER NOT NULL,"
+            " username TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_sessions_expires_at ON sessions (expires_at)")
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+    def _put(self, token, principal, expires_at):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (token, user_id, username, expires_at) VALUES (?, ?, ?, ?)",
+                (token, principal.id, principal.username, expires_at),
+            )
+            if now - self._last_purge > self.touch_interval:
+                self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+                self._last_purge = now
+
+    def _get(self, token):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT user_id, username, expires_at FROM sessions WHERE token = ?", (token,)
+            ).fetchone()
+            if row is None or row[2] <= now:
+                return None
+            if self._needs_touch(row[2], now):
+                self._conn.execute(
+                    "UPDATE sessions SET expires_at = ? WHERE token = ?", (now + self.ttl, token)
+                )
+        return Principal(row[0], row[1])
+
+    def delete(self, token):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE token = ?", (token,))
+
+    def invalidate(self, prefix=None):
+        with self._lock:
+            if prefix is None:
+                return self._conn.execute("DELETE FROM sessions").rowcount
+            return self._conn.execute(
+                "DELETE FROM sessions WHERE substr(CAST(user_id AS TEXT) || ':' || token, 1, ?) = ?",
+                (len(prefix), prefix),
+            ).rowcount
+
+    def _count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+
+class RedisSessionStore(SessionStore):
+    """session:<token> -> JSON principal, with a Redis TTL"""
+
+    prefix = "session:"
+
+    def __init__(self, url: str, **kwargs):
+        super().__init__(**kwargs)
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("SESSION_STORE_URL uses redis:// but the 'redis' package is not installed") from e
+        self.redis = redis.Redis.from_url(url)
+
+    def _put(self, token, principal, expires_at):
+        self.redis.set(
+            self.prefix + token,
+            json.dumps([principal.id, principal.username]),
+            ex=max(1, int(expires_at - time.time())),
+        )
+
+    def _get(self, token):
+        key = self.prefix + token
+        pipe = self.redis.pipeline()
+        pipe.get(key)
+        pipe.ttl(key)
+        value, ttl = pipe.execute()
+        if value is None:
+            return None
+        if ttl is not None and ttl >= 0 and self._needs_touch(time.time() + ttl, time.time()):
+            self.redis.expire(key, self.ttl)
+        user_id, username = json.loads(value)
+        return Principal(user_id, username)
+
+    def delete(self, token):
+        self.redis.delete(self.prefix + token)
+
+    def invalidate(self, prefix=None):
+        removed = 0
+        for key in self.redis.scan_iter(match=self.prefix + "*", count=500):
+            if prefix is not None:
+                value = self.redis.get(key)
+                if value is None:
+                    continue
+                user_id = json.loads(value)[0]
+                token = key.decode()[len(self.prefix):]
+                if not key_matches(f"{user_id}:{token}", prefix):
+                    continue
+            removed += self.redis.delete(key)
+        return removed
+
+    def _count(self):
+        return sum(1 for _ in self.redis.scan_iter(match=self.prefix + "*", count=500))
+
+def create_session_store(url: str = None) -> SessionStore:
+    """Build the store configured by SESSION_STORE_URL"""
+    url = url or SESSION_STORE_URL
+    if url.startswith("memory://"):
+        return MemorySessionStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteSessionStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisSessionStore(url)
+    raise ValueError(f"Unsupported SESSION_STORE_URL: {url}")
@@ -0,0 +1,219 @@
+"""
+Single-flight coalescing of identical lookups.
+
+`SingleFlight.do(key, fn)` runs `fn` once for all threads that ask for the
+same key at the same time: the first caller (the leader) runs it, the
+others wait and receive the leader's result (or its exception).
+
+Across worker processes, a shared lookup cache selected by
+PICTOGRAM_SHARED_CACHE_URL adds leases, so only one worker fetches a given
+key while the others poll for the stored result:
+
+    (empty)                     in-process only (default)
+    sqlite:///pictograms.db     workers on one host
+    redis://host:6379/0         workers on several nodes (needs `redis`)
+
+Stored values are JSON and expire after PICTOGRAM_SHARED_TTL seconds.
+Leases expire after PICTOGRAM_LEASE_SECONDS, so a worker that dies while
+fetching does not block the key for long.
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+PICTOGRAM_SHARED_CACHE_URL = os.getenv("PICTOGRAM_SHARED_CACHE_URL", "")
+PICTOGRAM_SHARED_TTL = int(os.getenv("PICTOGRAM_SHARED_TTL", str(24 * 3600)))
+PICTOGRAM_LEASE_SECONDS = float(os.getenv("PICTOGRAM_LEASE_SECONDS", "15"))
+PICTOGRAM_LEASE_POLL_MS = int(os.getenv("PICTOGRAM_LEASE_POLL_MS", "50"))
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.leaders = 0     # calls that ran fn
+        self.coalesced = 0   # calls that waited for another caller's result
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+class SharedLookupCache:
+    """Cross-worker results plus fetch leases"""
+
+    def get(self, key: str) -> Tuple[bool, object]:
+        """(True, value) if stored, else (False, None)"""
+        raise NotImplementedError
+
+    def put(self, key: str, value, ttl: int = PICTOGRAM_SHARED_TTL):
+        raise NotImplementedError
+
+    def try_lease(self, key: str, seconds: float = PICTOGRAM_LEASE_SECONDS) -> Optional[str]:
+        """Lease owner id if this worker may fetch `key`, else None"""
+        raise NotImplementedError
+
+    def release(self, key: str, owner: str):
+        raise NotImplementedError
+
+    def invalidate(self, prefix: str = None):
+        """Delete stored values whose key starts with `prefix` (all if None)"""
+        raise NotImplementedError
+
+class SQLiteLookupCache(SharedLookupCache):
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS lookups (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM lookups WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return (True, json.loads(row[0])) if row else (False, None)
+
+    def put(self, key, value, ttl=PICTOGRAM_SHARED_TTL):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO lookups (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl),
+            )
+
+    def try_lease(self, key, seconds=PICTOGRAM_LEASE_SECONDS):
+        owner = secrets.token_hex(8)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE key = ? AND expires_at <= ?", (key, now))
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)", (key, owner, now + seconds)
+            ).rowcount
+        return owner if inserted else None
+
+    def release(self, key, owner):
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def invalidate(self, prefix=None):
+        with self._lock:
+            if prefix is None:
+                self._conn.execute("DELETE FROM lookups")
+            else:
+                self._conn.execute("DELETE FROM lookups WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+class RedisLookupCache(SharedLookupCache):
+    """lookup:<key> -> JSON value, lease:<key> -> owner id (both with TTLs)"""
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("PICTOGRAM_SHARED_CACHE_URL uses redis:// but the 'redis' package is not installed") from e
+        self.redis = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self.redis.get("lookup:" + key)
+        return (True, json.loads(value)) if value is not None else (False, None)
+
+    def put(self, key, value, ttl=PICTOGRAM_SHARED_TTL):
+        self.redis.set("lookup:" + key, json.dumps(value), ex=ttl)
+
+    def try_lease(self, key, seconds=PICTOGRAM_LEASE_SECONDS):
+        owner = secrets.token_hex(8)
+        acquired = self.redis.set("lease:" + key, owner, nx=True, px=int(seconds * 1000))
+        return owner if acquired else None
+
+    def release(self, key, owner):
+        lease = "lease:" + key
+        if self.redis.get(lease) == owner.encode():
+            self.redis.delete(lease)
+
+    def invalidate(self, prefix=None):
+        keys = list(self.redis.scan_iter(match="lookup:" + _glob_escape(prefix or "") + "*", count=500))
+        if keys:
+            self.redis.delete(*keys)
+
+def _glob_escape(text: str) -> str:
+    return "".join("\\" + char if char in "*?[]\\" else char for char in text)
+
+def create_shared_cache(url: str = None) -> Optional[SharedLookupCache]:
+    """The cache configured by PICTOGRAM_SHARED_CACHE_URL, or None"""
+    url = PICTOGRAM_SHARED_CACHE_URL if url is None else url
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteLookupCache(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisLookupCache(url)
+    raise ValueError(f"Unsupported PICTOGRAM_SHARED_CACHE_URL: {url}")
+
+def fetch_once(shared: SharedLookupCache, key: str, fetch, count):
+    """
+    `fetch()` across workers: reuse a stored value, take the lease and fetch,
+    or wait for the worker holding the lease. `fetch` returns None on failure
+    (nothing is stored); the result is returned either way. `count(name)` is
+    called with "shared_hits", "coalesced_remote" or "lease_timeouts".
+    """
+    deadline = time.monotonic() + PICTOGRAM_LEASE_SECONDS * 2
+    waited = False
+    while True:
+        found, value = shared.get(key)
+        if found:
+            count("coalesced_remote" if waited else "shared_hits")
+            return value
+        owner = shared.try_lease(key)
+        if owner is not None:
+            try:
+                value = fetch()
+                if value is not None:
+                    shared.put(key, value)
+                return value
+            finally:
+                shared.release(key, owner)
+        if time.monotonic() > deadline:
+            count("lease_timeouts")
+            return fetch()
+        waited = True
+        time.sleep(PICTOGRAM_LEASE_POLL_MS / 1000)
@@ -0,0 +1,158 @@
+"""
+Startup warm-up.
+
+Loads the n-gram model of each WARMUP_LANGUAGES language, runs a few
+synthetic predictions, primes the DB connection pool and (optionally) the
+pictogram cache and category board before the instance reports itself
+ready. Other supported languages still load lazily on their first request.
+
+Runs in a background thread so /live answers while warm-up is still in
+progress. A failed step is retried with exponential backoff (from
+WARMUP_RETRY_SECONDS up to WARMUP_RETRY_MAX_SECONDS), resuming at that
+step, so a transient failure delays readiness instead of leaving /ready
+at 503 until the process restarts.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from app.core.database import engine, read_engine
+from app.core.ngram_predictor import get_ngram_predictor
+from app.core.ensemble_predictor import predict_ensemble
+from app.core.fallback import STARTER_WORDS
+from app.core.languages import DEFAULT_LANGUAGE, get_language, is_supported
+from app.core.arasaac import search_pictograms
+from app.core.categories import get_category_board
+
+# Prefetch starter pictograms from ARASAAC during warm-up (network access needed)
+WARMUP_PICTOGRAMS = os.getenv("WARMUP_PICTOGRAMS", "0") == "1"
+# Connections opened at once to fill the pool
+WARMUP_DB_CONNECTIONS = int(os.getenv("WARMUP_DB_CONNECTIONS", "3"))
+# Languages loaded before ready, comma-separated (they share LANGUAGE_MEMORY_BUDGET_MB)
+WARMUP_LANGUAGES = tuple(
+    code.strip() for code in os.getenv("WARMUP_LANGUAGES", DEFAULT_LANGUAGE).split(",")
+    if code.strip() and is_supported(code.strip())
+)
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+WARMUP_RETRY_MAX_SECONDS = float(os.getenv("WARMUP_RETRY_MAX_SECONDS", "300"))
+
+SYNTHETIC_CONTEXTS = [
+    [],
+    ["yo"],
+    ["yo", "quiero"],
+    ["yo", "quiero", "comer"],
+    ["tengo", "dolor", "de"],
+]
+
+class WarmupState:
+    def __init__(self):
+        self.ready = False
+        self.started_at = None
+        self.finished_at = None
+        self.timings = {}  # {step: milliseconds}
+        self.failures = 0  # failed step runs (each one retried)
+        self.error = None  # last failure, cleared once ready
+
+    def to_dict(self):
+        return {
+            "ready": self.ready,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "timings_ms": self.timings,
+            "failures": self.failures,
+            "error": self.error,
+        }
+
+state = WarmupState()
+
+def _warm_model():
+    for lang in WARMUP_LANGUAGES:
+        get_ngram_predictor(lang)
+
+def _contexts(lang):
+    if lang == "es":
+        return SYNTHETIC_CONTEXTS
+    starters = get_language(lang).fallback.starters
+    return [[], starters[:1], starters[:2]]
+
+def _warm_predictions():
+    for lang in WARMUP_LANGUAGES:
+        for context in _contexts(lang):
+            predict_ensemble(context, num_words=15, lang=lang)
+
+def _warm_database():
+    # Check out several connections at once so the pools hold live ones.
+    # Raw DBAPI connections: on SQLite, SQLAlchemy would open BEGIN IMMEDIATE
+    # on each writer and the second one would wait for the first to finish.
+    for pool_engine in {engine, read_engine}:
+        size = WARMUP_DB_CONNECTIONS
+        if hasattr(pool_engine.pool, "size"):
+            size = max(1, min(size, pool_engine.pool.size()))
+        connections = []
+        try:
+            for _ in range(size):
+                conn = pool_engine.raw_connection()
+                connections.append(conn)
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1")
+                cursor.close()
+        finally:
+            for conn in connections:
+                conn.close()
+
+def _warm_pictograms():
+    for word in STARTER_WORDS:
+        search_pictograms(word)
+
+def _warm_categories():
+    get_category_board()
+
+def run_warmup(max_failures: int = None):
+    """
+    Run every warm-up step, recording its duration; marks the app ready on
+    success. Failed steps are retried with backoff, forever unless
+    `max_failures` is given.
+    """
+    steps = [
+        ("model", _warm_model),
+        ("predictions", _warm_predictions),
+        ("database", _warm_database),
+    ]
+    if WARMUP_PICTOGRAMS:
+        steps.append(("pictograms", _warm_pictograms))
+        steps.append(("categories", _warm_categories))
+
+    state.started_at = datetime.utcnow()
+    total_start = time.perf_counter()
+    delay = WARMUP_RETRY_SECONDS
+    while steps:
+        name, step = steps[0]
+        try:
+            start = time.perf_counter()
+            step()
+            state.timings[name] = round((time.perf_counter() - start) * 1000, 2)
+            steps.pop(0)
+        except Exception as e:
+            state.error = f"{name}: {e}"
+            state.failures += 1
+            if max_failures is not None and state.failures >= max_failures:
+                print(f"❌ Warm-up failed at step '{name}': {e}")
+                state.finished_at = datetime.utcnow()
+                return state
+            print(f"❌ Warm-up failed at step '{name}': {e} (retrying in {delay:g}s)")
+            time.sleep(delay)
+            delay = min(delay * 2, WARMUP_RETRY_MAX_SECONDS)
+
+    state.timings["total"] = round((time.perf_counter() - total_start) * 1000, 2)
+    state.finished_at = datetime.utcnow()
+    state.error = None
+    state.ready = True
+    print(f"🔥 Warm-up done: {state.timings}")
+    return state
+
+def start_warmup():
+    """Run warm-up in a daemon thread"""
+    thread = threading.Thread(target=run_warmup, name="warmup", daemon=True)
+    thread.start()
+    return thread
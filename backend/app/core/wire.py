@@ -0,0 +1,87 @@
+"""
+WebSocket wire formats.
+
+A broadcast is wrapped in one OutboundFrame shared by every recipient; the
+frame encodes itself at most once per protocol, so an N-member room costs
+one JSON encoding instead of N.
+
+Protocols (the client picks one with `?protocol=` on connect):
+
+    json     text frames, the default
+    msgpack  binary MessagePack frames; pictogram lists travel as compact
+             [[id, word], ...] under "pictos" instead of full objects with
+             URLs. Needs the optional `msgpack` package, otherwise the
+             connection silently stays on json.
+"""
+
+import json
+from fastapi import WebSocketDisconnect
+from app.core.pictograms import compact_pictograms, expand_pictograms
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+def encode_json(message: dict) -> str:
+    """Same output as starlette's send_json, so bus payloads can be reused on the wire"""
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+
+def negotiate_protocol(requested: str) -> str:
+    if requested == "msgpack" and msgpack is not None:
+        return "msgpack"
+    return "json"
+
+def compact_message(message: dict) -> dict:
+    """Message with its pictogram objects replaced by [[id, word], ...]"""
+    content = message.get("content")
+    if not content:
+        return message
+    pairs = compact_pictograms(content)
+    if pairs is None:
+        return message
+    compact = {key: value for key, value in message.items() if key != "content"}
+    compact["pictos"] = pairs
+    return compact
+
+class OutboundFrame:
+    """A message to send, with its encodings cached per protocol"""
+
+    __slots__ = ("message", "type", "_encoded")
+
+    def __init__(self, message: dict, json_text: str = None):
+        self.message = message
+        self.type = message.get("type")
+        self._encoded = {"json": json_text} if json_text is not None else {}
+
+    def encoded(self, protocol: str):
+        data = self._encoded.get(protocol)
+        if data is None:
+            if protocol == "msgpack":
+                data = msgpack.packb(compact_message(self.message), use_bin_type=True)
+            else:
+                data = encode_json(self.message)
+            self._encoded[protocol] = data
+        return data
+
+async def send_frame(websocket, frame: OutboundFrame, protocol: str):
+    if protocol == "msgpack":
+        await websocket.send_bytes(frame.encoded("msgpack"))
+    else:
+        await websocket.send_text(frame.encoded("json"))
+
+async def receive_message(websocket) -> dict:
+    """Next client message, from a JSON text frame or a MessagePack binary frame"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        if msgpack is None:
+            raise ValueError("Binary frame received but msgpack is not installed")
+        data = msgpack.unpackb(message["bytes"], raw=False)
+    else:
+        data = json.loads(message["text"])
+    # Compact clients send [[id, word], ...] instead of full pictogram objects
+    if isinstance(data, dict) and "pictos" in data and "content" not in data:
+        data["content"] = expand_pictograms((int(i), str(w)) for i, w in data.pop("pictos"))
+    return data
@@ -1,27 +1,43 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
+from app.core.pictograms import compact_pictograms, pack_pictograms, unpack_pictograms, expand_pictograms
 import json
 
 class ChatRoom(Base):
     __tablename__ = "chat_rooms"
+    __table_args__ = (
+        # Room listing sorted by recent activity
+        Index("ix_chat_rooms_last_activity_id", "last_activity_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     created_by = Column(Integer, ForeignKey("users.id"))
     
+    # Activity summary, maintained by the message writer on every insert batch
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_id = Column(Integer, nullable=True)
+    last_message_preview = Column(String, nullable=True)
+    last_activity_at = Column(DateTime, default=datetime.utcnow)
+    
     # Relationships
     messages = relationship("Message", back_populates="room", cascade="all, delete-orphan")
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Keyset pagination of a room's history: (room_id, timestamp, id)
+        Index("ix_messages_room_timestamp_id", "room_id", "timestamp", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     room_id = Column(Integer, ForeignKey("chat_rooms.id"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    content = Column(Text, nullable=False)  # JSON string with pictogram data
+    content = Column(Text, nullable=False, default="")  # Legacy JSON pictogram list ("" when pictos is set)
+    pictos = Column(Text, nullable=True)  # Packed "id<TAB>word" lines, expanded at read time
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     
     # Relationships
@@ -29,12 +45,28 @@ class Message(Base):
     user = relationship("User", back_populates="messages")
     
     def get_pictograms(self):
-        """Parse JSON content to get pictogram list"""
+        """Pictogram list, expanded from the compact form (or parsed from legacy JSON)"""
+        if self.pictos is not None:
+            return expand_pictograms(unpack_pictograms(self.pictos))
         try:
             return json.loads(self.content)
         except:
             return []
     
+    def get_compact_pictograms(self):
+        """[(id, word)] pairs without building full pictogram objects"""
+        if self.pictos is not None:
+            return unpack_pictograms(self.pictos)
+        return compact_pictograms(self.get_pictograms()) or []
+    
     def set_pictograms(self, pictograms: list):
-        """Store pictogram list as JSON"""
-        self.content = json.dumps(pictograms, ensure_ascii=False)
+        """Store pictogram list (compact when every item has an ARASAAC id)"""
+        self.content, self.pictos = Message.encode_pictograms(pictograms)
+    
+    @staticmethod
+    def encode_pictograms(pictograms: list):
+        """(content, pictos) column values for a pictogram list"""
+        pairs = compact_pictograms(pictograms)
+        if pairs is None:
+            return json.dumps(pictograms, ensure_ascii=False), None
+        return "", pack_pictograms(pairs)
@@ -2,7 +2,7 @@ from sqlalchemy import Column, Integer, String, DateTime
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
-import hashlib
+from app.core.passwords import HashingOverloaded, password_hasher
 
 class User(Base):
     __tablename__ = "users"
@@ -18,9 +18,24 @@ class User(Base):
     
     def verify_password(self, password: str) -> bool:
         """Verify password against stored hash"""
-        return self.password_hash == hashlib.sha256(password.encode()).hexdigest()
+        return password_hasher.verify(password, self.password_hash)[0]
+    
+    def verify_and_upgrade_password(self, password: str) -> bool:
+        """
+        Verify password and rehash legacy/outdated hashes in place (caller commits).
+
+        The upgrade is best-effort: if the hashing pool is saturated the old
+        hash is kept and the next login tries again.
+        """
+        ok, needs_rehash = password_hasher.verify(password, self.password_hash)
+        if needs_rehash:
+            try:
+                self.password_hash = password_hasher.hash(password)
+            except HashingOverloaded:
+                pass
+        return ok
     
     @staticmethod
     def hash_password(password: str) -> str:
-        """Hash password using SHA-256"""
-        return hashlib.sha256(password.encode()).hexdigest()
+        """Hash password with the configured KDF (scrypt by default)"""
+        return password_hasher.hash(password)
@@ -0,0 +1,53 @@
+from typing import Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel
+from app.core.admin import require_admin
+from app.core.admission import admission
+from app.core.arasaac import lookup_metrics
+from app.core.cache_registry import registry as cache_registry
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+class InvalidateRequest(BaseModel):
+    prefix: Optional[str] = None  # key prefix, e.g. "es:yo"; None = whole cache
+
+class InvalidateResponse(BaseModel):
+    cache: str
+    removed: int
+
+@router.get("/metrics")
+def metrics() -> Dict[str, dict]:
+    """
+    Counters of this worker: /recommend load shedding (rate limits, pipeline
+    slots, degraded answers) and coalesced ARASAAC lookups
+    """
+    return {"recommend_admission": admission.metrics(), "pictogram_lookups": lookup_metrics()}
+
+@router.get("/caches")
+def list_caches() -> Dict[str, dict]:
+    """Stats of every registered cache in this worker (entries, bytes, hit rate, evictions, limits)"""
+    return cache_registry.stats()
+
+@router.get("/caches/{name}")
+def get_cache(name: str) -> dict:
+    return _cache(name).cache_stats()
+
+@router.post("/caches/{name}/invalidate", response_model=InvalidateResponse)
+def invalidate_cache(name: str, data: Optional[InvalidateRequest] = None):
+    """Drop entries of one cache whose key starts with `prefix` (all entries without a body)"""
+    _cache(name)
+    prefix = data.prefix if data else None
+    try:
+        removed = cache_registry.invalidate(name, prefix)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"cache": name, "removed": removed}
+
+def _cache(name: str):
+    try:
+        return cache_registry.get(name)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown cache. Use one of: {', '.join(cache_registry.names())}"
+        )
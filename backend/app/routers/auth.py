@@ -1,15 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.models.user import User
+from app.core.sessions import Principal, create_session_store
+from app.core.cache_registry import registry as cache_registry
 from datetime import datetime, timedelta
-import secrets
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
-# Simple session token storage (in production use Redis or JWT)
-active_sessions = {}  # {token: user_id}
+# Session tokens with TTL; backend chosen by SESSION_STORE_URL (memory, sqlite, redis)
+session_store = cache_registry.register("sessions", create_session_store())
 
 # Pydantic models for request/response
 class UserRegister(BaseModel):
@@ -43,18 +44,26 @@ class PasswordChange(BaseModel):
     old_password: str
     new_password: str
 
+class StatusResponse(BaseModel):
+    message: str
+
 @router.post("/register", response_model=TokenResponse)
-def register(user_data: UserRegister, db: Session = Depends(get_db)):
+def register(
+    user_data: UserRegister,
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db)
+):
     """Register a new user"""
+    # Checks and hashing happen before touching the writer connection
     # Check if username exists
-    if db.query(User).filter(User.username == user_data.username).first():
+    if read_db.query(User).filter(User.username == user_data.username).first():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already exists"
         )
     
     # Check if email exists
-    if db.query(User).filter(User.email == user_data.email).first():
+    if read_db.query(User).filter(User.email == user_data.email).first():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already exists"
@@ -72,8 +81,7 @@ def register(user_data: UserRegister, db: Session = Depends(get_db)):
     db.refresh(new_user)
     
     # Create session token
-    token = secrets.token_urlsafe(32)
-    active_sessions[token] = new_user.id
+    token = session_store.create(Principal(new_user.id, new_user.username))
     
     return {
         "token": token,
@@ -81,43 +89,58 @@ def register(user_data: UserRegister, db: Session = Depends(get_db)):
     }
 
 @router.post("/login", response_model=TokenResponse)
-def login(credentials: UserLogin, db: Session = Depends(get_db)):
+def login(
+    credentials: UserLogin,
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db)
+):
     """Login user and get session token"""
-    user = db.query(User).filter(User.username == credentials.username).first()
+    user = read_db.query(User).filter(User.username == credentials.username).first()
     
-    if not user or not user.verify_password(credentials.password):
+    if not user or not user.verify_and_upgrade_password(credentials.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password"
         )
     
+    # Persist the upgraded hash if the stored one was legacy SHA-256
+    # (a short write after hashing, so the writer connection isn't held during the KDF)
+    if read_db.is_modified(user):
+        db.query(User).filter(User.id == user.id).update({User.password_hash: user.password_hash})
+        db.commit()
+    
     # Create session token
-    token = secrets.token_urlsafe(32)
-    active_sessions[token] = user.id
+    token = session_store.create(Principal(user.id, user.username))
     
     return {
         "token": token,
         "user": user
     }
 
-@router.post("/logout")
+@router.post("/logout", response_model=StatusResponse)
 def logout(token: str):
     """Logout user and invalidate token"""
-    if token in active_sessions:
-        del active_sessions[token]
+    session_store.delete(token)
     return {"message": "Logged out successfully"}
 
-@router.get("/me", response_model=UserResponse)
-def get_current_user(token: str, db: Session = Depends(get_db)):
-    """Get current user info from token"""
-    user_id = active_sessions.get(token)
-    if not user_id:
+# Dependency to get the authenticated principal (no database access)
+def get_current_principal(token: str) -> Principal:
+    """Dependency resolving the session token to its cached principal"""
+    principal = session_store.get(token)
+    if principal is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token"
         )
-    
-    user = db.query(User).filter(User.id == user_id).first()
+    return principal
+
+@router.get("/me", response_model=UserResponse)
+def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_read_db)
+):
+    """Get current user info from token"""
+    user = db.query(User).filter(User.id == principal.id).first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -126,17 +149,13 @@ def get_current_user(token: str, db: Session = Depends(get_db)):
     
     return user
 
-# Dependency to get current user
-def get_current_user_dep(token: str, db: Session = Depends(get_db)) -> User:
+# Dependency to get current user (full row, for endpoints that need it)
+def get_current_user_dep(
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_read_db)
+) -> User:
     """Dependency to get current authenticated user"""
-    user_id = active_sessions.get(token)
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token"
-        )
-    
-    user = db.query(User).filter(User.id == user_id).first()
+    user = db.query(User).filter(User.id == principal.id).first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -145,7 +164,7 @@ def get_current_user_dep(token: str, db: Session = Depends(get_db)) -> User:
     
     return user
 
-@router.post("/change-password")
+@router.post("/change-password", response_model=StatusResponse)
 def change_password(
     data: PasswordChange,
     token: str,
@@ -167,20 +186,22 @@ def change_password(
             detail="New password must be at least 6 characters long"
         )
     
-    # Update password
-    current_user.password_hash = User.hash_password(data.new_password)
+    # Update password (current_user comes from the read session)
+    new_hash = User.hash_password(data.new_password)
+    db.query(User).filter(User.id == current_user.id).update({User.password_hash: new_hash})
     db.commit()
     
     return {"message": "Password changed successfully"}
 
-@router.post("/reset-password")
+@router.post("/reset-password", response_model=StatusResponse)
 def reset_password(
     data: PasswordReset,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db)
 ):
     """Reset password using email and username verification"""
     # Find user by email and username
-    user = db.query(User).filter(
+    user = read_db.query(User).filter(
         User.email == data.email,
         User.username == data.username
     ).first()
@@ -199,7 +220,8 @@ def reset_password(
         )
     
     # Update password
-    user.password_hash = User.hash_password(data.new_password)
+    new_hash = User.hash_password(data.new_password)
+    db.query(User).filter(User.id == user.id).update({User.password_hash: new_hash})
     db.commit()
     
     return {"message": "Password reset successfully"}
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Request, Response
+from app.core.categories import get_category_board
+from app.core.http_cache import cached_json_response
+
+router = APIRouter(tags=["categories"])
+
+@router.get("/categories")
+def get_categories(request: Request):
+    """
+    Category boards with their pictograms, e.g. {"categories": [{"id": "comida", "pictograms": [...]}]}
+
+    Served from a cached, pre-encoded response; send If-None-Match to get a 304.
+    A board missing pictograms because ARASAAC failed is sent with no-store.
+    """
+    board = get_category_board()
+    if not board.complete:
+        return Response(content=board.body, media_type="application/json", headers={"Cache-Control": "no-store"})
+    return cached_json_response(request, board.body, board.etag)
@@ -1,43 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from sqlalchemy import delete, or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple, Union
 from datetime import datetime
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.models.chat import ChatRoom, Message
 from app.models.user import User
-from app.routers.auth import get_current_user_dep, active_sessions
+from app.routers.auth import get_current_principal, session_store, StatusResponse
+from app.core.sessions import Principal
+from starlette.concurrency import run_in_threadpool
+from app.core.connections import ConnectionManager
+from app.core.presence import PresenceService
+from app.core.history import HistoryBuffer, HISTORY_REPLAY_LIMIT
+from app.core.cache_registry import registry as cache_registry
+from app.core.persistence import MessageWriter
+from app.core.rooms import record_room_activity
+from app.core import archive
+from app.core.search import index_messages, search_message_ids, delete_room_index
+from app.core.pictograms import compact_pictograms, expand_pictograms, unpack_pictograms
+from app.core.wire import OutboundFrame, negotiate_protocol, receive_message
+from app.core.responses import JSONBytesResponse, json_array
+import base64
 import json
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-# WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[int, List[WebSocket]] = {}  # {room_id: [websockets]}
-    
-    async def connect(self, websocket: WebSocket, room_id: int):
-        await websocket.accept()
-        if room_id not in self.active_connections:
-            self.active_connections[room_id] = []
-        self.active_connections[room_id].append(websocket)
-    
-    def disconnect(self, websocket: WebSocket, room_id: int):
-        if room_id in self.active_connections:
-            self.active_connections[room_id].remove(websocket)
-            if not self.active_connections[room_id]:
-                del self.active_connections[room_id]
-    
-    async def broadcast(self, message: dict, room_id: int):
-        if room_id in self.active_connections:
-            for connection in self.active_connections[room_id]:
-                try:
-                    await connection.send_json(message)
-                except:
-                    pass
-
+# WebSocket connection manager (per-connection outbound queues)
 manager = ConnectionManager()
 
+# Room membership and typing indicators, broadcast as batched diffs
+presence = PresenceService(manager)
+
+# Recent messages per room, fed by every delivered broadcast
+history = cache_registry.register("history", HistoryBuffer())
+manager.add_listener("message", history.append)
+
+def on_message_batch(conn, rows):
+    """Room activity summaries and search index, in the insert transaction"""
+    record_room_activity(conn, rows)
+    index_messages(conn, rows)
+
+# Write-behind persistence for chat messages (batched INSERTs off the event loop)
+message_writer = MessageWriter(Message.__table__, on_batch=on_message_batch)
+
 # Pydantic models
 class RoomCreate(BaseModel):
     name: str
@@ -47,10 +54,18 @@ class RoomResponse(BaseModel):
     name: str
     created_at: datetime
     created_by: int
+    message_count: int = 0
+    last_message_id: Optional[int] = None
+    last_message_preview: Optional[str] = None
+    last_activity_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+class RoomListResponse(BaseModel):
+    rooms: List[RoomResponse]
+    next_cursor: Optional[str] = None
+
 class MessageCreate(BaseModel):
     content: List[dict]  # List of pictogram objects
 
@@ -62,59 +77,252 @@ class MessageResponse(BaseModel):
     content: List[dict]
     timestamp: datetime
 
+class CompactMessageResponse(BaseModel):
+    id: int
+    room_id: int
+    user_id: int
+    username: str
+    pictos: List[Tuple[int, str]]  # [[ARASAAC id, word], ...]
+    timestamp: datetime
+
+class SearchResponse(BaseModel):
+    results: List[MessageResponse]
+    next_cursor: Optional[int] = None  # pass as before_id for the next page
+
 # REST Endpoints
 @router.post("/rooms", response_model=RoomResponse)
 def create_room(
     room_data: RoomCreate,
     token: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_dep)
+    read_db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Create a new chat room"""
-    # Check if room name exists
-    if db.query(ChatRoom).filter(ChatRoom.name == room_data.name).first():
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Room name already exists"
-        )
+    # Check if room name exists (the unique index catches a concurrent create)
+    if read_db.query(ChatRoom).filter(ChatRoom.name == room_data.name).first():
+        raise _room_name_taken()
     
+    now = datetime.utcnow()
     new_room = ChatRoom(
         name=room_data.name,
-        created_by=current_user.id
+        created_by=current_user.id,
+        created_at=now,
+        last_activity_at=now
     )
     
     db.add(new_room)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise _room_name_taken()
     db.refresh(new_room)
     
     return new_room
 
-@router.get("/rooms", response_model=List[RoomResponse])
-def get_rooms(db: Session = Depends(get_db)):
-    """Get all chat rooms"""
-    rooms = db.query(ChatRoom).order_by(ChatRoom.created_at.desc()).all()
-    return rooms
+def _room_name_taken():
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Room name already exists"
+    )
 
-@router.get("/rooms/{room_id}/messages")
-def get_messages(room_id: int, limit: int = 50, db: Session = Depends(get_db)):
-    """Get message history for a room"""
-    room = db.query(ChatRoom).filter(ChatRoom.id == room_id).first()
-    if not room:
+def _encode_room_cursor(room: ChatRoom, sort: str) -> str:
+    key = room.last_activity_at.isoformat() if sort == "activity" else ""
+    return base64.urlsafe_b64encode(f"{key}|{room.id}".encode()).decode()
+
+def _decode_room_cursor(cursor: str):
+    try:
+        key, room_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return (datetime.fromisoformat(key) if key else None), int(room_id)
+    except (ValueError, UnicodeDecodeError):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Room not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
         )
+
+@router.get("/rooms", response_model=RoomListResponse)
+def get_rooms(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    sort: str = Query("activity", pattern="^(activity|created)$"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    List chat rooms with their activity summary, keyset-paginated.
     
-    messages = (
+    `sort=activity` (default) orders by last activity using the
+    (last_activity_at, id) index; `sort=created` orders by newest room.
+    Pass `next_cursor` back as `cursor` for the next page.
+    """
+    query = db.query(ChatRoom)
+    if sort == "activity":
+        if cursor:
+            cursor_ts, cursor_id = _decode_room_cursor(cursor)
+            query = query.filter(
+                ChatRoom.last_activity_at <= cursor_ts,
+                or_(ChatRoom.last_activity_at < cursor_ts, ChatRoom.id < cursor_id)
+            )
+        query = query.order_by(ChatRoom.last_activity_at.desc(), ChatRoom.id.desc())
+    else:
+        # Ids grow with creation time, so the primary key gives this order
+        if cursor:
+            _, cursor_id = _decode_room_cursor(cursor)
+            query = query.filter(ChatRoom.id < cursor_id)
+        query = query.order_by(ChatRoom.id.desc())
+    
+    rooms = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rooms) > limit:
+        rooms = rooms[:limit]
+        next_cursor = _encode_room_cursor(rooms[-1], sort)
+    
+    return {"rooms": rooms, "next_cursor": next_cursor}
+
+@router.get(
+    "/rooms/{room_id}/messages",
+    response_class=JSONBytesResponse,
+    responses={200: {"model": Union[List[MessageResponse], List[CompactMessageResponse]]}},
+)
+def get_messages(
+    room_id: int,
+    limit: int = Query(50, ge=1, le=200),
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    format: str = Query("full", pattern="^(full|compact)$"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get message history for a room, keyset-paginated on (timestamp, id).
+    
+    Without a cursor returns the newest `limit` messages. Pass the oldest id
+    you have as `before_id` to page backwards, or the newest as `after_id` to
+    catch up. Results are newest-first unless `order=asc`.
+    
+    `format=compact` returns `pictos: [[id, word], ...]` instead of full
+    pictogram objects; clients build image URLs from the id.
+    
+    Pages inside the recent window are served from the in-memory history
+    buffer without touching the database; older pages continue into the
+    compressed archive once they run past the hot table. Buffered messages
+    keep their encoded JSON, so those pages are only concatenated.
+    """
+    if before_id is not None and after_id is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either before_id or after_id, not both"
+        )
+    
+    page = history.page if format == "compact" else history.page_bodies
+    buffered = page(room_id, limit, before_id, after_id)
+    if buffered is None:
+        room = db.query(ChatRoom).filter(ChatRoom.id == room_id).first()
+        if not room:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Room not found"
+            )
+        if history.load(room_id, db):
+            buffered = page(room_id, limit, before_id, after_id)
+    if buffered is not None:
+        if order == "asc":
+            buffered.reverse()
+        if format == "compact":
+            return JSONBytesResponse([
+                {
+                    "id": message["id"],
+                    "room_id": message["room_id"],
+                    "user_id": message["user_id"],
+                    "username": message["username"],
+                    "pictos": compact_pictograms(message["content"]) or [],
+                    "timestamp": message["timestamp"]
+                }
+                for message in buffered
+            ])
+        return JSONBytesResponse(json_array(buffered))
+    
+    query = (
         db.query(Message, User.username)
         .join(User, Message.user_id == User.id)
         .filter(Message.room_id == room_id)
-        .order_by(Message.timestamp.asc())
-        .limit(limit)
-        .all()
     )
     
-    return [
+    cursor_id = before_id if before_id is not None else after_id
+    cursor_archived = False
+    if cursor_id is not None:
+        cursor_ts = (
+            db.query(Message.timestamp)
+            .filter(Message.id == cursor_id, Message.room_id == room_id)
+            .scalar()
+        )
+        if cursor_ts is None:
+            cursor_ts = archive.find_timestamp(db, room_id, cursor_id)
+            cursor_archived = cursor_ts is not None
+        if cursor_ts is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Cursor message not found"
+            )
+    
+    if after_id is not None:
+        # Oldest messages after the cursor, flipped to newest-first below
+        messages = []
+        key = (cursor_ts, after_id)
+        if cursor_archived:
+            messages = archive.after(db, room_id, key, limit)
+            if messages:
+                key = (messages[-1][0].timestamp, messages[-1][0].id)
+        if len(messages) < limit:
+            messages += (
+                query.filter(
+                    Message.timestamp >= key[0],
+                    or_(Message.timestamp > key[0], Message.id > key[1])
+                )
+                .order_by(Message.timestamp.asc(), Message.id.asc())
+                .limit(limit - len(messages))
+                .all()
+            )
+        messages.reverse()
+    else:
+        messages = []
+        if not cursor_archived:
+            if before_id is not None:
+                # The bare `<=` bound lets the index range-scan; the OR breaks ties on id
+                query = query.filter(
+                    Message.timestamp <= cursor_ts,
+                    or_(Message.timestamp < cursor_ts, Message.id < before_id)
+                )
+            messages = (
+                query.order_by(Message.timestamp.desc(), Message.id.desc())
+                .limit(limit)
+                .all()
+            )
+        if len(messages) < limit:
+            # Page crosses into archived history
+            if messages:
+                key = (messages[-1][0].timestamp, messages[-1][0].id)
+            else:
+                key = (cursor_ts, before_id) if before_id is not None else None
+            messages += archive.before(db, room_id, key, limit - len(messages))
+    
+    if order == "asc":
+        messages.reverse()
+    
+    if format == "compact":
+        return JSONBytesResponse([
+            {
+                "id": msg.id,
+                "room_id": msg.room_id,
+                "user_id": msg.user_id,
+                "username": username,
+                "pictos": msg.get_compact_pictograms(),
+                "timestamp": msg.timestamp
+            }
+            for msg, username in messages
+        ])
+    
+    return JSONBytesResponse([
         {
             "id": msg.id,
             "room_id": msg.room_id,
@@ -124,17 +332,60 @@ def get_messages(room_id: int, limit: int = 50, db: Session = Depends(get_db)):
             "timestamp": msg.timestamp
         }
         for msg, username in messages
+    ])
+
+@router.get("/search", response_model=SearchResponse)
+def search_messages(
+    q: str = Query(..., min_length=1, max_length=200),
+    room_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    before_id: Optional[int] = None,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Messages containing every word in `q` (e.g. "medicina dolor"), newest first.
+    
+    Filter with `room_id` and/or `user_id`; page with `before_id=next_cursor`.
+    """
+    ids = search_message_ids(db, q, room_id=room_id, user_id=user_id, before_id=before_id, limit=limit + 1)
+    next_cursor = ids[limit - 1] if len(ids) > limit else None
+    ids = ids[:limit]
+    if not ids:
+        return {"results": [], "next_cursor": None}
+    
+    rows = {
+        msg.id: (msg, username)
+        for msg, username in (
+            db.query(Message, User.username)
+            .join(User, Message.user_id == User.id)
+            .filter(Message.id.in_(ids))
+            .all()
+        )
+    }
+    results = [
+        {
+            "id": msg.id,
+            "room_id": msg.room_id,
+            "user_id": msg.user_id,
+            "username": username,
+            "content": msg.get_pictograms(),
+            "timestamp": msg.timestamp
+        }
+        for msg, username in (rows[i] for i in ids if i in rows)
     ]
+    return {"results": results, "next_cursor": next_cursor}
 
-@router.delete("/rooms/{room_id}")
+@router.delete("/rooms/{room_id}", response_model=StatusResponse)
 def delete_room(
     room_id: int,
     token: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user_dep)
+    read_db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Delete a chat room (only creator can delete)"""
-    room = db.query(ChatRoom).filter(ChatRoom.id == room_id).first()
+    room = read_db.query(ChatRoom).filter(ChatRoom.id == room_id).first()
     if not room:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -148,9 +399,14 @@ def delete_room(
             detail="Only the room creator can delete this room"
         )
     
-    # Delete the room (messages will be deleted automatically due to cascade)
-    db.delete(room)
+    # Delete the room and its messages in one write transaction (bulk deletes
+    # also catch messages flushed by the writer since the lookup above)
+    db.execute(delete(Message).where(Message.room_id == room_id))
+    db.execute(delete(ChatRoom).where(ChatRoom.id == room_id))
+    delete_room_index(db, room_id)
+    archive.delete_room_archive(db, room_id)
     db.commit()
+    history.drop(room_id)
     
     return {"message": "Room deleted successfully"}
 
@@ -160,17 +416,22 @@ async def websocket_endpoint(
     websocket: WebSocket,
     room_id: int,
     token: str,
-    db: Session = Depends(get_db)
+    protocol: str = "json",
+    last_seen_id: Optional[int] = None,
+    db: Session = Depends(get_read_db)
 ):
-    """WebSocket endpoint for real-time chat"""
-    # Authenticate user
-    user_id = active_sessions.get(token)
-    if not user_id:
-        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-        return
+    """
+    WebSocket endpoint for real-time chat (protocol: json or msgpack).
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    Reconnecting clients pass the newest message id they have as
+    `last_seen_id`; up to HISTORY_REPLAY_LIMIT missed messages are replayed,
+    followed by {"type": "replay", "count": n, "more": bool}. If `more` is
+    true, fetch the rest with GET /messages?after_id=<last replayed id>.
+    Replayed messages may also arrive live; clients dedupe by id.
+    """
+    # Authenticate user from the session's cached principal (no users query)
+    user = await run_in_threadpool(session_store.get, token)
+    if user is None:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
     
@@ -180,59 +441,72 @@ async def websocket_endpoint(
         await websocket.close(code=status.WS_1003_UNSUPPORTED_DATA)
         return
     
-    await manager.connect(websocket, room_id)
+    # The receive loop never touches the session; give its connection back to the pool
+    db.close()
     
-    # Notify others that user joined
-    await manager.broadcast({
-        "type": "user_joined",
-        "username": user.username,
-        "user_id": user.id
-    }, room_id)
+    connection = await manager.connect(websocket, room_id, protocol=negotiate_protocol(protocol))
+    
+    # Send the current members; others learn about the join in the next presence diff
+    presence.join(room_id, user, connection)
+    
+    if last_seen_id is not None:
+        missed = history.since(room_id, last_seen_id)
+        if missed is None:
+            missed = await run_in_threadpool(history.missed_since, room_id, last_seen_id, HISTORY_REPLAY_LIMIT + 1)
+        for message in missed[:HISTORY_REPLAY_LIMIT]:
+            connection.enqueue(OutboundFrame(message))
+        connection.enqueue(OutboundFrame({
+            "type": "replay",
+            "count": min(len(missed), HISTORY_REPLAY_LIMIT),
+            "more": len(missed) > HISTORY_REPLAY_LIMIT
+        }))
     
     try:
         while True:
             # Receive message from client
-            data = await websocket.receive_json()
+            data = await receive_message(websocket)
+            if not isinstance(data, dict):
+                continue
             
             if data.get("type") == "message":
-                # Save message to database
-                new_message = Message(
-                    room_id=room_id,
-                    user_id=user.id,
-                )
-                new_message.set_pictograms(data.get("content", []))
-                
-                db.add(new_message)
-                db.commit()
-                db.refresh(new_message)
+                # Queue message for the background writer; id comes from a reserved block
+                content = data.get("content", [])
+                if not isinstance(content, list):
+                    continue  # Malformed frame: ignore it rather than drop the connection
+                stored_content, pictos = Message.encode_pictograms(content)
+                if pictos is not None:
+                    # Broadcast the same canonical objects history will return
+                    content = expand_pictograms(unpack_pictograms(pictos))
+                message_id = await message_writer.next_id()
+                timestamp = datetime.utcnow()
+                await message_writer.enqueue({
+                    "id": message_id,
+                    "room_id": room_id,
+                    "user_id": user.id,
+                    "content": stored_content,
+                    "pictos": pictos,
+                    "timestamp": timestamp,
+                })
                 
                 # Broadcast to all users in room
                 await manager.broadcast({
                     "type": "message",
-                    "id": new_message.id,
+                    "id": message_id,
                     "room_id": room_id,
                     "user_id": user.id,
                     "username": user.username,
-                    "content": new_message.get_pictograms(),
-                    "timestamp": new_message.timestamp.isoformat()
+                    "content": content,
+                    "timestamp": timestamp.isoformat()
                 }, room_id)
             
             elif data.get("type") == "typing":
-                # Broadcast typing indicator (don't save to DB)
-                await manager.broadcast({
-                    "type": "typing",
-                    "user_id": user.id,
-                    "username": user.username
-                }, room_id)
+                # Throttled and batched into the next presence diff (not saved to DB)
+                presence.typing(room_id, user)
     
     except WebSocketDisconnect:
         manager.disconnect(websocket, room_id)
-        # Notify others that user left
-        await manager.broadcast({
-            "type": "user_left",
-            "username": user.username,
-            "user_id": user.id
-        }, room_id)
+        presence.leave(room_id, user)
     except Exception as e:
         print(f"WebSocket error: {e}")
         manager.disconnect(websocket, room_id)
+        presence.leave(room_id, user)
@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.core import warmup
+
+router = APIRouter(tags=["health"])
+
+@router.get("/live")
+def live():
+    """Liveness probe: the process is up and serving HTTP"""
+    return {"status": "alive"}
+
+@router.get("/ready")
+def ready():
+    """Readiness probe: 503 until warm-up has finished successfully"""
+    body = warmup.state.to_dict()
+    if not warmup.state.ready:
+        return JSONResponse(status_code=503, content=body)
+    return body
@@ -0,0 +1,34 @@
+import requests
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from app.core import images
+from app.core.http_cache import not_modified
+
+router = APIRouter(tags=["images"])
+
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+@router.get("/pictograms/{picto_id}/{variant}")
+async def pictogram_image(picto_id: int, variant: str, request: Request):
+    """
+    Pictogram image through the disk cache, e.g. /pictograms/2349/96.webp
+
+    Sizes: 96, 150, 300. Formats: png, webp.
+    """
+    size, _, fmt = variant.partition(".")
+    if not size.isdigit() or int(size) not in images.IMAGE_SIZES or fmt not in images.IMAGE_FORMATS:
+        raise HTTPException(status_code=404, detail="Unknown image variant")
+
+    try:
+        image = await images.get_image(picto_id, int(size), fmt)
+    except requests.RequestException as e:
+        print(f"Pictogram image fetch failed for {picto_id}: {e}")
+        raise HTTPException(status_code=502, detail="Pictogram image unavailable")
+    if image is None:
+        raise HTTPException(status_code=404, detail="Pictogram not found")
+
+    headers = {"ETag": image.etag, "Cache-Control": IMAGE_CACHE_CONTROL}
+    if not_modified(request, image.etag):
+        return Response(status_code=304, headers=headers)
+    # Streamed from the blob file without blocking the event loop
+    return FileResponse(image.path, media_type=image.media_type, headers=headers)
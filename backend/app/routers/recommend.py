@@ -1,12 +1,47 @@
-from fastapi import APIRouter
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 from app.core.ensemble_predictor import predict_next_words_cached
 from app.core.fallback import get_fallback_suggestions
-from app.core.arasaac import search_pictograms
+from app.core.arasaac import lookup_pictograms, cached_pictograms, pictogram_url
+from app.core.admission import PrincipalResolver, admission
+from app.core.profiling import stage, capture
+from app.core.http_cache import cached_json_response, not_modified
+from app.core.recommend_cache import cache_key, etag_for_key, recommend_cache
+from app.core.responses import json_bytes
+from app.core.languages import DEFAULT_LANGUAGE, SUPPORTED_LANGUAGES, get_language, is_supported, registry as language_registry
+from app.routers.auth import session_store
 
 router = APIRouter()
 
-@router.post("/recommend")
-def recommend(data: dict):
+# Degraded answers must not be cached as if they were the real recommendation:
+# "overload" (shed by admission control) or "pictograms" (some ARASAAC lookups failed)
+def degraded_headers(reason: str) -> dict:
+    return {"Cache-Control": "no-store", "X-Recommend-Degraded": reason}
+
+# `token` -> user id for the per-user rate limit
+principals = PrincipalResolver(session_store.get)
+
+async def limit_rate(request: Request, token: Optional[str] = None):
+    """Per-IP and per-user rate limits, checked on the event loop"""
+    await admission.check_rate(token, request.client.host if request.client else None, principals)
+
+class RecommendRequest(BaseModel):
+    selected: List[str] = []  # words of the sentence so far
+    lang: str = DEFAULT_LANGUAGE  # es, ca, gl, en (SUPPORTED_LANGUAGES)
+
+class RecommendedPictogram(BaseModel):
+    palabra: str
+    id: int
+    url: str
+    keywords: List[dict] = []  # ARASAAC keyword objects
+
+class RecommendResponse(BaseModel):
+    recommended: List[RecommendedPictogram]
+
+@router.post("/recommend", response_model=RecommendResponse, dependencies=[Depends(limit_rate)])
+async def recommend(data: RecommendRequest):
     """
     Hybrid AI system for pictogram recommendation.
     
@@ -21,12 +56,105 @@ def recommend(data: dict):
     - Efficient resource usage (~266 MB RAM, 85-90% accuracy)
     - 100% local, no external APIs
     - Deployable on free hosting (Render 512 MB tier)
+
+    Rate limited per client IP and per signed-in user (`token`) with 429;
+    under overload the answer is degraded to fallback words (see
+    app/core/admission.py).
+
+    POST answers are never revalidated, so they carry no ETag; use
+    GET /recommend for conditional requests.
+    """
+    await _load_language(data.lang)
+    key = cache_key(data.selected, data.lang)
+    body, degraded = await _cached_body(key, data.selected, data.lang)
+    headers = degraded_headers(degraded) if degraded else None
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/recommend", response_model=RecommendResponse, dependencies=[Depends(limit_rate)])
+async def recommend_get(
+    request: Request,
+    selected: List[str] = Query(default=[]),
+    lang: str = DEFAULT_LANGUAGE
+):
+    """
+    Same as POST /recommend, but cacheable by browsers: /recommend?selected=yo&selected=quiero&lang=es
+
+    Answers If-None-Match with 304 without running the models.
+    """
+    await _load_language(lang)
+    key = cache_key(selected, lang)
+    etag = etag_for_key(key)
+    if not_modified(request, etag):
+        # The ETag is known up front: no prediction or body needed
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    body, degraded = await _cached_body(key, selected, lang)
+    if degraded:
+        return Response(content=body, media_type="application/json", headers=degraded_headers(degraded))
+    return cached_json_response(request, body, etag)
+
+def _check_language(lang: str):
+    if not is_supported(lang):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported language. Use one of: {', '.join(SUPPORTED_LANGUAGES)}"
+        )
+
+async def _load_language(lang: str):
+    """Validate `lang` and load it off the event loop if needed (cache keys use its model)"""
+    _check_language(lang)
+    if not language_registry.is_loaded(lang):
+        await run_in_threadpool(get_language, lang)
+
+async def _cached_body(key, words, lang):
+    """
+    Encoded response for `words` and why it is degraded: None for the full
+    answer, "overload" or "pictograms". Only full answers are cached.
+
+    Cache hits and shed requests are answered on the event loop; only
+    admitted requests take a threadpool thread.
     """
-    words = data.get("selected", [])
+    body = recommend_cache.get(key)
+    if body is not None:
+        return body, None
+    async with admission.pipeline_slot() as admitted:
+        if not admitted:
+            return json_bytes(_degraded(words, lang)), "overload"
+        result, complete = await run_in_threadpool(_recommend_captured, words, lang)
+    body = json_bytes(result)
+    if not complete:
+        return body, "pictograms"
+    recommend_cache.put(key, body)
+    return body, None
+
+def _degraded(words, lang=None):
+    """Fallback words that already have a cached pictogram: no model, no ARASAAC calls"""
+    candidates = get_fallback_suggestions(words, num_suggestions=30, tables=get_language(lang).fallback)
+    pictos, _ = _resolve_pictograms(candidates, lang, lookup=cached_pictograms)
+    return {
+        "recommended": pictos
+    }
+
+def _recommend_captured(words, lang=None):
+    with capture():
+        return _recommend(words, lang)
+
+def _recommend(words, lang=None):
+    """The response and whether every pictogram lookup succeeded"""
+    with stage("predict"):
+        candidates = _predict_candidates(words, lang)
     
+    with stage("pictograms"):
+        pictos, complete = _resolve_pictograms(candidates, lang)
+    
+    return {
+        "recommended": pictos
+    }, complete
+
+def _predict_candidates(words, lang=None):
+    fallback_tables = get_language(lang).fallback
     if not words:
         # First word: use fallback starters
-        candidates = get_fallback_suggestions([], num_suggestions=12)
+        candidates = get_fallback_suggestions([], num_suggestions=12, tables=fallback_tables)
     else:
         try:
             # Build context
@@ -40,32 +168,41 @@ def recommend(data: dict):
             # - Consensus boosting
             # - Fallback integration
             
-            candidates = predict_next_words_cached(context, num_words=15)
+            candidates = predict_next_words_cached(context, num_words=15, lang=lang)
             
         except Exception as e:
             print(f"Hybrid prediction failed: {e}")
             # Graceful degradation to fallback
-            candidates = get_fallback_suggestions(words, num_suggestions=15)
+            candidates = get_fallback_suggestions(words, num_suggestions=15, tables=fallback_tables)
     
-    # Search pictograms for candidates
+    return candidates
+
+def _resolve_pictograms(candidates, lang=None, lookup=None):
+    """
+    Pictograms for the first candidates that have one, and whether every
+    lookup succeeded (`lookup` returns None or raises on failure)
+    """
+    lookup = lookup or lookup_pictograms
     pictos = []
+    complete = True
     for word in candidates:
         try:
-            result = search_pictograms(word)
-            if result:
+            result = lookup(word, lang)
+            if result is None:
+                complete = False
+            elif result:
                 picto_id = result[0]["_id"]
                 pictos.append({
                     "palabra": word,
                     "id": picto_id,
-                    "url": f"https://static.arasaac.org/pictograms/{picto_id}/{picto_id}_300.png",
+                    "url": pictogram_url(picto_id),
                     "keywords": result[0].get("keywords", [])
                 })
                 
                 if len(pictos) >= 12:
                     break
         except Exception as e:
+            complete = False
             continue
     
-    return {
-        "recommended": pictos
-    }
+    return pictos, complete
@@ -1,10 +1,17 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers.recommend import router as recommend_router
-from app.routers.chat import router as chat_router
+from app.routers.chat import router as chat_router, manager as chat_manager, message_writer, presence
 from app.routers.auth import router as auth_router
+from app.routers.health import router as health_router
+from app.routers.images import router as images_router
+from app.routers.categories import router as categories_router
+from app.routers.admin import router as admin_router
 from app.core.database import init_db
+from app.core.profiling import ProfilingMiddleware
+from app.core.compression import CompressionMiddleware
+from app.core.warmup import start_warmup
 
 app = FastAPI()
 
@@ -15,23 +22,51 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-Dump"],
 )
 
-# Initialize database on startup
+# Compress JSON responses (recommendations, chat history) above COMPRESSION_MIN_SIZE
+app.add_middleware(CompressionMiddleware)
+
+# Opt-in per-request profiling (X-Profile header + admin token)
+app.add_middleware(ProfilingMiddleware, paths=("/recommend",))
+
+# Initialize database and start warm-up on startup (/ready turns 200 once warm)
 @app.on_event("startup")
 def startup_event():
     init_db()
     print("Database initialized successfully")
+    start_warmup()
+
+# Start the chat message writer, subscribe this worker to chat pub/sub and start presence diffs
+@app.on_event("startup")
+async def start_chat_services():
+    await message_writer.start()
+    await chat_manager.start()
+    await presence.start()
+
+# Flush queued chat messages before exiting
+@app.on_event("shutdown")
+async def stop_chat_services():
+    await presence.stop()
+    await chat_manager.stop()
+    await message_writer.stop()
 
 # Include routers
+app.include_router(health_router)
 app.include_router(recommend_router)
 app.include_router(auth_router)
 app.include_router(chat_router)
+app.include_router(images_router)
+app.include_router(categories_router)
+app.include_router(admin_router)
 
-from app.core.arasaac import search_pictograms
+from app.core.admin import require_admin
+from app.core.arasaac import clear_pictogram_cache
 
-@app.get("/clear-cache")
+# Kept for compatibility; /admin/caches/{name}/invalidate is the targeted version
+@app.get("/clear-cache", dependencies=[Depends(require_admin)])
 def clear_cache():
-    search_pictograms.cache_clear()
+    clear_pictogram_cache()
     return {"message": "Cache cleared"}
 
@@ -0,0 +1,30 @@
+"""
+Archiva los mensajes antiguos en segmentos comprimidos.
+
+Mueve los mensajes con más de N días (MESSAGE_RETENTION_DAYS, 180 por
+defecto) de la tabla `messages` a message_archive: un segmento NDJSON
+comprimido con zlib por sala y mes. El historial sigue siendo accesible
+desde /chat/rooms/{id}/messages. Pensado para ejecutarse a diario (cron);
+se puede relanzar sin duplicar nada.
+
+Uso:
+    python scripts/archive_messages.py [días]
+    DATABASE_URL=postgresql://... python scripts/archive_messages.py 90
+"""
+
+import sys
+sys.path.append('.')
+
+import time
+
+from app.core.database import engine, init_db
+from app.core.archive import archive_messages, MESSAGE_RETENTION_DAYS
+import app.models  # noqa: F401  (registra los modelos en Base.metadata)
+import app.core.persistence  # noqa: F401  (tabla id_blocks)
+
+if __name__ == "__main__":
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else MESSAGE_RETENTION_DAYS
+    init_db()  # crea message_archive si falta
+    start = time.perf_counter()
+    archived = archive_messages(engine, older_than_days=days)
+    print(f"🗄️  {archived} mensajes con más de {days} días archivados en {time.perf_counter() - start:.1f}s")
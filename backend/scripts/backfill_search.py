@@ -0,0 +1,30 @@
+"""
+Indexa en message_search los mensajes ya existentes.
+
+Los mensajes nuevos se indexan al insertarse; este script recorre el
+historial en lotes ordenados por id y añade cada mensaje al índice de
+búsqueda (FTS5 en SQLite, tsvector/GIN en Postgres). Se puede relanzar sin
+duplicar nada.
+
+Uso:
+    python scripts/backfill_search.py [tamaño_lote]
+    DATABASE_URL=postgresql://... python scripts/backfill_search.py
+"""
+
+import sys
+sys.path.append('.')
+
+import time
+
+from app.core.database import engine, init_db
+from app.core.search import backfill_search_index
+import app.models  # noqa: F401  (registra los modelos en Base.metadata)
+import app.core.persistence  # noqa: F401  (tabla id_blocks)
+import app.core.archive  # noqa: F401  (tabla message_archive)
+
+if __name__ == "__main__":
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    init_db()  # crea message_search si falta
+    start = time.perf_counter()
+    indexed = backfill_search_index(engine, batch_size=batch_size)
+    print(f"✅ {indexed} mensajes indexados en {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,112 @@
+"""
+Benchmark de fan-out de WebSocket en salas grandes con clientes lentos.
+
+Compara el broadcast secuencial anterior (await send_json por conexión) con
+ConnectionManager (cola por conexión + writer task). Mide la latencia desde
+que se llama a broadcast hasta que cada cliente rápido recibe el mensaje.
+
+Uso:
+    python scripts/bench_broadcast.py
+"""
+
+import sys
+sys.path.append('.')
+
+import asyncio
+import json
+import statistics
+import time
+
+from app.core.connections import ConnectionManager, SlowConsumerPolicy
+from app.core.pubsub import InMemoryPubSub
+
+ROOM_SIZES = [100, 300, 500]
+SLOW_CLIENTS = 3
+SLOW_DELAY = 0.2     # segundos por send en clientes lentos
+MESSAGES = 20
+
+class FakeWebSocket:
+    """WebSocket simulado que registra cuándo recibe cada mensaje"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.received = {}  # {seq: perf_counter}
+
+    async def accept(self):
+        pass
+
+    async def close(self, code=1000):
+        pass
+
+    async def send_json(self, message):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        else:
+            # Ceder el loop como haría un send real
+            await asyncio.sleep(0)
+        self.received[message["seq"]] = time.perf_counter()
+
+    async def send_text(self, text):
+        # ConnectionManager envía frames ya serializados
+        await self.send_json(json.loads(text))
+
+async def legacy_broadcast(sockets, message):
+    """Broadcast anterior: un await por conexión, en serie"""
+    for ws in sockets:
+        try:
+            await ws.send_json(message)
+        except Exception:
+            pass
+
+def percentiles(values):
+    values = sorted(values)
+    p50 = statistics.median(values)
+    p99 = values[min(len(values) - 1, int(len(values) * 0.99))]
+    return p50 * 1000, p99 * 1000
+
+async def run_legacy(room_size):
+    sockets = [FakeWebSocket(SLOW_DELAY if i < SLOW_CLIENTS else 0) for i in range(room_size)]
+    fast = sockets[SLOW_CLIENTS:]
+    latencies, sender_stall = [], []
+    for seq in range(MESSAGES):
+        sent_at = time.perf_counter()
+        await legacy_broadcast(sockets, {"type": "message", "seq": seq})
+        sender_stall.append(time.perf_counter() - sent_at)
+        latencies.extend(ws.received[seq] - sent_at for ws in fast)
+    return latencies, sender_stall
+
+async def run_queued(room_size):
+    policy = SlowConsumerPolicy(max_queue=256, drop_ephemeral_at=32, send_timeout=10)
+    manager = ConnectionManager(policy, pubsub=InMemoryPubSub())
+    await manager.start()
+    sockets = [FakeWebSocket(SLOW_DELAY if i < SLOW_CLIENTS else 0) for i in range(room_size)]
+    for ws in sockets:
+        await manager.connect(ws, room_id=1)
+    fast = sockets[SLOW_CLIENTS:]
+    latencies, sender_stall = [], []
+    for seq in range(MESSAGES):
+        sent_at = time.perf_counter()
+        await manager.broadcast({"type": "message", "seq": seq}, 1)
+        sender_stall.append(time.perf_counter() - sent_at)
+        # Esperar a que todos los clientes rápidos lo hayan recibido
+        while any(seq not in ws.received for ws in fast):
+            await asyncio.sleep(0)
+        latencies.extend(ws.received[seq] - sent_at for ws in fast)
+    for ws in sockets:
+        manager.disconnect(ws, 1)
+    await asyncio.sleep(0)
+    return latencies, sender_stall
+
+async def main():
+    print(f"📊 Fan-out: {MESSAGES} mensajes, {SLOW_CLIENTS} clientes lentos ({SLOW_DELAY*1000:.0f} ms/send)\n")
+    print(f"{'modo':<10}{'sala':>6}{'p50 ms':>10}{'p99 ms':>10}{'bloqueo emisor ms':>20}")
+    print("-" * 56)
+    for room_size in ROOM_SIZES:
+        for name, runner in (("legacy", run_legacy), ("queued", run_queued)):
+            latencies, stall = await runner(room_size)
+            p50, p99 = percentiles(latencies)
+            print(f"{name:<10}{room_size:>6}{p50:>10.2f}{p99:>10.2f}{statistics.mean(stall)*1000:>20.2f}")
+    print()
+
+if __name__ == "__main__":
+    asyncio.run(main())
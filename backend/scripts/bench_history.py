@@ -0,0 +1,110 @@
+"""
+Benchmark del historial de mensajes: consulta anterior vs paginación keyset.
+
+Crea una base SQLite temporal con una sala grande (y otras salas de relleno)
+y mide la latencia de obtener la página más reciente y páginas profundas:
+
+- offset:  ORDER BY timestamp ASC LIMIT 50 OFFSET n (lo que haría falta antes
+           para llegar a los mensajes recientes)
+- keyset:  WHERE timestamp <= ts AND (timestamp < ts OR id < cursor)
+           ORDER BY timestamp DESC, id DESC
+           LIMIT 50 sobre el índice (room_id, timestamp, id)
+
+Uso:
+    python scripts/bench_history.py [num_mensajes]
+"""
+
+import sys
+sys.path.append('.')
+
+import os
+import tempfile
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "bench_history.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert, text
+from app.core.database import engine, init_db
+from app.models import User, ChatRoom, Message
+import app.core.persistence  # noqa: F401
+
+PAGE = 50
+REPEAT = 20
+
+def seed(total):
+    init_db()
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{"id": 1, "username": "u", "email": "u@x.com", "password_hash": "x"}])
+        conn.execute(insert(ChatRoom.__table__), [{"id": i, "name": f"sala{i}", "created_by": 1} for i in range(1, 5)])
+        batch = []
+        for i in range(1, total + 1):
+            # 70% de los mensajes en la sala 1, el resto repartido
+            room = 1 if i % 10 < 7 else 2 + i % 3
+            batch.append({
+                "id": i, "room_id": room, "user_id": 1,
+                "content": '[{"id": 2349, "palabra": "yo"}]',
+                "timestamp": start + timedelta(seconds=i),
+            })
+            if len(batch) == 10000:
+                conn.execute(insert(Message.__table__), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Message.__table__), batch)
+
+def timed(conn, sql, params):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        rows = conn.execute(text(sql), params).fetchall()
+    return (time.perf_counter() - start) / REPEAT * 1000, len(rows)
+
+OFFSET_SQL = (
+    "SELECT id FROM messages WHERE room_id = :room "
+    "ORDER BY timestamp ASC LIMIT :limit OFFSET :offset"
+)
+KEYSET_SQL = (
+    "SELECT id FROM messages WHERE room_id = :room "
+    "AND timestamp <= :ts AND (timestamp < :ts OR id < :id) "
+    "ORDER BY timestamp DESC, id DESC LIMIT :limit"
+)
+NEWEST_SQL = (
+    "SELECT id FROM messages WHERE room_id = :room "
+    "ORDER BY timestamp DESC, id DESC LIMIT :limit"
+)
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    print(f"📦 Sembrando {total:,} mensajes en {DB_PATH}...")
+    seed(total)
+
+    with engine.connect() as conn:
+        room_count = conn.execute(text("SELECT COUNT(*) FROM messages WHERE room_id = 1")).scalar()
+        ids = [r[0] for r in conn.execute(text(
+            "SELECT id FROM messages WHERE room_id = 1 ORDER BY timestamp DESC, id DESC"
+        ))]
+        print(f"Sala 1: {room_count:,} mensajes\n")
+        print(f"{'consulta':<34}{'ms/página':>12}")
+        print("-" * 46)
+
+        ms, _ = timed(conn, OFFSET_SQL, {"room": 1, "limit": PAGE, "offset": room_count - PAGE})
+        print(f"{'offset (página más reciente)':<34}{ms:>12.3f}")
+        ms, _ = timed(conn, NEWEST_SQL, {"room": 1, "limit": PAGE})
+        print(f"{'keyset (página más reciente)':<34}{ms:>12.3f}")
+
+        for depth in (0.1, 0.5, 0.9):
+            cursor_id = ids[int(len(ids) * depth)]
+            ts = conn.execute(text("SELECT timestamp FROM messages WHERE id = :id"), {"id": cursor_id}).scalar()
+            position = int(len(ids) * depth)
+            ms_off, _ = timed(conn, OFFSET_SQL, {"room": 1, "limit": PAGE, "offset": room_count - position - PAGE})
+            ms_key, _ = timed(conn, KEYSET_SQL, {"room": 1, "limit": PAGE, "ts": ts, "id": cursor_id})
+            print(f"{f'offset (profundidad {depth:.0%})':<34}{ms_off:>12.3f}")
+            print(f"{f'keyset (profundidad {depth:.0%})':<34}{ms_key:>12.3f}")
+
+        plan = conn.execute(text("EXPLAIN QUERY PLAN " + KEYSET_SQL),
+                            {"room": 1, "limit": PAGE, "ts": "2024-01-01", "id": 1}).fetchall()
+        print("\nPlan keyset:", " | ".join(row[-1] for row in plan))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark de throughput de login bajo concurrencia.
+
+Simula una clase entera iniciando sesión a la vez: N hilos (como el
+threadpool de FastAPI) verifican contraseñas scrypt.
+
+- inline:  cada hilo ejecuta el KDF directamente (sin límite)
+- pool:    PasswordHasher con pool acotado y límite de cola (503 al saturarse)
+
+Muestra logins/s, latencia p50/p99 de los aceptados y cuántos se rechazan.
+
+Uso:
+    python scripts/bench_login.py [num_logins] [concurrencia]
+"""
+
+import sys
+sys.path.append('.')
+
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.passwords import (
+    PasswordHasher, HashingOverloaded, compute_hash, check_password,
+    PASSWORD_WORKERS, PASSWORD_MAX_PENDING,
+)
+
+def run(label, verify, logins, concurrency, stored):
+    latencies, rejected = [], 0
+
+    def one_login(_):
+        start = time.perf_counter()
+        try:
+            verify("contraseña-segura", stored)
+        except HashingOverloaded:
+            return None
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        for result in clients.map(one_login, range(logins)):
+            if result is None:
+                rejected += 1
+            else:
+                latencies.append(result)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000 if latencies else 0
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000 if latencies else 0
+    print(f"{label:<28}{len(latencies) / elapsed:>10.1f}{p50:>10.1f}{p99:>10.1f}{rejected:>10}")
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    stored = compute_hash("contraseña-segura")
+
+    print(f"🔐 {logins} logins, {concurrency} clientes concurrentes, CPUs: {os.cpu_count()}")
+    print(f"   pool: {PASSWORD_WORKERS} workers, máx. {PASSWORD_MAX_PENDING} pendientes\n")
+    print(f"{'modo':<28}{'login/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'503':>10}")
+    print("-" * 68)
+
+    run("inline (sin límite)", check_password, logins, concurrency, stored)
+
+    hasher = PasswordHasher()
+    run("pool acotado", lambda pw, st: hasher.verify(pw, st), logins, concurrency, stored)
+
+    small = PasswordHasher(workers=PASSWORD_WORKERS, max_pending=PASSWORD_WORKERS * 2)
+    run(f"pool acotado (cola {PASSWORD_WORKERS * 2})", lambda pw, st: small.verify(pw, st), logins, concurrency, stored)
+    print()
+
+if __name__ == "__main__":
+    main()
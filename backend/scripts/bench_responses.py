@@ -0,0 +1,98 @@
+"""
+Benchmark de serialización de respuestas HTTP.
+
+Compara la CPU por petición para una página de historial (N mensajes) y una
+respuesta de /recommend (12 pictogramas):
+
+- jsonable_encoder:  lo que hacía FastAPI con dicts sin response_model
+                     (recorrido genérico + json.dumps)
+- response_model:    validación Pydantic + dump_json (ruta rápida de FastAPI)
+- json_bytes:        app.core.responses.json_bytes (orjson si está instalado)
+- precodificado:     cuerpos ya codificados en el buffer de historial,
+                     solo se concatenan (json_array)
+
+Uso:
+    python scripts/bench_responses.py [mensajes_por_pagina] [peticiones]
+"""
+
+import sys
+sys.path.append('.')
+
+import time
+from datetime import datetime
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.core.pictograms import expand_pictograms
+from app.core.responses import json_bytes, json_array, orjson
+from app.routers.chat import MessageResponse
+from app.routers.recommend import RecommendResponse
+
+def sample_page(size):
+    pictos = expand_pictograms([(6632, "yo"), (5441, "querer"), (2349, "comer"), (2462, "manzana"), (7210, "ahora")])
+    return [
+        {
+            "id": 1000 - i,
+            "room_id": 1,
+            "user_id": 7,
+            "username": "alumno",
+            "content": pictos,
+            "timestamp": datetime(2026, 10, 19, 10, 15, i % 60, 123456),
+        }
+        for i in range(size)
+    ]
+
+def sample_recommendation():
+    return {
+        "recommended": [
+            {
+                "palabra": f"palabra{i}",
+                "id": 2000 + i,
+                "url": f"https://static.arasaac.org/pictograms/{2000 + i}/{2000 + i}_300.png",
+                "keywords": [{"keyword": f"palabra{i}", "type": 2, "plural": "palabras"}],
+            }
+            for i in range(12)
+        ]
+    }
+
+def cpu_per_request(label, encode, requests):
+    encode()  # calentar cachés (TypeAdapter, etc.)
+    start = time.process_time()
+    for _ in range(requests):
+        body = encode()
+    elapsed = time.process_time() - start
+    print(f"{label:<22}{elapsed / requests * 1e6:>14.1f}{len(body):>10}")
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    page = sample_page(size)
+    page_adapter = TypeAdapter(List[MessageResponse])
+    # Como HistoryBuffer: cada mensaje guarda su JSON al entrar en el buffer
+    page_bodies = [json_bytes(dict(message, timestamp=message["timestamp"].isoformat())) for message in page]
+
+    recommendation = sample_recommendation()
+    recommend_adapter = TypeAdapter(RecommendResponse)
+
+    print(f"📦 {requests} peticiones, orjson: {'sí' if orjson is not None else 'no'}\n")
+    print(f"{'historial (' + str(size) + ' msgs)':<22}{'µs CPU/pet':>14}{'bytes':>10}")
+    print("-" * 46)
+    cpu_per_request("jsonable_encoder", lambda: JSONResponse(jsonable_encoder(page)).body, requests)
+    cpu_per_request("response_model", lambda: page_adapter.dump_json(page_adapter.validate_python(page)), requests)
+    cpu_per_request("json_bytes", lambda: json_bytes(page), requests)
+    cpu_per_request("precodificado", lambda: json_array(page_bodies), requests)
+
+    print(f"\n{'/recommend (12)':<22}{'µs CPU/pet':>14}{'bytes':>10}")
+    print("-" * 46)
+    cpu_per_request("jsonable_encoder", lambda: JSONResponse(jsonable_encoder(recommendation)).body, requests)
+    cpu_per_request("response_model",
+                    lambda: recommend_adapter.dump_json(recommend_adapter.validate_python(recommendation)), requests)
+    cpu_per_request("json_bytes", lambda: json_bytes(recommendation), requests)
+    print()
+
+if __name__ == "__main__":
+    main()
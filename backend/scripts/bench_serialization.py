@@ -0,0 +1,76 @@
+"""
+Benchmark de serialización de broadcasts.
+
+Compara, para una sala de N clientes:
+
+- por conexión:  send_json por cliente (un json.dumps por destinatario)
+- una vez:       OutboundFrame compartido (un json.dumps por broadcast)
+- msgpack:       OutboundFrame en binario con pictogramas compactos
+
+Muestra CPU por broadcast y bytes por mensaje en el cable.
+
+Uso:
+    python scripts/bench_serialization.py [clientes] [broadcasts]
+"""
+
+import sys
+sys.path.append('.')
+
+import time
+
+from app.core.pictograms import expand_pictograms
+from app.core.wire import OutboundFrame, encode_json, msgpack
+
+def sample_message(seq):
+    pictos = expand_pictograms([(6632, "yo"), (5441, "querer"), (2349, "comer"), (2462, "manzana"), (7210, "ahora")])
+    return {
+        "type": "message",
+        "id": seq,
+        "room_id": 1,
+        "user_id": 7,
+        "username": "alumno",
+        "content": pictos,
+        "timestamp": "2026-10-19T10:15:00.123456",
+    }
+
+def cpu_per_broadcast(label, fanout, clients, broadcasts):
+    start = time.process_time()
+    total_bytes = 0
+    for seq in range(broadcasts):
+        total_bytes = fanout(sample_message(seq), clients)
+    elapsed = time.process_time() - start
+    print(f"{label:<22}{elapsed / broadcasts * 1e6:>14.1f}{total_bytes // clients:>14}")
+
+def per_connection(message, clients):
+    sent = 0
+    for _ in range(clients):
+        sent += len(encode_json(message).encode())
+    return sent
+
+def once(protocol):
+    def fanout(message, clients):
+        frame = OutboundFrame(message)
+        sent = 0
+        for _ in range(clients):
+            data = frame.encoded(protocol)
+            sent += len(data) if isinstance(data, bytes) else len(data.encode())
+        return sent
+    return fanout
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    broadcasts = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    print(f"📦 {broadcasts} broadcasts a {clients} clientes\n")
+    print(f"{'modo':<22}{'µs CPU/bcast':>14}{'bytes/msg':>14}")
+    print("-" * 50)
+    cpu_per_broadcast("json por conexión", per_connection, clients, broadcasts)
+    cpu_per_broadcast("json una vez", once("json"), clients, broadcasts)
+    if msgpack is not None:
+        cpu_per_broadcast("msgpack una vez", once("msgpack"), clients, broadcasts)
+    else:
+        print("msgpack no instalado (pip install msgpack)")
+    print()
+
+if __name__ == "__main__":
+    main()
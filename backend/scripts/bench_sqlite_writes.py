@@ -0,0 +1,173 @@
+"""
+Benchmark de escrituras concurrentes en SQLite.
+
+Simula commits de chat concurrentes (leer la sala, insertar el mensaje,
+actualizar contadores) desde varios procesos (como `uvicorn --workers`) con
+N hilos cada uno, y lectores de historial en paralelo:
+
+- anterior:  create_engine con solo check_same_thread=False (journal
+             rollback, transacciones diferidas, pool por defecto)
+- WAL:       configure_sqlite(): WAL + pragmas, pool pequeño de
+             escritores (BEGIN IMMEDIATE) y pool de lectores de solo lectura
+- WAL+1 hilo: además, las escrituras de cada proceso pasan por un único
+             hilo escritor (como run_write para los lotes de mensajes)
+
+Los lectores piden una página de historial cada READ_INTERVAL segundos (sin
+pausa, en WAL acaparan el GIL y el benchmark mide eso en lugar del disco).
+
+Muestra escrituras/s, latencia p50/p99, errores "database is locked" y
+lecturas/s completadas.
+
+Uso:
+    python scripts/bench_sqlite_writes.py [procesos] [escritores] [commits_por_escritor] [lectores]
+"""
+
+import sys
+sys.path.append('.')
+
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.core.database import configure_sqlite, SQLITE_WRITE_POOL_SIZE, SQLITE_READ_POOL_SIZE
+
+READ_INTERVAL = 0.005
+
+SCHEMA = [
+    "CREATE TABLE rooms (id INTEGER PRIMARY KEY, message_count INTEGER NOT NULL DEFAULT 0)",
+    "CREATE TABLE messages (id INTEGER PRIMARY KEY, room_id INTEGER, content TEXT, timestamp REAL)",
+    "CREATE INDEX ix_messages_room ON messages (room_id, timestamp)",
+    "INSERT INTO rooms (id) VALUES (1), (2), (3), (4)",
+]
+
+def legacy_engines(url):
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    return engine, engine
+
+def wal_engines(url):
+    writer = configure_sqlite(create_engine(
+        url, connect_args={"check_same_thread": False},
+        pool_size=SQLITE_WRITE_POOL_SIZE, max_overflow=0, pool_timeout=30,
+    ))
+    reader = configure_sqlite(create_engine(
+        url, connect_args={"check_same_thread": False},
+        pool_size=SQLITE_READ_POOL_SIZE, max_overflow=0,
+    ), readonly=True)
+    return writer, reader
+
+def setup(make_engines, path):
+    writer, reader = make_engines(f"sqlite:///{path}")
+    with writer.begin() as conn:
+        for statement in SCHEMA:
+            conn.execute(text(statement))
+    writer.dispose()
+    reader.dispose()
+
+def worker(make_engines, single_writer, path, writers, commits, readers, results):
+    """Un proceso (como un worker de uvicorn) con sus hilos escritores y lectores"""
+    writer, reader = make_engines(f"sqlite:///{path}")
+    latencies, errors, reads = [], [0], [0]
+    lock = threading.Lock()
+    stop_readers = threading.Event()
+    # Como run_write(): todas las escrituras del proceso pasan por un único hilo
+    write_thread = ThreadPoolExecutor(max_workers=1) if single_writer else None
+
+    def commit(room):
+        with writer.begin() as conn:
+            # Leer y luego escribir: el patrón que provoca "database is locked"
+            conn.execute(text("SELECT message_count FROM rooms WHERE id = :r"), {"r": room}).scalar()
+            conn.execute(
+                text("INSERT INTO messages (room_id, content, timestamp) VALUES (:r, :c, :t)"),
+                {"r": room, "c": "2349\tyo\n5441\tquerer", "t": time.time()},
+            )
+            conn.execute(text("UPDATE rooms SET message_count = message_count + 1 WHERE id = :r"), {"r": room})
+
+    def write(i):
+        room = i % 4 + 1
+        start = time.perf_counter()
+        try:
+            if write_thread is not None:
+                write_thread.submit(commit, room).result()
+            else:
+                commit(room)
+        except OperationalError:
+            with lock:
+                errors[0] += 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    def read_loop():
+        while not stop_readers.is_set():
+            try:
+                with reader.connect() as conn:
+                    conn.execute(text(
+                        "SELECT id, content FROM messages WHERE room_id = 1 ORDER BY timestamp DESC LIMIT 50"
+                    )).fetchall()
+                with lock:
+                    reads[0] += 1
+            except OperationalError:
+                pass
+            time.sleep(READ_INTERVAL)
+
+    reader_threads = [threading.Thread(target=read_loop, daemon=True) for _ in range(readers)]
+    for thread in reader_threads:
+        thread.start()
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        list(pool.map(write, range(writers * commits)))
+    stop_readers.set()
+    for thread in reader_threads:
+        thread.join()
+    results.put((latencies, errors[0], reads[0]))
+
+def run(label, make_engines, single_writer, processes, writers, commits, readers):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    setup(make_engines, path)
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=worker, args=(make_engines, single_writer, path, writers, commits, readers, results))
+        for _ in range(processes)
+    ]
+    start = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    latencies, errors, reads = [], 0, 0
+    for _ in procs:
+        proc_latencies, proc_errors, proc_reads = results.get()
+        latencies += proc_latencies
+        errors += proc_errors
+        reads += proc_reads
+    elapsed = time.perf_counter() - start
+    for proc in procs:
+        proc.join()
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000 if latencies else 0
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000 if latencies else 0
+    print(f"{label:<12}{len(latencies) / elapsed:>12.0f}{p50:>10.1f}{p99:>10.1f}{errors:>10}{reads / elapsed:>10.0f}")
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    writers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    commits = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    readers = int(sys.argv[4]) if len(sys.argv) > 4 else 2
+
+    print(f"💾 {processes} procesos x {writers} escritores x {commits} commits, {readers} lectores por proceso\n")
+    print(f"{'modo':<12}{'commits/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'locked':>10}{'reads/s':>10}")
+    print("-" * 64)
+    run("anterior", legacy_engines, False, processes, writers, commits, readers)
+    run("WAL", wal_engines, False, processes, writers, commits, readers)
+    run("WAL+1 hilo", wal_engines, True, processes, writers, commits, readers)
+    print()
+
+if __name__ == "__main__":
+    main()
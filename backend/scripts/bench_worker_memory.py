@@ -0,0 +1,90 @@
+"""
+Memoria por worker con el modelo N-gram privado o compartido.
+
+Lanza N procesos con spawn (como `uvicorn --workers`), carga el idioma por
+defecto y hace predicciones en cada uno, y mide desde /proc/self/smaps_rollup:
+
+- RSS:      páginas residentes (cuenta las compartidas en cada proceso)
+- PSS:      RSS con las páginas compartidas repartidas entre procesos;
+            la suma de los PSS es la memoria real usada
+- privada:  páginas solo de ese proceso
+
+Modos:
+- pickle:     NGRAM_SHARED_MODEL=0, cada worker deserializa ngram.pkl
+- compartido: NGRAM_SHARED_MODEL=1, todos mapean ngram.mmap (se recorren
+              todas sus páginas: peor caso, el fichero entero residente)
+
+Solo Linux (smaps_rollup).
+
+Uso:
+    python scripts/bench_worker_memory.py [workers]
+"""
+
+import sys
+sys.path.append('.')
+
+import multiprocessing
+import os
+
+CONTEXTS = [["yo"], ["yo", "quiero"], ["yo", "quiero", "comer"], ["tengo", "dolor", "de"], ["me", "gusta"]]
+
+def memory_kb():
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    private = values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+    return values.get("Rss", 0), values.get("Pss", 0), private
+
+def worker(shared, index, barrier, results):
+    os.environ["NGRAM_SHARED_MODEL"] = "1" if shared else "0"
+    from app.core.languages import get_language
+
+    before = memory_kb()
+    predictor = get_language().predictor
+    for _ in range(200):
+        for context in CONTEXTS:
+            predictor.predict(context)
+    if shared:
+        predictor._map[::4096]  # tocar todas las páginas del fichero
+
+    barrier.wait()  # todos cargados: las páginas compartidas se reparten entre todos
+    after = memory_kb()
+    results.put((index, before, after))
+    barrier.wait()
+
+def run(label, shared, workers):
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(shared, i, barrier, results)) for i in range(workers)]
+    for proc in procs:
+        proc.start()
+    rows = sorted(results.get() for _ in procs)
+    for proc in procs:
+        proc.join()
+
+    totals = [0, 0, 0]
+    for index, before, after in rows:
+        print(f"{label:<12}{index:>4}{before[0] / 1024:>12.1f}{after[0] / 1024:>12.1f}"
+              f"{after[1] / 1024:>10.1f}{after[2] / 1024:>10.1f}")
+        totals = [total + value for total, value in zip(totals, after)]
+    print(f"{'':<12}{'Σ':>4}{'':>12}{totals[0] / 1024:>12.1f}{totals[1] / 1024:>10.1f}{totals[2] / 1024:>10.1f}\n")
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+
+    from app.core.languages import MODEL_DIR, MODEL_FILES
+    from app.core.ngram_mmap import load_shared_predictor
+    load_shared_predictor(MODEL_DIR / MODEL_FILES["es"])  # compilar antes de medir
+
+    print(f"🧠 {workers} workers, MB por worker (antes = sin modelo cargado)\n")
+    print(f"{'modo':<12}{'#':>4}{'RSS antes':>12}{'RSS después':>12}{'PSS':>10}{'privada':>10}")
+    print("-" * 60)
+    run("pickle", False, workers)
+    run("compartido", True, workers)
+
+if __name__ == "__main__":
+    main()
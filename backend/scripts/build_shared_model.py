@@ -0,0 +1,35 @@
+"""
+Compila los modelos N-gram al formato compartido (memory-mapped).
+
+Genera app/models_ml/ngram*.mmap a partir de cada ngram*.pkl, para que los
+workers arrancados con NGRAM_SHARED_MODEL=1 mapeen el modelo directamente
+sin deserializar el pickle. Ejecutar en el build / antes de arrancar el
+servidor; si se omite, el primer worker que lo necesite lo compila.
+
+Uso:
+    python scripts/build_shared_model.py
+"""
+
+import sys
+sys.path.append('.')
+
+import time
+
+from app.core.languages import MODEL_DIR
+from app.core.ngram_mmap import MappedNGramPredictor, compile_model
+
+def main():
+    models = sorted(MODEL_DIR.glob("ngram*.pkl"))
+    if not models:
+        print(f"❌ No hay modelos en {MODEL_DIR}")
+        return
+    for model_path in models:
+        start = time.perf_counter()
+        out_path = compile_model(model_path)
+        predictor = MappedNGramPredictor(out_path)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"✓ {model_path.name} -> {out_path.name}: {predictor.mapped_bytes / 1e6:.2f} MB, "
+              f"{len(predictor.fourgrams)} 4-grams, {len(predictor.trigrams)} trigramas ({elapsed:.0f} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Comprobación del proxy de imágenes de pictogramas contra un servidor local.
+
+Levanta un servidor HTTP que imita static.arasaac.org (sirve un PNG de
+300x300 para cualquier /{id}/{id}_300.png y cuenta las peticiones), apunta
+ARASAAC_STATIC_URL a él con una caché temporal y verifica:
+
+- el original se descarga una sola vez aunque se pidan varias variantes
+- 20 peticiones concurrentes de un pictograma nuevo -> 1 descarga
+- ETag fuerte, Cache-Control largo y 304 con If-None-Match
+- 404 para variantes desconocidas y pictogramas inexistentes
+
+Uso:
+    python scripts/check_image_proxy.py
+"""
+
+import sys
+sys.path.append('.')
+
+import os
+import struct
+import tempfile
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MISSING_ID = 999999
+
+def make_png(width, height):
+    """PNG RGBA con un degradado (sin depender de Pillow)"""
+    rows = b"".join(
+        b"\x00" + b"".join(bytes((x * 255 // width, y * 255 // height, 128, 255)) for x in range(width))
+        for y in range(height)
+    )
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")
+
+PNG = make_png(300, 300)
+upstream_hits = []
+
+class StandInArasaac(BaseHTTPRequestHandler):
+    def do_GET(self):
+        upstream_hits.append(self.path)
+        if self.path.startswith(f"/{MISSING_ID}/"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(PNG)))
+        self.end_headers()
+        self.wfile.write(PNG)
+
+    def log_message(self, *args):
+        pass
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInArasaac)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["ARASAAC_STATIC_URL"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["IMAGE_CACHE_DIR"] = tempfile.mkdtemp(prefix="image_cache_")
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.core import images
+    from app.routers.images import router
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    print(f"🖼️  Servidor local en {os.environ['ARASAAC_STATIC_URL']}, caché en {os.environ['IMAGE_CACHE_DIR']}")
+    print(f"   Pillow: {'sí' if images.Image is not None else 'no (se sirve el PNG original)'}\n")
+
+    ok = True
+
+    def check(label, condition):
+        nonlocal ok
+        ok &= bool(condition)
+        print(f"{'✅' if condition else '❌'} {label}")
+
+    first = client.get("/pictograms/2349/300.png")
+    check("original servido", first.status_code == 200 and first.content == PNG)
+    for variant in ("150.webp", "96.webp", "96.png", "300.png"):
+        response = client.get(f"/pictograms/2349/{variant}")
+        print(f"   {variant:<9} {response.headers['content-type']:<11} {len(response.content):>7} bytes")
+    check("una sola descarga para todas las variantes", len(upstream_hits) == 1)
+
+    cached = client.get("/pictograms/2349/96.webp")
+    etag = cached.headers.get("etag", "")
+    check("ETag fuerte y Cache-Control inmutable",
+          etag.startswith('"') and "immutable" in cached.headers.get("cache-control", ""))
+    not_modified = client.get("/pictograms/2349/96.webp", headers={"If-None-Match": etag})
+    check("304 con If-None-Match", not_modified.status_code == 304 and not not_modified.content)
+
+    hits_before = len(upstream_hits)
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        statuses = list(pool.map(lambda _: client.get("/pictograms/5441/150.webp").status_code, range(20)))
+    check("20 peticiones concurrentes -> 1 descarga",
+          statuses == [200] * 20 and len(upstream_hits) - hits_before == 1)
+
+    check("404 para variante desconocida", client.get("/pictograms/2349/512.gif").status_code == 404)
+    check("404 para pictograma inexistente", client.get(f"/pictograms/{MISSING_ID}/96.webp").status_code == 404)
+
+    server.shutdown()
+    print("\n✅ Todo correcto" if ok else "\n❌ Hay fallos")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Comprobación de fan-out entre procesos con el broker SQLite (o Redis).
+
+Lanza varios "workers" (procesos) con su propio ConnectionManager y un
+cliente simulado en la misma sala. Cada worker publica un mensaje y se
+verifica que todos los clientes reciben todos los mensajes exactamente una vez.
+
+Uso:
+    python scripts/check_pubsub.py                      # broker SQLite temporal
+    python scripts/check_pubsub.py redis://localhost:6379/0
+"""
+
+import sys
+sys.path.append('.')
+
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+WORKERS = 3
+ROOM_ID = 1
+
+class FakeWebSocket:
+    def __init__(self):
+        self.received = []
+
+    async def accept(self):
+        pass
+
+    async def close(self, code=1000):
+        pass
+
+    async def send_text(self, text):
+        self.received.append(json.loads(text))
+
+def worker(index, url, barrier, results):
+    from app.core.connections import ConnectionManager
+    from app.core.pubsub import create_pubsub
+
+    async def run():
+        manager = ConnectionManager(pubsub=create_pubsub(url))
+        await manager.start()
+        ws = FakeWebSocket()
+        await manager.connect(ws, ROOM_ID)
+        await asyncio.to_thread(barrier.wait)
+        await manager.broadcast({"type": "message", "from_worker": index}, ROOM_ID)
+        deadline = time.monotonic() + 5
+        while len(ws.received) < WORKERS and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.3)  # detectar duplicados tardíos
+        await manager.stop()
+        results[index] = sorted(m["from_worker"] for m in ws.received)
+
+    asyncio.run(run())
+
+def main():
+    if len(sys.argv) > 1:
+        url = sys.argv[1]
+    else:
+        url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "pubsub.db")
+    print(f"🔌 Broker: {url}")
+
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(WORKERS)
+    with ctx.Manager() as mp_manager:
+        results = mp_manager.dict()
+        procs = [ctx.Process(target=worker, args=(i, url, barrier, results)) for i in range(WORKERS)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+
+        expected = list(range(WORKERS))
+        ok = True
+        for i in range(WORKERS):
+            received = results.get(i)
+            status = "✅" if received == expected else "❌"
+            ok = ok and received == expected
+            print(f"{status} worker {i} recibió {received}")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
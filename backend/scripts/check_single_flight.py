@@ -0,0 +1,118 @@
+"""
+Comprobación del single-flight de search_pictograms contra un servidor local.
+
+Levanta un servidor HTTP que imita la búsqueda de api.arasaac.org (responde
+tras UPSTREAM_DELAY segundos y cuenta las peticiones), apunta
+ARASAAC_API_URL a él y verifica:
+
+- 30 hilos pidiendo "yo" a la vez -> 1 petición a ARASAAC
+- inicio de clase: 25 alumnos x 3 palabras nuevas a la vez -> 3 peticiones
+- varios workers (procesos) con PICTOGRAM_SHARED_CACHE_URL=sqlite:///...
+  pidiendo las mismas palabras a la vez -> 1 petición por palabra en total
+
+Uso:
+    python scripts/check_single_flight.py [workers]
+"""
+
+import sys
+sys.path.append('.')
+
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+UPSTREAM_DELAY = 0.2
+CLASS_WORDS = ["quiero", "comer", "agua"]
+WORKER_WORDS = ["jugar", "parque", "pelota"]
+THREADS_PER_WORKER = 10
+
+upstream_hits = Counter()
+_hits_lock = threading.Lock()
+
+class StandInArasaac(BaseHTTPRequestHandler):
+    def do_GET(self):
+        with _hits_lock:
+            upstream_hits[self.path] += 1
+        time.sleep(UPSTREAM_DELAY)
+        word = self.path.rsplit("/", 1)[-1]
+        body = json.dumps([{"_id": len(word) * 1000, "keywords": [{"keyword": word}]}]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def worker(barrier, results):
+    """Un worker de uvicorn: varios hilos buscando las mismas palabras a la vez"""
+    from app.core.arasaac import lookup_metrics, search_pictograms
+    search_pictograms("hola")  # cargar el idioma antes de la carrera
+    barrier.wait()
+    with ThreadPoolExecutor(max_workers=THREADS_PER_WORKER * len(WORKER_WORDS)) as pool:
+        list(pool.map(search_pictograms, WORKER_WORDS * THREADS_PER_WORKER))
+    results.put(lookup_metrics())
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInArasaac)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["ARASAAC_API_URL"] = f"http://127.0.0.1:{server.server_port}"
+
+    from app.core.arasaac import lookup_metrics, search_pictograms
+    print(f"🔎 Servidor local en {os.environ['ARASAAC_API_URL']} ({UPSTREAM_DELAY * 1000:.0f} ms por búsqueda)\n")
+
+    ok = True
+
+    def check(label, condition):
+        nonlocal ok
+        ok &= bool(condition)
+        print(f"{'✅' if condition else '❌'} {label}")
+
+    search_pictograms("hola")  # cargar el idioma
+    upstream_hits.clear()
+
+    with ThreadPoolExecutor(max_workers=30) as pool:
+        results = list(pool.map(search_pictograms, ["yo"] * 30))
+    check("30 hilos con 'yo' -> 1 petición, mismo resultado para todos",
+          sum(upstream_hits.values()) == 1 and all(r == results[0] and r for r in results))
+
+    with ThreadPoolExecutor(max_workers=100) as pool:
+        list(pool.map(search_pictograms, CLASS_WORDS * 25))
+    check("25 alumnos x 3 palabras nuevas -> 3 peticiones", sum(upstream_hits.values()) == 4)
+    metrics = lookup_metrics()
+    print(f"   {metrics['upstream_requests']} peticiones, {metrics['coalesced_local']} búsquedas coalescidas\n")
+
+    upstream_hits.clear()
+    os.environ["PICTOGRAM_SHARED_CACHE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "pictograms.db")
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(barrier, queue)) for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    worker_metrics = [queue.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+
+    searches = workers * THREADS_PER_WORKER * len(WORKER_WORDS)
+    requests_made = sum(count for path, count in upstream_hits.items() if path.rsplit("/", 1)[-1] in WORKER_WORDS)
+    print(f"   {workers} workers x {THREADS_PER_WORKER * len(WORKER_WORDS)} búsquedas = {searches}")
+    for key in ("upstream_requests", "coalesced_local", "coalesced_remote", "shared_hits", "lease_timeouts"):
+        print(f"   {key:<18} {sum(m[key] for m in worker_metrics):>5}")
+    check(f"{workers} workers -> 1 petición por palabra ({len(WORKER_WORDS)})", requests_made == len(WORKER_WORDS))
+
+    server.shutdown()
+    print("\n✅ Todo correcto" if ok else "\n❌ Hay fallos")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""
+Aplica las migraciones de esquema pendientes a la base de datos configurada.
+
+Crea las tablas nuevas y añade índices/columnas a las existentes
+(chat.db local o Postgres vía DATABASE_URL). Es idempotente.
+
+Uso:
+    python scripts/migrate_db.py
+    DATABASE_URL=postgresql://... python scripts/migrate_db.py
+"""
+
+import sys
+sys.path.append('.')
+
+from app.core.database import init_db
+import app.models  # noqa: F401  (registra los modelos en Base.metadata)
+import app.core.persistence  # noqa: F401  (tabla id_blocks)
+import app.core.archive  # noqa: F401  (tabla message_archive)
+
+if __name__ == "__main__":
+    init_db()
+    print("✅ Migraciones aplicadas")
@@ -5,6 +5,7 @@ Tiempo: ~10 minutos en CPU.
 """
 
 import pickle
+import sys
 from collections import defaultdict, Counter
 from pathlib import Path
 
@@ -195,14 +196,22 @@ def evaluar_modelo(model, test_cases):
     return accuracy
 
 def main():
-    """Entrena y guarda el modelo N-gram"""
+    """Entrena y guarda el modelo N-gram
+
+    Uso: python scripts/train_ngram.py [idioma]
+    Sin idioma (o "es") usa data/train.txt y guarda ngram.pkl; con otro
+    idioma usa data/train_{idioma}.txt y guarda ngram_{idioma}.pkl.
+    """
+    lang = sys.argv[1] if len(sys.argv) > 1 else "es"
+    suffix = "" if lang == "es" else f"_{lang}"
+
     # Rutas
     data_dir = Path(__file__).parent.parent / "data"
     models_dir = Path(__file__).parent.parent / "app" / "models_ml"
     models_dir.mkdir(exist_ok=True)
     
     # Cargar corpus
-    train_file = data_dir / "train.txt"
+    train_file = data_dir / f"train{suffix}.txt"
     if not train_file.exists():
         print("❌ Error: Ejecuta primero generate_corpus.py")
         return
@@ -218,9 +227,14 @@ def main():
     model.train(sentences)
     
     # Guardar modelo
-    model_path = models_dir / "ngram.pkl"
+    model_path = models_dir / f"ngram{suffix}.pkl"
     model.save(model_path)
     
+    print(f"\n✓ Entrenamiento completo!")
+    print(f"  Modelo: {model_path}")
+    if lang != "es":
+        return  # los casos de prueba son en castellano
+
     # Casos de prueba
     test_cases = [
         ("yo quiero", ["comer", "jugar", "ir", "agua", "pizza"]),
@@ -232,9 +246,6 @@ def main():
     
     # Evaluar
     accuracy = evaluar_modelo(model, test_cases)
-    
-    print(f"\n✓ Entrenamiento completo!")
-    print(f"  Modelo: {model_path}")
     print(f"  Accuracy estimado: {accuracy:.1f}%")
 
 if __name__ == "__main__":
@@ -0,0 +1,114 @@
+"""
+Shared setup: every test run gets its own throwaway database and cache dirs.
+
+The environment is set before any app module is imported, because the
+modules read their configuration (DATABASE_URL, ...) at import time.
+"""
+
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="pictochat-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
+os.environ["IMAGE_CACHE_DIR"] = os.path.join(_tmp, "image_cache")
+os.environ["PROFILE_DIR"] = os.path.join(_tmp, "profiles")
+os.environ["SESSION_STORE_URL"] = "memory://"
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.database import engine, init_db
+from app.core.history import HistoryBuffer
+from app.core.pictograms import pack_pictograms
+from app.models.chat import ChatRoom, Message
+from app.models.user import User
+from app.routers import chat  # defines id_blocks, message_archive, ... before init_db
+
+init_db()
+
+@pytest.fixture(scope="session")
+def make_room():
+    """Create a user and a room, returning (user_id, room_id)"""
+    def make(name: str):
+        with engine.begin() as conn:
+            user_id = conn.execute(User.__table__.insert().values(
+                username=f"{name}-user", email=f"{name}@example.com", password_hash="x"
+            )).inserted_primary_key[0]
+            room_id = conn.execute(ChatRoom.__table__.insert().values(
+                name=name, created_by=user_id
+            )).inserted_primary_key[0]
+        return user_id, room_id
+
+    return make
+
+@pytest.fixture
+def add_messages():
+    """
+    Insert messages at `timestamps` (each with one pictogram, word<i>) and
+    return their ids in (timestamp, id) order. Ids are not in time order, like
+    hi/lo ids handed out by several workers.
+    """
+    def add(room_id: int, user_id: int, timestamps: list):
+        base = 10000 + room_id * 100
+        ids = [base + i for i in range(len(timestamps))]
+        for i in range(2, len(ids) - 1, 5):
+            ids[i], ids[i + 1] = ids[i + 1], ids[i]
+        rows = [
+            {
+                "id": message_id,
+                "room_id": room_id,
+                "user_id": user_id,
+                "content": "",
+                "pictos": pack_pictograms([(i, f"word{i}")]),
+                "timestamp": ts,
+            }
+            for i, (message_id, ts) in enumerate(zip(ids, timestamps))
+        ]
+        with engine.begin() as conn:
+            conn.execute(Message.__table__.insert(), rows)
+        return [row["id"] for row in sorted(rows, key=lambda row: (row["timestamp"], row["id"]))]
+
+    return add
+
+class HistoryPager:
+    """Walks GET /chat/rooms/{id}/messages page by page"""
+
+    def __init__(self, client: TestClient):
+        self.client = client
+
+    def get(self, room_id: int, **params):
+        response = self.client.get(f"/chat/rooms/{room_id}/messages", params=params)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    def back(self, room_id: int, limit: int, **params) -> list:
+        """Every id from the newest page down, newest first"""
+        seen = []
+        while True:
+            query = dict(params, limit=limit)
+            if seen:
+                query["before_id"] = seen[-1]
+            page = self.get(room_id, **query)
+            if not page:
+                return seen
+            seen += [message["id"] for message in page]
+
+    def forward(self, room_id: int, after_id: int, limit: int, **params) -> list:
+        """Every id after `after_id`, oldest first"""
+        seen = []
+        while True:
+            page = self.get(room_id, **dict(params, limit=limit, after_id=seen[-1] if seen else after_id))
+            if not page:
+                return seen
+            seen += [message["id"] for message in reversed(page)]
+
+@pytest.fixture
+def history_pager(monkeypatch):
+    """Pager over the chat router with a fresh history buffer of `per_room` messages"""
+    def make(per_room: int):
+        monkeypatch.setattr(chat, "history", HistoryBuffer(per_room=per_room))
+        app = FastAPI()
+        app.include_router(chat.router)
+        return HistoryPager(TestClient(app))
+
+    return make
@@ -0,0 +1,106 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core import admission as admission_module
+from app.core.admission import AdmissionController, PrincipalResolver, RateLimiter
+from app.core.recommend_cache import ResponseCache, cache_key
+from app.routers import recommend
+
+class Principal:
+    def __init__(self, user_id):
+        self.id = user_id
+
+# Two sessions of one user; any other token is unknown
+SESSIONS = {"ana-1": Principal(1), "ana-2": Principal(1), "luis": Principal(2)}
+
+def found(word, lang=None):
+    return [{"_id": len(word), "keywords": []}]
+
+def make_client(monkeypatch, controller):
+    monkeypatch.setattr(recommend, "admission", controller)
+    monkeypatch.setattr(recommend, "principals", PrincipalResolver(SESSIONS.get))
+    monkeypatch.setattr(recommend, "recommend_cache", ResponseCache())
+    monkeypatch.setattr(recommend, "predict_next_words_cached", lambda context, num_words, lang: ["agua", "pan"])
+    monkeypatch.setattr(recommend, "lookup_pictograms", found)
+    monkeypatch.setattr(recommend, "cached_pictograms", found)
+    app = FastAPI()
+    app.include_router(recommend.router)
+    return TestClient(app)
+
+def controller(user_burst=1000, ip_burst=1000, max_concurrency=4):
+    controller = AdmissionController(max_concurrency=max_concurrency, wait_ms=0)
+    # rate 0.001/s: buckets don't refill during the test
+    controller.per_user = RateLimiter(0.001, user_burst)
+    controller.per_ip = RateLimiter(0.001, ip_burst)
+    return controller
+
+def get(client, token=None):
+    params = {"selected": ["yo"]}
+    if token:
+        params["token"] = token
+    return client.get("/recommend", params=params)
+
+def test_ip_limit_answers_429_with_retry_after(monkeypatch):
+    limits = controller(ip_burst=2)
+    client = make_client(monkeypatch, limits)
+    assert [get(client).status_code for _ in range(3)] == [200, 200, 429]
+    limited = get(client)
+    assert limited.status_code == 429
+    assert int(limited.headers["retry-after"]) >= 1
+    assert limits.counters["rate_limited_ip"] == 2
+
+def test_sessions_of_one_user_share_a_bucket(monkeypatch):
+    limits = controller(user_burst=3)
+    client = make_client(monkeypatch, limits)
+    codes = [get(client, token).status_code for token in ("ana-1", "ana-2", "ana-1", "ana-2")]
+    assert codes == [200, 200, 200, 429]
+    assert get(client, "luis").status_code == 200  # other users keep their own bucket
+    assert limits.counters["rate_limited_user"] == 1
+    assert len(limits.per_user) == 2
+
+def test_unknown_tokens_get_no_user_bucket(monkeypatch):
+    limits = controller(user_burst=1)
+    client = make_client(monkeypatch, limits)
+    assert [get(client, f"made-up-{i}").status_code for i in range(5)] == [200] * 5
+    assert limits.counters["unknown_tokens"] == 5
+    assert len(limits.per_user) == 0
+
+def test_overload_is_answered_degraded_not_rejected(monkeypatch):
+    limits = controller(max_concurrency=1)
+    client = make_client(monkeypatch, limits)
+    # Hold the only pipeline slot, as a long-running request would
+    assert limits._slots.acquire(blocking=False)
+    try:
+        response = get(client)
+    finally:
+        limits._slots.release()
+    assert response.status_code == 200
+    assert response.headers["x-recommend-degraded"] == "overload"
+    assert response.headers["cache-control"] == "no-store"
+    assert "etag" not in response.headers
+    assert response.json()["recommended"]
+    assert recommend.recommend_cache.get(cache_key(["yo"])) is None
+    assert limits.counters["degraded"] == 1 and limits.counters["admitted"] == 0
+
+    # With the slot free the full answer is computed and cached
+    response = get(client)
+    assert "x-recommend-degraded" not in response.headers
+    assert recommend.recommend_cache.get(cache_key(["yo"])) == response.content
+    assert limits.counters["admitted"] == 1 and limits.peak_in_flight == 1
+
+def test_bucket_refills_over_time(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission_module.time, "monotonic", lambda: now[0])
+    limiter = RateLimiter(rate=2, burst=2)
+    assert limiter.take("ip") == 0 and limiter.take("ip") == 0
+    assert limiter.take("ip") == pytest.approx(0.5)
+    now[0] += 0.5
+    assert limiter.take("ip") == 0
+    assert RateLimiter(rate=0, burst=0).take("ip") == 0  # rate 0 disables the limit
+
+def test_limiter_keeps_at_most_max_keys():
+    limiter = RateLimiter(rate=1, burst=1, max_keys=2)
+    for ip in ("a", "b", "c"):
+        limiter.take(ip)
+    assert len(limiter) == 2
+    assert limiter.take("a") == 0  # evicted, so it starts with a full bucket again
@@ -0,0 +1,129 @@
+"""
+Archived history: old messages move into compressed monthly segments and
+get_messages pages cross buffer -> table -> archive without gaps.
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import func, select
+from app.core import archive
+from app.core.database import ReadSessionLocal, engine
+from app.core.pictograms import pack_pictograms
+from app.core.search import search_message_ids
+from app.models.chat import ChatRoom, Message
+from app.routers import chat
+
+def archived_count(room_id):
+    with engine.connect() as conn:
+        return conn.execute(
+            select(func.coalesce(func.sum(archive.message_archive.c.message_count), 0))
+            .where(archive.message_archive.c.room_id == room_id)
+        ).scalar_one()
+
+def segments(room_id):
+    with engine.connect() as conn:
+        return conn.execute(
+            select(archive.message_archive.c.month, archive.message_archive.c.message_count)
+            .where(archive.message_archive.c.room_id == room_id)
+            .order_by(archive.message_archive.c.month)
+        ).all()
+
+@pytest.fixture
+def room(make_room, add_messages, request):
+    """6 archived messages over two months and 8 hot ones; returns (room_id, ids oldest first)"""
+    user_id, room_id = make_room(request.node.name)
+    now = datetime.utcnow()
+    timestamps = [now - timedelta(days=400, minutes=-i) for i in range(3)]
+    timestamps += [now - timedelta(days=340, minutes=-i) for i in range(3)]
+    timestamps += [now - timedelta(minutes=10 - i) for i in range(8)]
+    timestamps[9] = timestamps[10]  # same timestamp: ordered by id
+    ids = add_messages(room_id, user_id, timestamps)
+    archive.archive_messages(engine, older_than_days=180, batch_size=4)
+    assert archived_count(room_id) == 6
+    return room_id, ids
+
+@pytest.mark.parametrize("per_room", [0, 4])
+@pytest.mark.parametrize("limit", [1, 3, 5, 20])
+@pytest.mark.parametrize("format", ["full", "compact"])
+def test_paging_back_crosses_into_the_archive(history_pager, room, per_room, limit, format):
+    room_id, ids = room
+    pager = history_pager(per_room)
+    assert pager.back(room_id, limit, format=format) == ids[::-1]
+
+@pytest.mark.parametrize("limit", [1, 3, 5])
+def test_paging_forward_from_the_archive(history_pager, room, limit):
+    room_id, ids = room
+    pager = history_pager(4)
+    assert pager.forward(room_id, ids[0], limit) == ids[1:]
+    assert pager.forward(room_id, ids[4], limit) == ids[5:]
+
+def test_archived_messages_keep_their_content(history_pager, room):
+    room_id, ids = room
+    pager = history_pager(4)
+    page = pager.get(room_id, before_id=ids[7], limit=3)
+    assert [message["id"] for message in page] == [ids[6], ids[5], ids[4]]
+    assert page[1]["content"][0]["palabra"] == "word5"
+    compact = pager.get(room_id, before_id=ids[7], limit=3, format="compact")
+    assert compact[1]["pictos"] == [[5, "word5"]]
+    asc = pager.get(room_id, before_id=ids[8], limit=5, order="asc")
+    assert [message["id"] for message in asc] == ids[3:8]
+
+def test_segments_are_monthly_and_rerunning_is_a_no_op(room):
+    room_id, ids = room
+    assert [count for _, count in segments(room_id)] == [3, 3]
+    assert archive.archive_messages(engine, older_than_days=180) == 0
+    db = ReadSessionLocal()
+    try:
+        assert archive.find_timestamp(db, room_id, ids[1]) is not None
+        assert archive.find_timestamp(db, room_id, ids[-1]) is None  # still hot
+        assert db.query(Message).filter(Message.room_id == room_id).count() == 8
+    finally:
+        db.close()
+
+def test_late_messages_merge_into_the_month_segment(room, make_room):
+    room_id, ids = room
+    month, _ = segments(room_id)[0]
+    user_id = make_room("archive-late")[0]
+    first_ts = datetime.strptime(month, "%Y-%m").replace(day=15)
+    with engine.begin() as conn:
+        conn.execute(Message.__table__.insert().values(
+            id=ids[-1] + 500, room_id=room_id, user_id=user_id, content='[{"palabra": "libre", "id": "x"}]',
+            pictos=None, timestamp=first_ts,
+        ))
+    assert archive.archive_messages(engine, older_than_days=180) == 1
+    assert segments(room_id)[0][1] == 4
+
+    db = ReadSessionLocal()
+    try:
+        archived = archive.before(db, room_id, None, limit=10)
+        assert sorted(msg.id for msg, _ in archived) == sorted(ids[:6] + [ids[-1] + 500])
+        late = next(msg for msg, _ in archived if msg.id == ids[-1] + 500)
+        assert late.get_pictograms() == [{"palabra": "libre", "id": "x"}]
+    finally:
+        db.close()
+
+def test_archived_messages_leave_search_but_keep_room_counters(make_room):
+    user_id, room_id = make_room("archive-search")
+    old = datetime.utcnow() - timedelta(days=400)
+    rows = [
+        {"id": 70000 + i, "room_id": room_id, "user_id": user_id, "content": "",
+         "pictos": pack_pictograms([(1, "ciruela")]), "timestamp": old + timedelta(minutes=i)}
+        for i in range(3)
+    ]
+    with engine.begin() as conn:
+        conn.execute(Message.__table__.insert(), rows)
+        chat.on_message_batch(conn, rows)
+
+    db = ReadSessionLocal()
+    try:
+        assert len(search_message_ids(db, "ciruela", room_id=room_id)) == 3
+    finally:
+        db.close()
+
+    archive.archive_messages(engine, older_than_days=180)
+    db = ReadSessionLocal()
+    try:
+        assert search_message_ids(db, "ciruela", room_id=room_id) == []
+        assert db.query(ChatRoom.message_count).filter(ChatRoom.id == room_id).scalar() == 3
+    finally:
+        db.close()
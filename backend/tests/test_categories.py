@@ -0,0 +1,65 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core import arasaac, categories
+from app.routers.categories import router
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(categories, "_board", None)
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+def lookups(monkeypatch, failing=()):
+    calls = []
+
+    def lookup(word, lang=None):
+        calls.append(word)
+        return None if word in failing else [{"_id": len(word)}]
+
+    monkeypatch.setattr(arasaac, "lookup_pictograms", lookup)
+    return calls
+
+def test_board_is_built_once_and_revalidated(client, monkeypatch):
+    calls = lookups(monkeypatch)
+    first = client.get("/categories")
+    assert first.status_code == 200
+    board = first.json()["categories"]
+    assert [category["id"] for category in board] == list(categories.CATEGORIES)
+    assert board[0]["pictograms"][0] == {"palabra": "yo", "id": 2, "url": arasaac.pictogram_url(2)}
+    built = len(calls)
+
+    etag = first.headers["etag"]
+    assert client.get("/categories").content == first.content
+    assert client.get("/categories", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/categories", headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert len(calls) == built
+
+def test_clearing_the_pictogram_cache_rebuilds(client, monkeypatch):
+    calls = lookups(monkeypatch)
+    client.get("/categories")
+    built = len(calls)
+    monkeypatch.setattr(arasaac, "cache_generation", arasaac.cache_generation + 1)
+    client.get("/categories")
+    assert len(calls) == 2 * built
+
+def test_incomplete_board_is_not_cached(client, monkeypatch):
+    calls = lookups(monkeypatch, failing={"pizza"})
+    response = client.get("/categories")
+    assert response.headers["cache-control"] == "no-store"
+    assert "etag" not in response.headers
+    comida = next(c for c in response.json()["categories"] if c["id"] == "comida")
+    assert "pizza" not in [p["palabra"] for p in comida["pictograms"]]
+
+    # Within the retry window the incomplete board is reused
+    built = len(calls)
+    client.get("/categories")
+    assert len(calls) == built
+
+    monkeypatch.setattr(categories, "CATEGORY_RETRY_SECONDS", 0)
+    lookups(monkeypatch)
+    response = client.get("/categories")
+    assert "etag" in response.headers
+    comida = next(c for c in response.json()["categories"] if c["id"] == "comida")
+    assert "pizza" in [p["palabra"] for p in comida["pictograms"]]
@@ -0,0 +1,72 @@
+import gzip
+import pytest
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+from app.core import compression
+from app.core.compression import CompressionMiddleware, accepted_encoding
+from app.core.http_cache import cached_json_response, etag_for
+
+BIG = b'{"recommended": [' + b",".join(b'{"palabra": "agua", "id": 2248}' for _ in range(50)) + b"]}"
+SMALL = b'{"ok": true}'
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/big")
+    def big(request: Request):
+        return cached_json_response(request, BIG, etag_for(BIG))
+
+    @app.get("/small")
+    def small():
+        return Response(content=SMALL, media_type="application/json")
+
+    @app.get("/text")
+    def text():
+        return PlainTextResponse("x" * 1000)
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([BIG[:500], BIG[500:]]), media_type="application/json")
+
+    return TestClient(app)
+
+def test_large_json_is_gzipped_with_a_weak_etag(client):
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == BIG  # decoded by the client
+    assert int(response.headers["content-length"]) == len(gzip.compress(BIG, compresslevel=compression.GZIP_LEVEL, mtime=0))
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert response.headers["etag"] == "W/" + etag_for(BIG)
+
+def test_weak_etag_still_revalidates(client):
+    etag = client.get("/big", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    assert client.get("/big", headers={"Accept-Encoding": "gzip", "If-None-Match": etag}).status_code == 304
+    assert client.get("/big", headers={"Accept-Encoding": "identity", "If-None-Match": etag}).status_code == 304
+
+@pytest.mark.parametrize("path, accept", [
+    ("/big", "identity"),
+    ("/big", "gzip;q=0"),
+    ("/small", "gzip"),
+    ("/text", "gzip"),
+    ("/stream", "gzip"),
+])
+def test_passed_through_uncompressed(client, path, accept):
+    response = client.get(path, headers={"Accept-Encoding": accept})
+    assert "content-encoding" not in response.headers
+    if path == "/big":
+        assert response.headers["etag"] == etag_for(BIG)
+
+def test_accepted_encoding(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert accepted_encoding("gzip, deflate, br") == "gzip"
+    assert accepted_encoding("br;q=1.0, gzip;q=0.5") == "gzip"
+    assert accepted_encoding("GZIP") == "gzip"
+    assert accepted_encoding("gzip;q=0") is None
+    assert accepted_encoding("gzip;q=oops") is None
+    assert accepted_encoding("") is None
+    monkeypatch.setattr(compression, "brotli", object())
+    assert accepted_encoding("gzip, br") == "br"
+    assert accepted_encoding("gzip, br;q=0") == "gzip"
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+import pytest
+from app.core.database import ReadSessionLocal
+from app.core.history import HistoryBuffer
+from app.routers import chat
+
+T0 = datetime(2025, 1, 1, 12, 0, 0)
+
+def event(message_id, minute, room_id=1):
+    return {
+        "type": "message",
+        "id": message_id,
+        "room_id": room_id,
+        "user_id": 1,
+        "username": "ana",
+        "content": [],
+        "timestamp": (T0 + timedelta(minutes=minute)).isoformat(),
+    }
+
+def loaded(buffer, room_id):
+    """Mark a room loaded as if seeded from an empty table"""
+    room = buffer._touch(room_id)
+    room.loaded = True
+    room.has_older = False
+    return buffer
+
+def ids(page):
+    return [message["id"] for message in page]
+
+def test_appends_stay_in_time_order_and_dedupe():
+    buffer = loaded(HistoryBuffer(per_room=10), 1)
+    buffer.append(1, event(1, 0))
+    buffer.append(1, event(3, 2))
+    buffer.append(1, event(2, 1))  # another worker's message, delivered late
+    buffer.append(1, event(3, 2))  # delivered twice
+    buffer.append(1, event(9, 1))  # same minute as 2: ordered by id
+    assert ids(buffer.page(1, 10)) == [3, 9, 2, 1]
+    assert buffer.total == 4
+
+def test_ring_keeps_the_newest_and_defers_older_pages():
+    buffer = loaded(HistoryBuffer(per_room=3), 1)
+    for i in range(1, 6):
+        buffer.append(1, event(i, i))
+    assert ids(buffer.page(1, 3)) == [5, 4, 3]
+    assert ids(buffer.page(1, 1, before_id=4)) == [3]
+    # Older messages were dropped: the database must answer these
+    assert buffer.page(1, 3, before_id=4) is None
+    assert buffer.page(1, 2, before_id=2) is None
+    assert buffer.page(1, 4) is None
+
+def test_unloaded_rooms_and_unknown_cursors_miss():
+    buffer = HistoryBuffer(per_room=10)
+    buffer.append(1, event(1, 0))
+    assert buffer.page(1, 10) is None  # not seeded from the database yet
+    loaded(buffer, 1)
+    assert buffer.page(1, 10, after_id=99) is None
+    assert buffer.since(1, 99) is None
+    assert ids(buffer.page(1, 10, after_id=1)) == []
+    assert buffer.stats.misses == 3 and buffer.stats.hits == 1
+
+def test_least_recently_used_rooms_are_evicted():
+    buffer = HistoryBuffer(per_room=10, max_messages=4)
+    for room_id in (1, 2, 3):
+        loaded(buffer, room_id)
+        buffer.append(room_id, event(room_id * 10, 0, room_id))
+        buffer.append(room_id, event(room_id * 10 + 1, 1, room_id))
+    assert list(buffer.rooms) == [2, 3]
+    assert buffer.total == 4
+    assert buffer.invalidate("2") == 1
+    assert buffer.page(2, 1) is None and buffer.total == 2
+
+@pytest.fixture
+def room(make_room, add_messages, request):
+    """A room with 10 messages in the table; returns (room_id, ids oldest first)"""
+    user_id, room_id = make_room(request.node.name)
+    now = datetime.utcnow()
+    timestamps = [now - timedelta(minutes=20 - i) for i in range(10)]
+    timestamps[7] = timestamps[8]
+    return room_id, add_messages(room_id, user_id, timestamps)
+
+def test_load_merges_messages_delivered_meanwhile(room):
+    room_id, stored = room
+    buffer = HistoryBuffer(per_room=4)
+    live = event(stored[-1] + 50, 0, room_id)
+    live["timestamp"] = datetime.utcnow().isoformat()
+    buffer.append(room_id, live)
+    db = ReadSessionLocal()
+    try:
+        assert buffer.load(room_id, db)
+        assert not buffer.load(room_id, db)
+    finally:
+        db.close()
+    assert ids(buffer.page(room_id, 4)) == [live["id"]] + stored[-3:][::-1]
+
+def test_replay_since_last_seen(room):
+    room_id, stored = room
+    buffer = HistoryBuffer(per_room=4)
+    # Inside the buffer
+    assert ids(buffer.missed_since(room_id, stored[-3], 10)) == stored[-2:]
+    # Before the buffer: answered from the table, oldest first, up to the limit
+    assert ids(buffer.missed_since(room_id, stored[1], 3)) == stored[2:5]
+    assert buffer.missed_since(room_id, 1, 10) == []
+
+@pytest.mark.parametrize("limit", [1, 3, 4, 7])
+def test_pages_cross_from_the_buffer_into_the_table(history_pager, room, limit):
+    room_id, stored = room
+    pager = history_pager(per_room=4)
+    assert pager.back(room_id, limit) == stored[::-1]
+    assert pager.back(room_id, limit, format="compact") == stored[::-1]
+    assert pager.forward(room_id, stored[0], limit) == stored[1:]
+    assert chat.history.stats.hits > 0
+
+def test_live_messages_extend_the_buffered_tail(history_pager, room):
+    room_id, stored = room
+    pager = history_pager(per_room=4)
+    assert pager.back(room_id, 3) == stored[::-1]  # loads the buffer
+
+    live = event(stored[-1] + 50, 0, room_id)
+    live["timestamp"] = datetime.utcnow().isoformat()
+    chat.history.append(room_id, live)
+    chat.history.append(room_id, live)  # delivered twice: kept once
+
+    assert ids(pager.get(room_id, limit=2)) == [live["id"], stored[-1]]
+    assert pager.forward(room_id, stored[-2], 10) == [stored[-1], live["id"]]
+    assert pager.back(room_id, 3) == [live["id"]] + stored[::-1]
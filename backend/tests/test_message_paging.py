@@ -0,0 +1,58 @@
+"""
+Keyset paging of a room's history on (timestamp, id), straight from the
+messages table (history buffer disabled).
+"""
+
+from datetime import datetime, timedelta
+import pytest
+
+@pytest.fixture
+def room(make_room, add_messages, request):
+    """A room with 12 messages, two of them sharing a timestamp; returns (room_id, ids oldest first)"""
+    user_id, room_id = make_room(request.node.name)
+    now = datetime.utcnow()
+    timestamps = [now - timedelta(minutes=20 - i) for i in range(12)]
+    timestamps[6] = timestamps[7]
+    return room_id, add_messages(room_id, user_id, timestamps)
+
+@pytest.fixture
+def pager(history_pager):
+    return history_pager(per_room=0)
+
+@pytest.mark.parametrize("limit", [1, 5, 12, 50])
+@pytest.mark.parametrize("format", ["full", "compact"])
+def test_paging_back_visits_every_message_once(pager, room, limit, format):
+    room_id, ids = room
+    assert pager.back(room_id, limit, format=format) == ids[::-1]
+
+@pytest.mark.parametrize("limit", [1, 5, 50])
+def test_paging_forward_visits_every_newer_message_once(pager, room, limit):
+    room_id, ids = room
+    assert pager.forward(room_id, ids[0], limit) == ids[1:]
+    assert pager.forward(room_id, ids[-1], limit) == []
+
+def test_pages_are_newest_first_unless_asc(pager, room):
+    room_id, ids = room
+    page = pager.get(room_id, before_id=ids[8], limit=4)
+    assert [message["id"] for message in page] == ids[4:8][::-1]
+    page = pager.get(room_id, before_id=ids[8], limit=4, order="asc")
+    assert [message["id"] for message in page] == ids[4:8]
+    page = pager.get(room_id, after_id=ids[2], limit=3, order="asc")
+    assert [message["id"] for message in page] == ids[3:6]
+
+def test_messages_are_expanded_or_compact(pager, room):
+    room_id, ids = room
+    full = pager.get(room_id, limit=1)[0]
+    assert full["id"] == ids[-1]
+    assert full["content"][0]["palabra"] == "word11"
+    assert full["content"][0]["id"] == 11
+    compact = pager.get(room_id, limit=1, format="compact")[0]
+    assert compact["pictos"] == [[11, "word11"]]
+
+def test_bad_cursors(pager, room):
+    room_id, ids = room
+    client = pager.client
+    assert client.get(f"/chat/rooms/{room_id}/messages", params={"before_id": 1}).status_code == 404
+    both = client.get(f"/chat/rooms/{room_id}/messages", params={"before_id": ids[1], "after_id": ids[0]})
+    assert both.status_code == 400
+    assert client.get("/chat/rooms/999999/messages").status_code == 404
@@ -0,0 +1,119 @@
+"""
+Schema setup must be safe when several workers start at once against an
+existing database: one migrates, the others wait and find it done.
+"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import pytest
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.exc import DBAPIError
+from app.core.database import configure_sqlite
+from app.core.migrations import MIGRATIONS, MIGRATION_LOCK_TIMEOUT, already_exists, schema_lock, schema_lock_rows
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LEGACY_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY, username VARCHAR NOT NULL UNIQUE, email VARCHAR NOT NULL UNIQUE,
+    password_hash VARCHAR NOT NULL, created_at DATETIME);
+CREATE TABLE chat_rooms (
+    id INTEGER PRIMARY KEY, name VARCHAR NOT NULL UNIQUE, created_at DATETIME,
+    created_by INTEGER REFERENCES users(id));
+CREATE TABLE messages (
+    id INTEGER PRIMARY KEY, room_id INTEGER NOT NULL REFERENCES chat_rooms(id),
+    user_id INTEGER NOT NULL REFERENCES users(id), content TEXT NOT NULL, timestamp DATETIME);
+INSERT INTO users VALUES (1, 'ana', 'ana@example.com', 'x', NULL);
+INSERT INTO chat_rooms VALUES (1, 'sala', '2024-01-01 00:00:00', 1);
+INSERT INTO messages VALUES (1, 1, 1, '[{"id": 2349, "palabra": "yo", "url": "u"}]', '2024-01-01 00:00:00');
+"""
+
+def sqlite_engine(path):
+    return configure_sqlite(create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False}))
+
+def test_workers_starting_together_migrate_once(tmp_path):
+    path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.close()
+
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}")
+    code = "import app.routers.chat; from app.core.database import init_db; init_db()"
+    workers = [
+        subprocess.Popen([sys.executable, "-c", code], cwd=BACKEND, env=env,
+                         stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        for _ in range(4)
+    ]
+    outputs = [worker.communicate(timeout=120)[0].decode() for worker in workers]
+    assert [worker.returncode for worker in workers] == [0] * 4, "\n".join(outputs)
+
+    conn = sqlite3.connect(path)
+    try:
+        applied = [row[0] for row in conn.execute("SELECT name FROM schema_migrations ORDER BY name")]
+        assert applied == sorted(name for name, _ in MIGRATIONS)
+        assert conn.execute("SELECT pictos, message_count FROM messages JOIN chat_rooms ON chat_rooms.id = room_id").fetchone() == ("2349\tyo", 1)
+        assert conn.execute("SELECT COUNT(*) FROM schema_lock").fetchone() == (0,)
+    finally:
+        conn.close()
+    assert sum(output.count("Applying migration") for output in outputs) == len(MIGRATIONS)
+
+def test_lock_is_held_until_released(tmp_path):
+    engine = sqlite_engine(tmp_path / "lock.db")
+    order = []
+    held = threading.Event()
+
+    def first():
+        with schema_lock(engine):
+            held.set()
+            time.sleep(0.5)
+            order.append("first done")
+
+    def second():
+        held.wait()
+        with schema_lock(engine):
+            order.append("second in")
+
+    threads = [threading.Thread(target=first), threading.Thread(target=second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert order == ["first done", "second in"]
+
+    with engine.connect() as conn:
+        assert conn.execute(select(schema_lock_rows)).all() == []
+
+def test_stale_lock_is_taken_over(tmp_path):
+    engine = sqlite_engine(tmp_path / "stale.db")
+    schema_lock_rows.create(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(schema_lock_rows.insert().values(
+            id=1, holder="crashed:1", acquired_at=time.time() - MIGRATION_LOCK_TIMEOUT - 1
+        ))
+
+    with schema_lock(engine):
+        with engine.connect() as conn:
+            holder = conn.execute(select(schema_lock_rows.c.holder)).scalar_one()
+        assert holder != "crashed:1"
+
+def test_existing_objects_count_as_applied(tmp_path):
+    engine = sqlite_engine(tmp_path / "ddl.db")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (a INTEGER)"))
+        conn.execute(text("ALTER TABLE t ADD COLUMN b INTEGER"))
+        conn.execute(text("CREATE INDEX ix_t_a ON t (a)"))
+
+    for ddl in ("ALTER TABLE t ADD COLUMN b INTEGER", "CREATE INDEX ix_t_a ON t (a)", "CREATE TABLE t (a INTEGER)"):
+        with pytest.raises(DBAPIError) as error:
+            with engine.begin() as conn:
+                conn.execute(text(ddl))
+        assert already_exists(error.value)
+
+    with pytest.raises(DBAPIError) as error:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE missing ADD COLUMN b INTEGER"))
+    assert not already_exists(error.value)
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, insert, select
+from sqlalchemy.exc import OperationalError
+from app.core.database import engine
+from app.core.persistence import IdAllocator, MessageWriter
+
+metadata = MetaData()
+
+def scratch_table(name: str) -> Table:
+    table = Table(
+        name,
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("body", String, nullable=False),
+    )
+    table.create(bind=engine)
+    return table
+
+def stored_ids(table) -> list:
+    with engine.connect() as conn:
+        return conn.execute(select(table.c.id).order_by(table.c.id)).scalars().all()
+
+def test_first_block_starts_after_existing_ids():
+    table = scratch_table("alloc_existing")
+    with engine.begin() as conn:
+        conn.execute(insert(table), [{"id": i, "body": "old"} for i in range(1, 8)])
+
+    allocator = IdAllocator(table, block_size=5)
+    ids = [allocator.next_id_blocking() for _ in range(12)]
+
+    assert ids == list(range(8, 20))
+
+def test_allocators_hand_out_disjoint_ids_across_threads():
+    table = scratch_table("alloc_threads")
+    workers = [IdAllocator(table, block_size=7) for _ in range(2)]  # one per simulated worker
+    ids = []
+    lock = threading.Lock()
+
+    def take(allocator):
+        taken = [allocator.next_id_blocking() for _ in range(100)]
+        with lock:
+            ids.extend(taken)
+
+    threads = [threading.Thread(target=take, args=(workers[i % 2],)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(ids) == 600
+    assert len(set(ids)) == 600
+
+def test_async_next_id_continues_the_block():
+    table = scratch_table("alloc_async")
+    allocator = IdAllocator(table, block_size=3)
+
+    async def take():
+        return [await allocator.next_id() for _ in range(7)]
+
+    assert asyncio.run(take()) == list(range(1, 8))
+
+def run_writer(writer, rows):
+    async def main():
+        await writer.start()
+        for row in rows:
+            await writer.enqueue(row)
+        await writer.stop()
+
+    asyncio.run(main())
+
+def test_writer_batches_rows_and_stop_drains_the_queue():
+    table = scratch_table("writer_batches")
+    batches = []
+    writer = MessageWriter(table, batch_size=3, max_delay=1.0,
+                           on_batch=lambda conn, rows: batches.append([row["id"] for row in rows]))
+
+    run_writer(writer, [{"id": i, "body": f"m{i}"} for i in range(1, 9)])
+
+    assert stored_ids(table) == list(range(1, 9))
+    assert all(len(batch) <= 3 for batch in batches)
+    assert [i for batch in batches for i in batch] == list(range(1, 9))
+
+def test_writer_without_start_writes_immediately():
+    table = scratch_table("writer_unstarted")
+    writer = MessageWriter(table)
+
+    asyncio.run(writer.enqueue({"id": 1, "body": "now"}))
+
+    assert stored_ids(table) == [1]
+
+def test_bad_row_is_skipped_without_losing_the_batch():
+    table = scratch_table("writer_bad_row")
+    with engine.begin() as conn:
+        conn.execute(insert(table).values(id=2, body="taken"))
+    writer = MessageWriter(table, batch_size=10, max_delay=1.0)
+
+    run_writer(writer, [{"id": i, "body": f"m{i}"} for i in range(1, 5)])
+
+    assert stored_ids(table) == [1, 2, 3, 4]
+    with engine.connect() as conn:
+        assert conn.execute(select(table.c.body).where(table.c.id == 2)).scalar_one() == "taken"
+
+def test_transient_error_retries_the_whole_batch(monkeypatch):
+    table = scratch_table("writer_transient")
+    writer = MessageWriter(table, batch_size=10, max_delay=1.0)
+    write_batch = writer._write_batch
+    calls = []
+
+    def flaky(batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+        write_batch(batch)
+
+    monkeypatch.setattr(writer, "_write_batch", flaky)
+    run_writer(writer, [{"id": i, "body": f"m{i}"} for i in range(1, 4)])
+
+    assert calls == [3, 3]
+    assert stored_ids(table) == [1, 2, 3]
@@ -0,0 +1,101 @@
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.arasaac import pictogram_url
+from app.core.database import SessionLocal, engine
+from app.core.migrations import _messages_compact_pictos
+from app.core.pictograms import compact_pictograms, pack_pictograms, unpack_pictograms
+from app.core.sessions import Principal
+from app.models.chat import Message
+from app.routers import chat
+
+def picto(picto_id, word):
+    return {"palabra": word, "id": picto_id, "url": pictogram_url(picto_id)}
+
+def test_pack_round_trip():
+    pairs = [(2349, "yo"), (31141, "quiero"), (8, "agua con gas"), (9, "añadir")]
+    assert unpack_pictograms(pack_pictograms(pairs)) == pairs
+    assert unpack_pictograms("") == []
+
+def test_separators_in_words_are_flattened():
+    pairs = compact_pictograms([{"id": 1, "palabra": "a\tb\nc"}])
+    assert pairs == [(1, "a b c")]
+    assert unpack_pictograms(pack_pictograms(pairs)) == pairs
+
+def test_compact_pictos_migration_round_trip(make_room):
+    user_id, room_id = make_room("migration-0003")
+    legacy = [
+        [picto(2349, "yo"), picto(31141, "quiero"), picto(8, "agua con gas")],
+        [picto(9, "añadir")],
+        [],
+        [{"palabra": "libre", "id": "custom", "url": "https://example.com/x.png"}],  # no ARASAAC id
+    ]
+    with engine.begin() as conn:
+        ids = [
+            conn.execute(Message.__table__.insert().values(
+                room_id=room_id, user_id=user_id, content=json.dumps(pictos, ensure_ascii=False), pictos=None
+            )).inserted_primary_key[0]
+            for pictos in legacy
+        ]
+        broken = conn.execute(Message.__table__.insert().values(
+            room_id=room_id, user_id=user_id, content="not json", pictos=None
+        )).inserted_primary_key[0]
+        not_lists = [
+            conn.execute(Message.__table__.insert().values(
+                room_id=room_id, user_id=user_id, content=content, pictos=None
+            )).inserted_primary_key[0]
+            for content in ("5", "null", '{"id": 1, "palabra": "yo"}', '"yo"')
+        ]
+
+    _messages_compact_pictos(engine, batch_size=2)
+    _messages_compact_pictos(engine, batch_size=2)  # re-running is a no-op
+
+    db = SessionLocal()
+    try:
+        rows = {msg.id: msg for msg in db.query(Message).filter(Message.room_id == room_id)}
+        for message_id, pictos in zip(ids, legacy):
+            assert rows[message_id].get_pictograms() == pictos
+        # Packed rows drop the JSON; rows that can't be packed keep it
+        assert rows[ids[0]].content == "" and rows[ids[0]].pictos is not None
+        assert rows[ids[2]].pictos == ""
+        assert rows[ids[3]].pictos is None
+        assert rows[ids[0]].get_compact_pictograms() == [(2349, "yo"), (31141, "quiero"), (8, "agua con gas")]
+        assert rows[broken].content == "not json" and rows[broken].pictos is None
+        assert rows[broken].get_pictograms() == []
+        # Valid JSON that is not a list is left alone
+        assert [(rows[i].content, rows[i].pictos) for i in not_lists] == [
+            ("5", None), ("null", None), ('{"id": 1, "palabra": "yo"}', None), ('"yo"', None)
+        ]
+    finally:
+        db.close()
+
+@pytest.fixture
+def socket(make_room, request):
+    user_id, room_id = make_room(request.node.name)
+    token = chat.session_store.create(Principal(user_id, f"{request.node.name}-user"))
+    # Broadcasts are delivered through the manager's pub/sub listener
+    app = FastAPI(on_startup=[chat.manager.start], on_shutdown=[chat.manager.stop])
+    app.include_router(chat.router)
+    with TestClient(app) as client, client.websocket_connect(f"/chat/ws/{room_id}?token={token}") as websocket:
+        yield websocket
+
+def next_message(websocket):
+    while True:
+        frame = websocket.receive_json()
+        if frame.get("type") == "message":
+            return frame
+
+@pytest.mark.parametrize("frame", [
+    {"type": "message", "content": 5},
+    {"type": "message", "content": None},
+    {"type": "message", "content": {"id": 1}},
+    {"type": "message", "content": "yo"},
+    [1, 2, 3],
+])
+def test_malformed_frames_keep_the_connection(socket, frame):
+    socket.send_json(frame)
+    socket.send_json({"type": "message", "content": [{"id": 2349, "palabra": "yo", "url": "x"}]})
+    message = next_message(socket)
+    # Broadcast with the canonical pictogram objects history returns
+    assert message["content"] == [picto(2349, "yo")]
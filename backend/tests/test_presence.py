@@ -0,0 +1,114 @@
+import asyncio
+from collections import namedtuple
+from app.core.connections import ConnectionManager
+from app.core.presence import PresenceService
+from app.core.pubsub import PubSubBackend
+
+Principal = namedtuple("Principal", "id username")
+ANA, LUIS = Principal(1, "ana"), Principal(2, "luis")
+ROOM = 1
+
+class SharedBus(PubSubBackend):
+    """Delivers every publish to all the workers on `bus`, like a real broker"""
+
+    def __init__(self, bus: list):
+        super().__init__()
+        self.bus = bus
+
+    async def start(self, handler):
+        await super().start(handler)
+        self.bus.append(self)
+
+    async def publish(self, room_id, message):
+        for backend in self.bus:
+            backend._deliver(room_id, message)
+
+class FakeConnection:
+    def __init__(self):
+        self.frames = []
+
+    def enqueue(self, frame):
+        self.frames.append(frame.message)
+        return True
+
+def workers(count=1, typing_interval=60):
+    """PresenceServices on `count` workers sharing a bus, plus the diffs they publish"""
+    bus, diffs = [], []
+    services = []
+    for _ in range(count):
+        manager = ConnectionManager(pubsub=SharedBus(bus))
+        asyncio.run(manager.start())
+        services.append(PresenceService(manager, typing_interval=typing_interval))
+    services[0].manager.add_listener("presence", lambda room_id, diff: diffs.append(diff))
+    return services, diffs
+
+def flush(*services):
+    for service in services:
+        asyncio.run(service.flush())
+
+def test_changes_are_coalesced_into_one_diff():
+    (presence,), diffs = workers()
+    presence.join(ROOM, ANA)
+    presence.join(ROOM, ANA)  # second tab: not a new join
+    presence.join(ROOM, LUIS)
+    presence.typing(ROOM, ANA)
+    presence.typing(ROOM, ANA)
+    flush(presence)
+    assert len(diffs) == 1
+    assert diffs[0]["joined"] == [[1, "ana"], [2, "luis"]]
+    assert diffs[0]["typing"] == [1]
+    assert "left" not in diffs[0]
+
+    flush(presence)
+    assert len(diffs) == 1  # nothing pending, nothing sent
+
+def test_user_leaves_when_their_last_connection_closes():
+    (presence,), diffs = workers()
+    presence.join(ROOM, ANA)
+    presence.join(ROOM, ANA)
+    flush(presence)
+    presence.leave(ROOM, ANA)
+    flush(presence)
+    assert len(diffs) == 1
+    presence.leave(ROOM, ANA)
+    flush(presence)
+    assert diffs[-1]["left"] == [1] and "joined" not in diffs[-1]
+
+def test_join_and_leave_in_one_window_cancel_out():
+    (presence,), diffs = workers()
+    presence.join(ROOM, ANA)
+    presence.leave(ROOM, ANA)
+    flush(presence)
+    assert diffs == []
+    assert ROOM not in presence.rooms  # empty rooms are dropped
+
+def test_typing_is_throttled_per_user():
+    (presence,), diffs = workers(typing_interval=60)
+    presence.join(ROOM, ANA)
+    presence.typing(ROOM, ANA)
+    flush(presence)
+    presence.typing(ROOM, ANA)
+    presence.typing(ROOM, LUIS)  # not in the room
+    flush(presence)
+    assert len(diffs) == 1 and diffs[0]["typing"] == [1]
+
+    (presence,), diffs = workers(typing_interval=0)
+    presence.join(ROOM, ANA)
+    for _ in range(2):
+        presence.typing(ROOM, ANA)
+        flush(presence)
+    assert [diff.get("typing") for diff in diffs] == [[1], [1]]
+
+def test_snapshot_includes_users_on_other_workers():
+    (first, second), _ = workers(2)
+    first.join(ROOM, ANA)
+    flush(first)
+
+    connection = FakeConnection()
+    second.join(ROOM, LUIS, connection)
+    assert connection.frames == [{"type": "presence_snapshot", "members": [[1, "ana"], [2, "luis"]]}]
+
+    first.leave(ROOM, ANA)
+    flush(first, second)
+    assert second.snapshot(ROOM) == [[2, "luis"]]
+    assert first.snapshot(ROOM) == [[2, "luis"]]
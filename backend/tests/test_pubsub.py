@@ -0,0 +1,92 @@
+import asyncio
+import json
+import pytest
+from app.core.connections import ConnectionManager
+from app.core.pubsub import InMemoryPubSub, SQLitePubSub, create_pubsub
+
+class FakeWebSocket:
+    def __init__(self):
+        self.received = []
+
+    async def accept(self):
+        pass
+
+    async def close(self, code=1000):
+        pass
+
+    async def send_text(self, text):
+        self.received.append(json.loads(text))
+
+async def wait_for(condition, timeout=5):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), timeout)
+
+def test_create_pubsub_from_url(tmp_path):
+    assert isinstance(create_pubsub("memory://"), InMemoryPubSub)
+    backend = create_pubsub(f"sqlite:///{tmp_path}/bus.db")
+    assert isinstance(backend, SQLitePubSub) and backend.path == f"{tmp_path}/bus.db"
+    with pytest.raises(ValueError):
+        create_pubsub("amqp://localhost")
+
+def test_in_memory_broadcast_reaches_the_room_only():
+    async def main():
+        manager = ConnectionManager(pubsub=InMemoryPubSub())
+        await manager.start()
+        here, elsewhere = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(here, 1)
+        await manager.connect(elsewhere, 2)
+        seen = []
+        manager.add_listener("message", lambda room_id, message: seen.append(room_id))
+        await manager.broadcast({"type": "message", "text": "hola"}, 1)
+        await wait_for(lambda: here.received)
+        await asyncio.sleep(0.05)
+        await manager.stop()
+        return here.received, elsewhere.received, seen
+
+    here, elsewhere, seen = asyncio.run(main())
+    assert here == [{"type": "message", "text": "hola"}]
+    assert elsewhere == []
+    assert seen == [1]
+
+def test_sqlite_broker_fans_out_across_workers_exactly_once(tmp_path):
+    path = str(tmp_path / "bus.db")
+    workers = 3
+
+    async def main():
+        # One manager per worker, each with its own broker connections
+        managers = [ConnectionManager(pubsub=SQLitePubSub(path, poll_interval=0.01)) for _ in range(workers)]
+        sockets = [FakeWebSocket() for _ in range(workers)]
+        for manager, websocket in zip(managers, sockets):
+            await manager.start()
+            await manager.connect(websocket, 1)
+        for index, manager in enumerate(managers):
+            await manager.broadcast({"type": "message", "from_worker": index}, 1)
+        await wait_for(lambda: all(len(ws.received) >= workers for ws in sockets))
+        await asyncio.sleep(0.1)  # late duplicates would show up here
+        for manager in managers:
+            await manager.stop()
+        return [sorted(m["from_worker"] for m in ws.received) for ws in sockets]
+
+    assert asyncio.run(main()) == [list(range(workers))] * workers
+
+def test_sqlite_worker_only_receives_messages_published_after_it_started(tmp_path):
+    path = str(tmp_path / "bus.db")
+
+    async def main():
+        early = ConnectionManager(pubsub=SQLitePubSub(path, poll_interval=0.01))
+        await early.start()
+        await early.broadcast({"type": "message", "n": 1}, 1)
+        late = ConnectionManager(pubsub=SQLitePubSub(path, poll_interval=0.01))
+        await late.start()
+        websocket = FakeWebSocket()
+        await late.connect(websocket, 1)
+        await early.broadcast({"type": "message", "n": 2}, 1)
+        await wait_for(lambda: websocket.received)
+        await asyncio.sleep(0.05)
+        await early.stop()
+        await late.stop()
+        return websocket.received
+
+    assert asyncio.run(main()) == [{"type": "message", "n": 2}]
@@ -0,0 +1,119 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core import arasaac
+from app.core.recommend_cache import ResponseCache, cache_key, etag_for_key
+from app.routers import recommend
+
+def test_key_depends_only_on_the_effective_context():
+    key = cache_key(["yo", "quiero"])
+    assert cache_key(["Yo", "QUIERO"]) == key
+    assert cache_key(["yo quiero"]) == key
+    assert cache_key(["  yo ", "quiero  "]) == key
+    # Only the last 3 words reach the predictors
+    assert cache_key(["mamá", "yo", "quiero", "agua"]) == cache_key(["papá", "yo", "quiero", "agua"])
+    assert cache_key(["yo", "quiero", "agua"]) != key
+    assert cache_key([]) != key
+
+def test_key_and_etag_change_with_language_and_pictogram_generation(monkeypatch):
+    key = cache_key(["yo"], "es")
+    assert cache_key(["yo"], "en") != key
+    assert etag_for_key(cache_key(["yo"], "en")) != etag_for_key(key)
+
+    monkeypatch.setattr(arasaac, "cache_generation", arasaac.cache_generation + 1)
+    bumped = cache_key(["yo"], "es")
+    assert bumped != key
+    assert etag_for_key(bumped) != etag_for_key(key)
+
+def test_etag_changes_with_pictogram_urls(monkeypatch):
+    key = cache_key(["yo"])
+    etag = etag_for_key(key)
+    assert etag_for_key(key) == etag
+    monkeypatch.setattr(arasaac, "STATIC_URL", "https://cdn.example.com/pictograms")
+    assert etag_for_key(key) != etag
+
+def key(context, lang="es"):
+    return (lang, "v1", 0, tuple(context.split()))
+
+def test_lru_evicts_least_recently_used_entry():
+    cache = ResponseCache(max_entries=2, max_bytes=1000)
+    cache.put(key("a"), b"1")
+    cache.put(key("b"), b"2")
+    assert cache.get(key("a")) == b"1"  # "b" is now the oldest
+    cache.put(key("c"), b"3")
+    assert cache.get(key("b")) is None
+    assert cache.get(key("a")) == b"1" and cache.get(key("c")) == b"3"
+    assert cache.stats.evictions == 1
+
+def test_lru_is_bounded_by_bytes():
+    cache = ResponseCache(max_entries=10, max_bytes=10)
+    cache.put(key("a"), b"x" * 4)
+    cache.put(key("b"), b"x" * 4)
+    cache.put(key("a"), b"x" * 5)  # replacing an entry counts only its new size
+    assert cache.bytes == 9
+    cache.put(key("c"), b"x" * 4)
+    assert cache.get(key("b")) is None
+    assert cache.bytes == 9
+    cache.put(key("big"), b"x" * 50)  # a single oversized body is still kept
+    assert cache.get(key("big")) is not None and cache.bytes == 50
+
+def test_invalidate_by_language_and_context_prefix():
+    cache = ResponseCache()
+    for lang, context in [("es", "yo"), ("es", "yo quiero"), ("es", "tú"), ("en", "yo")]:
+        cache.put(key(context, lang), context.encode())
+    assert cache.invalidate("es:yo") == 2
+    assert cache.get(key("yo")) is None and cache.get(key("yo quiero")) is None
+    assert cache.get(key("tú")) == "tú".encode() and cache.get(key("yo", "en")) == b"yo"
+    assert cache.invalidate() == 2
+    assert cache.bytes == 0
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(recommend, "recommend_cache", ResponseCache())
+    monkeypatch.setattr(recommend, "predict_next_words_cached", lambda context, num_words, lang: ["agua", "pan"])
+    app = FastAPI()
+    app.include_router(recommend.router)
+    return TestClient(app)
+
+def lookup_with(failing):
+    def lookup(word, lang=None):
+        if word in failing:
+            return None
+        return [{"_id": len(word), "keywords": []}]
+    return lookup
+
+def test_answers_with_failed_lookups_are_not_cached(client, monkeypatch):
+    monkeypatch.setattr(recommend, "lookup_pictograms", lookup_with({"pan"}))
+    response = client.get("/recommend", params={"selected": ["yo", "quiero"]})
+    assert response.status_code == 200
+    assert response.headers["x-recommend-degraded"] == "pictograms"
+    assert response.headers["cache-control"] == "no-store"
+    assert "etag" not in response.headers
+    assert [p["palabra"] for p in response.json()["recommended"]] == ["agua"]
+    assert recommend.recommend_cache.get(cache_key(["yo", "quiero"])) is None
+
+    monkeypatch.setattr(recommend, "lookup_pictograms", lookup_with(set()))
+    response = client.get("/recommend", params={"selected": ["yo", "quiero"]})
+    assert "x-recommend-degraded" not in response.headers
+    assert [p["palabra"] for p in response.json()["recommended"]] == ["agua", "pan"]
+    assert recommend.recommend_cache.get(cache_key(["yo", "quiero"])) == response.content
+
+def test_equivalent_requests_share_the_entry_and_etag(client, monkeypatch):
+    monkeypatch.setattr(recommend, "lookup_pictograms", lookup_with(set()))
+    first = client.get("/recommend", params={"selected": ["Yo", "quiero"]})
+    etag = first.headers["etag"]
+    assert etag == etag_for_key(cache_key(["yo", "quiero"]))
+
+    # Served from the cache even if ARASAAC is down now
+    monkeypatch.setattr(recommend, "lookup_pictograms", lookup_with({"agua", "pan"}))
+    second = client.post("/recommend", json={"selected": ["yo quiero"]})
+    assert second.content == first.content
+    assert "etag" not in second.headers
+
+    revalidated = client.get("/recommend", params={"selected": ["yo", "QUIERO"]}, headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+
+    monkeypatch.setattr(arasaac, "cache_generation", arasaac.cache_generation + 1)
+    stale = client.get("/recommend", params={"selected": ["yo", "quiero"]}, headers={"If-None-Match": etag})
+    assert stale.status_code == 200
+    assert stale.headers["x-recommend-degraded"] == "pictograms"
@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.database import engine
+from app.core.rooms import record_room_activity
+from app.models.chat import ChatRoom
+from app.routers import chat
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(chat.router)
+    return TestClient(app)
+
+def all_pages(client, **params):
+    rooms, cursor = [], None
+    while True:
+        query = dict(params, cursor=cursor) if cursor else params
+        response = client.get("/chat/rooms", params=query)
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["rooms"]) <= params["limit"]
+        rooms += data["rooms"]
+        cursor = data["next_cursor"]
+        if cursor is None:
+            return rooms
+
+def test_every_room_is_reachable_through_the_cursor(client, make_room):
+    created = [make_room(f"listing-{i}")[1] for i in range(23)]
+    # Same activity time for a few rooms: ties are broken by id
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for i, room_id in enumerate(created):
+            conn.execute(ChatRoom.__table__.update().where(ChatRoom.__table__.c.id == room_id).values(
+                last_activity_at=now - timedelta(minutes=i // 3)
+            ))
+
+    rooms = all_pages(client, limit=5)
+    ids = [room["id"] for room in rooms]
+    assert len(ids) == len(set(ids))
+    assert set(created) <= set(ids)
+    keys = [(room["last_activity_at"], room["id"]) for room in rooms]
+    assert keys == sorted(keys, reverse=True)
+
+    by_creation = [room["id"] for room in all_pages(client, limit=5, sort="created")]
+    assert by_creation == sorted(ids, reverse=True)
+
+def test_activity_moves_a_room_to_the_first_page(client, make_room):
+    user_id, room_id = make_room("listing-active")
+    rows = [{
+        "id": 990001, "room_id": room_id, "user_id": user_id, "content": "",
+        "pictos": "2349\tyo\n31141\tquiero", "timestamp": datetime.utcnow() + timedelta(hours=1),
+    }]
+    with engine.begin() as conn:
+        record_room_activity(conn, rows)
+
+    first = client.get("/chat/rooms", params={"limit": 1}).json()["rooms"][0]
+    assert first["id"] == room_id
+    assert first["message_count"] == 1
+    assert first["last_message_id"] == 990001
+    assert first["last_message_preview"] == "yo quiero"
+
+def test_invalid_cursor_is_400(client):
+    assert client.get("/chat/rooms", params={"cursor": "not-a-cursor"}).status_code == 400
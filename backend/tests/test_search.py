@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from app.core.database import engine
+from app.core.pictograms import pack_pictograms
+from app.core.search import row_words, search_message_ids, upgrade_search_index
+from app.models.chat import Message
+from app.models.user import User
+from app.routers import chat
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(chat.router)
+    return TestClient(app)
+
+def store(rows):
+    """Insert and index messages the way MessageWriter does"""
+    rows = [
+        dict(row, content="", pictos=pack_pictograms([(i, word) for i, word in enumerate(row.pop("words").split())]))
+        for row in rows
+    ]
+    with engine.begin() as conn:
+        conn.execute(Message.__table__.insert(), rows)
+        chat.on_message_batch(conn, rows)
+
+@pytest.fixture(scope="module")
+def rooms(make_room):
+    """Two rooms, two users; returns (ana, luis, room_a, room_b)"""
+    ana, room_a = make_room("search-a")
+    luis, room_b = make_room("search-b")
+    now = datetime.utcnow()
+    store([
+        {"id": 50001, "room_id": room_a, "user_id": ana, "words": "yo quiero kiwi", "timestamp": now},
+        {"id": 50002, "room_id": room_a, "user_id": luis, "words": "kiwi pera", "timestamp": now},
+        {"id": 50003, "room_id": room_b, "user_id": ana, "words": "kiwi añadir", "timestamp": now},
+        {"id": 50004, "room_id": room_b, "user_id": luis, "words": "pera", "timestamp": now},
+    ])
+    return ana, luis, room_a, room_b
+
+def search(client, **params):
+    response = client.get("/chat/search", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+def ids(data):
+    return sorted(message["id"] for message in data["results"])
+
+def test_room_and_user_scoping(client, rooms):
+    ana, luis, room_a, room_b = rooms
+    assert ids(search(client, q="kiwi")) == [50001, 50002, 50003]
+    assert ids(search(client, q="kiwi", room_id=room_a)) == [50001, 50002]
+    assert ids(search(client, q="kiwi", user_id=ana)) == [50001, 50003]
+    assert ids(search(client, q="kiwi", room_id=room_b, user_id=ana)) == [50003]
+    assert ids(search(client, q="kiwi", room_id=room_b, user_id=luis)) == []
+    assert ids(search(client, q="pera", room_id=room_b)) == [50004]
+
+def test_all_words_must_match_ignoring_accents_and_case(client, rooms):
+    assert ids(search(client, q="KIWI pera")) == [50002]
+    assert ids(search(client, q="anadir")) == [50003]
+    assert ids(search(client, q="Añadir kiwi")) == [50003]
+
+@pytest.mark.parametrize("query, expected", [
+    ('kiwi"', [50001, 50002, 50003]),
+    ("kiwi*", [50001, 50002, 50003]),
+    ("kiwi OR pera", []),  # "or" is just another word
+    ("NEAR(kiwi pera)", []),
+    ("-", []),
+    ("r1", []),  # scope tokens are not words
+])
+def test_user_input_is_plain_words(client, rooms, query, expected):
+    assert ids(search(client, q=query)) == expected
+
+def test_results_are_newest_first_by_timestamp_and_page_without_gaps(client, make_room):
+    user_id, room_id = make_room("search-order")
+    now = datetime.utcnow()
+    # Ids from two workers' blocks: not in time order
+    ids_in_time_order = [60101, 60001, 60102, 60002, 60003, 60103, 60104, 60004]
+    timestamps = [now - timedelta(minutes=10 - i) for i in range(8)]
+    timestamps[5] = timestamps[4]  # a tie, broken by id
+    store([
+        {"id": message_id, "room_id": room_id, "user_id": user_id, "words": "sandía", "timestamp": ts}
+        for message_id, ts in zip(ids_in_time_order, timestamps)
+    ])
+    expected = sorted(zip(timestamps, ids_in_time_order), reverse=True)
+    expected = [message_id for _, message_id in expected]
+
+    first = search(client, q="sandía", room_id=room_id, limit=100)
+    assert [message["id"] for message in first["results"]] == expected
+
+    for limit in (1, 3, 5):
+        seen, cursor = [], None
+        while True:
+            params = {"q": "sandia", "room_id": room_id, "limit": limit}
+            if cursor is not None:
+                params["before_id"] = cursor
+            data = search(client, **params)
+            seen += [message["id"] for message in data["results"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+        assert seen == expected
+
+def test_unknown_cursor_ends_the_results(rooms):
+    from app.core.database import ReadSessionLocal
+    db = ReadSessionLocal()
+    try:
+        assert search_message_ids(db, "kiwi", before_id=1) == []
+    finally:
+        db.close()
+
+def test_words_of_legacy_rows():
+    assert row_words({"pictos": None, "content": '[{"id": 1, "palabra": "yo"}, {"palabra": "agua"}, 3]'}) == "yo agua"
+    for content in ("5", "null", '{"palabra": "yo"}', "not json"):
+        assert row_words({"pictos": None, "content": content}) == ""
+
+def test_old_index_is_rebuilt_with_scope_and_timestamps(tmp_path):
+    old = create_engine(f"sqlite:///{tmp_path}/old.db")
+    with old.begin() as conn:
+        conn.execute(text("CREATE TABLE messages (id INTEGER PRIMARY KEY, timestamp DATETIME)"))
+        conn.execute(text("INSERT INTO messages VALUES (7, '2025-01-02 10:00:00.000000'), (3, '2025-01-02 11:00:00.000000')"))
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE message_search USING fts5(words, room_id UNINDEXED, user_id UNINDEXED,"
+            " tokenize = 'unicode61 remove_diacritics 2')"
+        ))
+        conn.execute(text("INSERT INTO message_search (rowid, words, room_id, user_id) VALUES (7, 'kiwi', 1, 2), (3, 'kiwi', 1, 4)"))
+
+    upgrade_search_index(old)
+    upgrade_search_index(old)  # already current: no-op
+
+    with old.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT rowid, ts FROM message_search WHERE message_search MATCH 'words : kiwi AND scope : r1' "
+            "ORDER BY ts DESC, rowid DESC"
+        )).all()
+    assert rows == [(3, "2025-01-02 11:00:00.000000"), (7, "2025-01-02 10:00:00.000000")]
@@ -0,0 +1,136 @@
+"""
+Session stores: sliding TTL, touch interval and expiry, against the
+in-memory and SQLite backends, on a fake clock.
+"""
+
+import pytest
+from app.core import sessions
+from app.core.sessions import MemorySessionStore, Principal, SQLiteSessionStore, create_session_store
+
+TTL = 100
+TOUCH_INTERVAL = 10
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def at(self, offset):
+        self.now = 1_000_000.0 + offset
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sessions, "time", clock)
+    return clock
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, clock, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore(ttl=TTL, touch_interval=TOUCH_INTERVAL)
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=TTL, touch_interval=TOUCH_INTERVAL)
+
+ANA = Principal(42, "ana")
+LUIS = Principal(7, "luis")
+
+def test_token_resolves_to_its_principal(store):
+    token = store.create(ANA)
+    assert store.get(token) == ANA
+    assert store.get("unknown") is None
+    assert store.get("") is None
+
+def test_session_expires_after_ttl(store, clock):
+    token = store.create(ANA)
+    clock.at(TTL - 1)
+    assert store.get(token) == ANA  # and slides to TTL - 1 + TTL
+    other = store.create(LUIS)
+    clock.at(2 * TTL - 1)
+    assert store.get(other) is None
+    assert store.get(token) is None
+
+def test_use_slides_expiry(store, clock):
+    token = store.create(ANA)
+    for step in range(1, 6):
+        clock.at(step * (TTL - 1))
+        assert store.get(token) == ANA
+    clock.at(6 * (TTL - 1) + TTL)
+    assert store.get(token) is None
+
+def test_no_touch_within_the_interval(store, clock):
+    token = store.create(ANA)
+    clock.at(TOUCH_INTERVAL - 1)
+    assert store.get(token) == ANA  # expiry is fresh enough: not pushed forward
+    clock.at(TTL)
+    assert store.get(token) is None
+
+def test_touch_once_stale_by_more_than_the_interval(store, clock):
+    token = store.create(ANA)
+    clock.at(TOUCH_INTERVAL + 1)
+    assert store.get(token) == ANA  # expiry moves to TOUCH_INTERVAL + 1 + TTL
+    clock.at(TTL + TOUCH_INTERVAL)
+    assert store.get(token) == ANA  # past the original expiry; slides again
+    clock.at(TTL + TOUCH_INTERVAL + TTL)
+    assert store.get(token) is None
+
+def test_delete_and_invalidate_by_user(store):
+    ana = [store.create(ANA) for _ in range(2)]
+    luis = store.create(LUIS)
+    store.delete(ana[0])
+    assert store.get(ana[0]) is None
+    assert store.get(ana[1]) == ANA
+
+    assert store.invalidate("42:") == 1
+    assert store.get(ana[1]) is None
+    assert store.get(luis) == LUIS
+    assert store.invalidate(f"7:{luis}") == 1
+    assert store.invalidate() == 0
+
+def test_cache_stats(store, clock):
+    token = store.create(ANA)
+    store.create(LUIS)
+    store.get(token)
+    store.get(token)
+    store.get("unknown")
+    stats = store.cache_stats()
+    assert stats["key"] == "<user_id>:<token>"
+    assert stats["ttl_seconds"] == TTL
+    assert stats["entries"] == 2
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+
+def test_memory_store_purges_expired_sessions(clock):
+    store = MemorySessionStore(ttl=TTL, touch_interval=TOUCH_INTERVAL)
+    for _ in range(3):
+        store.create(ANA)
+    clock.at(TTL + 1)
+    store.create(LUIS)  # creating a session purges the expired ones
+    assert len(store) == 1
+    assert store.cache_stats()["evictions"] == 3
+
+def test_sqlite_store_is_shared_between_workers(clock, tmp_path):
+    path = str(tmp_path / "sessions.db")
+    first = SQLiteSessionStore(path, ttl=TTL, touch_interval=TOUCH_INTERVAL)
+    second = SQLiteSessionStore(path, ttl=TTL, touch_interval=TOUCH_INTERVAL)
+    token = first.create(ANA)
+    assert second.get(token) == ANA
+
+    clock.at(TTL - 1)
+    assert second.get(token) == ANA  # the touch is seen by every worker
+    clock.at(TTL + 1)
+    assert first.get(token) == ANA
+
+    second.invalidate("42:")
+    assert first.get(token) is None
+
+def test_sqlite_store_counts_only_live_sessions(clock, tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=TTL, touch_interval=TOUCH_INTERVAL)
+    store.create(ANA)
+    clock.at(TTL)
+    assert store.cache_stats()["entries"] == 0
+
+def test_store_from_url(tmp_path):
+    assert isinstance(create_session_store("memory://"), MemorySessionStore)
+    assert isinstance(create_session_store(f"sqlite:///{tmp_path}/sessions.db"), SQLiteSessionStore)
+    with pytest.raises(ValueError):
+        create_session_store("memcached://localhost")
@@ -0,0 +1,129 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app.core import arasaac
+from app.core.single_flight import SingleFlight, SQLiteLookupCache, fetch_once
+
+THREADS = 8
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+def test_concurrent_calls_run_fn_once():
+    flights = SingleFlight()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        wait_for(lambda: flights.coalesced == THREADS - 1)  # everyone else is waiting on us
+        return ["agua"]
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = list(pool.map(lambda _: flights.do("es:agua", fn), range(THREADS)))
+    assert calls == [1]
+    assert results == [["agua"]] * THREADS
+    assert flights.leaders == 1 and flights.in_flight() == 0
+
+def test_errors_reach_every_waiter_and_are_not_remembered():
+    flights = SingleFlight()
+
+    def fail():
+        wait_for(lambda: flights.coalesced == THREADS - 1)
+        raise ConnectionError("ARASAAC down")
+
+    def call(_):
+        try:
+            flights.do("es:agua", fail)
+        except ConnectionError as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        errors = list(pool.map(call, range(THREADS)))
+    assert all(isinstance(e, ConnectionError) for e in errors)
+    assert flights.leaders == 1
+    assert flights.do("es:agua", lambda: "ok") == "ok"  # the next call runs again
+
+class Upstream:
+    """Stand-in for requests.get against the ARASAAC search API"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def __call__(self, url, **kwargs):
+        self.calls.append(url)
+        wait_for(lambda: arasaac._flights.coalesced >= self.coalesced_target)
+        if self.fail:
+            raise ConnectionError("ARASAAC down")
+        return self
+
+    def json(self):
+        return [{"_id": 2248, "keywords": []}, {"_id": 1, "keywords": []}]
+
+@pytest.fixture
+def upstream(monkeypatch):
+    monkeypatch.setattr(arasaac, "_shared_cache", None)
+    def make(fail=False):
+        stand_in = Upstream(fail)
+        stand_in.coalesced_target = arasaac._flights.coalesced + THREADS - 1
+        monkeypatch.setattr(arasaac.requests, "get", stand_in)
+        return stand_in
+    return make
+
+def lookup_all(word):
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        return list(pool.map(lambda _: arasaac.lookup_pictograms(word, "es"), range(THREADS)))
+
+def test_concurrent_lookups_share_one_upstream_request(upstream, request):
+    word = request.node.name
+    stand_in = upstream()
+    results = lookup_all(word)
+    assert len(stand_in.calls) == 1
+    assert results == [[{"_id": 2248, "keywords": []}]] * THREADS
+
+    # Cached now: no more requests
+    assert arasaac.lookup_pictograms(word, "es") == results[0]
+    assert len(stand_in.calls) == 1
+
+def test_failed_lookup_is_shared_but_not_cached(upstream, request):
+    word = request.node.name
+    failing = upstream(fail=True)
+    errors_before = arasaac.lookup_metrics()["upstream_errors"]
+    assert lookup_all(word) == [None] * THREADS
+    assert len(failing.calls) == 1  # the waiters did not repeat the failed request
+    assert arasaac.lookup_metrics()["upstream_errors"] == errors_before + 1
+    assert arasaac.cached_pictograms(word, "es") == []
+
+    # The next lookup tries ARASAAC again
+    working = upstream()
+    working.coalesced_target = 0
+    assert arasaac.lookup_pictograms(word, "es") == [{"_id": 2248, "keywords": []}]
+    assert len(working.calls) == 1
+
+def test_shared_cache_fetches_once_across_workers(tmp_path):
+    path = str(tmp_path / "pictograms.db")
+    counts = []
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        time.sleep(0.1)
+        return [{"_id": 7}]
+
+    # One cache connection per simulated worker
+    workers = [SQLiteLookupCache(path) for _ in range(4)]
+    with ThreadPoolExecutor(max_workers=len(workers)) as pool:
+        results = list(pool.map(lambda shared: fetch_once(shared, "es:yo", fetch, counts.append), workers))
+    assert fetches == [1]
+    assert results == [[{"_id": 7}]] * len(workers)
+    assert counts.count("coalesced_remote") + counts.count("shared_hits") == len(workers) - 1
+
+def test_shared_cache_does_not_store_failures(tmp_path):
+    shared = SQLiteLookupCache(str(tmp_path / "pictograms.db"))
+    assert fetch_once(shared, "es:yo", lambda: None, lambda name: None) is None
+    assert shared.get("es:yo") == (False, None)
+    assert shared.try_lease("es:yo") is not None  # the failed fetch released its lease
@@ -108,13 +108,17 @@ export const chatApi = {
     return await response.json();
   },
 
-  async getRooms() {
-    const response = await fetch(`${API_URL}/chat/rooms`);
+  async getRooms(cursor = null) {
+    // Paginated: { rooms, next_cursor }, most recently active first
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+    const response = await fetch(`${API_URL}/chat/rooms${query}`);
     return await response.json();
   },
 
-  async getMessages(roomId, limit = 50) {
-    const response = await fetch(`${API_URL}/chat/rooms/${roomId}/messages?limit=${limit}`);
+  async getMessages(roomId, limit = 50, beforeId = null) {
+    // Newest `limit` messages (or those before `beforeId`), oldest first for display
+    const cursor = beforeId ? `&before_id=${beforeId}` : "";
+    const response = await fetch(`${API_URL}/chat/rooms/${roomId}/messages?limit=${limit}&order=asc${cursor}`);
     return await response.json();
   },
 
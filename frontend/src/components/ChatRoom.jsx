@@ -7,6 +7,8 @@ import MessageInput from "./MessageInput";
 export default function ChatRoom({ room, currentUser, onLeaveRoom }) {
   const [messages, setMessages] = useState([]);
   const [loadingHistory, setLoadingHistory] = useState(true);
+  const [members, setMembers] = useState({}); // {user_id: username}
+  const [typingUsers, setTypingUsers] = useState([]);
 
   const token = localStorage.getItem("token");
 
@@ -21,13 +23,33 @@ export default function ChatRoom({ room, currentUser, onLeaveRoom }) {
         }
         return [...prev, data];
       });
-    } else if (data.type === "user_joined") {
-      console.log(`${data.username} joined the room`);
-    } else if (data.type === "user_left") {
-      console.log(`${data.username} left the room`);
+    } else if (data.type === "presence_snapshot") {
+      setMembers(Object.fromEntries(data.members));
+    } else if (data.type === "presence") {
+      // Batched diff: [[id, username]] joined, [id] left, [id] typing
+      setMembers(prev => {
+        const next = { ...prev };
+        (data.joined || []).forEach(([id, username]) => { next[id] = username; });
+        (data.left || []).forEach(id => { delete next[id]; });
+        return next;
+      });
+      if (data.typing) {
+        setTypingUsers(data.typing);
+      }
     }
   }, []);
 
+  // Typing indicators are throttled server-side; hide them after a few seconds
+  useEffect(() => {
+    if (typingUsers.length === 0) return;
+    const timer = setTimeout(() => setTypingUsers([]), 3000);
+    return () => clearTimeout(timer);
+  }, [typingUsers]);
+
+  const typingNames = typingUsers
+    .filter(id => id !== currentUser.id && members[id])
+    .map(id => members[id]);
+
   const { isConnected, error, sendMessage } = useWebSocket(
     room.id,
     token,
@@ -65,6 +87,11 @@ export default function ChatRoom({ room, currentUser, onLeaveRoom }) {
           <span className={`connection-status ${isConnected ? "connected" : "disconnected"}`}>
             {isConnected ? "● Conectado" : "○ Desconectado"}
           </span>
+          {isConnected && (
+            <span className="presence-count">
+              {Object.keys(members).length} en la sala
+            </span>
+          )}
         </div>
         <button className="btn-secondary" onClick={onLeaveRoom}>
           ← Salir de la sala
@@ -89,6 +116,11 @@ export default function ChatRoom({ room, currentUser, onLeaveRoom }) {
       </div>
 
       <div className="chat-footer">
+        {typingNames.length > 0 && (
+          <div className="typing-indicator">
+            {typingNames.join(", ")} {typingNames.length === 1 ? "está" : "están"} escribiendo...
+          </div>
+        )}
         <MessageInput onSend={handleSendMessage} />
       </div>
     </div>
@@ -22,13 +22,13 @@ export default function MessageInput({ onSend, recommendationApi }) {
       setLoading(true);
       try {
         const BACKEND_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
-        const res = await fetch(`${BACKEND_URL}/recommend`, {
-          method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({
-            selected: sentence.map(s => s.palabra)
-          })
-        });
+        // GET so the browser cache can revalidate with If-None-Match (304)
+        const params = new URLSearchParams();
+        sentence.forEach(s => params.append("selected", s.palabra));
+        // Rate limits are per session token (and per IP)
+        const token = localStorage.getItem("token");
+        if (token) params.append("token", token);
+        const res = await fetch(`${BACKEND_URL}/recommend?${params}`);
 
         const data = await res.json();
         if (data.recommended) {
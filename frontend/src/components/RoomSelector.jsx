@@ -7,20 +7,41 @@ export default function RoomSelector({ onRoomSelect, currentUser }) {
   const [newRoomName, setNewRoomName] = useState("");
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState("");
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     loadRooms();
   }, []);
 
-  const loadRooms = async () => {
+  // Rooms come 50 per page, most recently active first; `cursor` appends the next page
+  const loadRooms = async (cursor = null) => {
     try {
-      const data = await chatApi.getRooms();
-      setRooms(data);
+      const data = await chatApi.getRooms(cursor);
+      if (cursor) {
+        // A room whose activity changed between pages can show up twice
+        setRooms(prev => {
+          const seen = new Set(prev.map(r => r.id));
+          return [...prev, ...data.rooms.filter(r => !seen.has(r.id))];
+        });
+      } else {
+        setRooms(data.rooms);
+      }
+      setNextCursor(data.next_cursor);
     } catch (err) {
       console.error("Error loading rooms:", err);
     }
   };
 
+  const handleLoadMore = async () => {
+    setLoadingMore(true);
+    try {
+      await loadRooms(nextCursor);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleCreateRoom = async (e) => {
     e.preventDefault();
     setError("");
@@ -118,6 +139,15 @@ export default function RoomSelector({ onRoomSelect, currentUser }) {
             );
           })
         )}
+        {nextCursor && (
+          <button
+            className="btn-secondary room-list-more"
+            onClick={handleLoadMore}
+            disabled={loadingMore}
+          >
+            {loadingMore ? "Cargando..." : "Cargar más salas"}
+          </button>
+        )}
       </div>
     </div>
   );